@@ -0,0 +1,248 @@
+"""
+Microbenchmarks for the core hot paths against a seeded temporary SQLite database.
+
+Run from the directory that contains the core_system package:
+
+    python -m core_system.benchmarks.bench_core                    # run and print
+    python -m core_system.benchmarks.bench_core --save-baseline    # store results as the baseline
+    python -m core_system.benchmarks.bench_core --compare          # flag regressions vs. baseline
+
+Each benchmark reports ops/s, p50 and p99. Write benchmarks roll back after
+every iteration so the seeded data stays identical between runs.
+"""
+import argparse
+import atexit
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+# models/database.py binds its engine at import time, so point it at a
+# throwaway database before anything from core_system is imported.
+_TMP_DIR = tempfile.mkdtemp(prefix="core_bench_")
+atexit.register(shutil.rmtree, _TMP_DIR, ignore_errors=True)
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMP_DIR, 'bench.db')}"
+
+from sqlalchemy import insert  # noqa: E402
+
+from core_system.models import (CharTemp, Event, Item, Map, MapArea, Monster,  # noqa: E402
+                                RewardPool, RewardPoolItem)
+from core_system.models.association_tables import MapConnection, MapEventAssociation  # noqa: E402
+from core_system.models.database import Base, SessionLocal, engine  # noqa: E402
+from core_system.services import event_service, item_service, map_service, monster_service, user_service  # noqa: E402
+from core_system.services.content_catalog import load_content_catalog, set_content_catalog  # noqa: E402
+from core_system.utils.random_utils import weighted_choice  # noqa: E402
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+DEFAULT_BASELINE = os.path.join(BASELINE_DIR, "core.json")
+
+SCALES = {
+    "small": dict(maps=200, events=2_000, events_per_map=50, items=20_000, monsters=5_000, char_temps=50),
+    "medium": dict(maps=2_000, events=20_000, events_per_map=200, items=200_000, monsters=50_000, char_temps=200),
+}
+
+
+# ---------------------- Seeding ----------------------
+
+
+def seed_database(scale: dict, seed: int = 42) -> None:
+    rng = random.Random(seed)
+    Base.metadata.create_all(engine)
+    item_types = ["equipment", "consumable", "quest", "material"]
+    with SessionLocal() as db:
+        db.execute(insert(CharTemp), [
+            dict(id=i, name=f"char_{i}", rarity=rng.randint(1, 6), base_hp=rng.randint(50, 500),
+                 base_mp=rng.randint(10, 200), base_atk=rng.randint(5, 80), base_spd=rng.randint(5, 50),
+                 base_def=rng.randint(5, 80))
+            for i in range(1, scale["char_temps"] + 1)])
+        db.execute(insert(Item), [
+            dict(id=i, name=f"item_{i}", item_type=rng.choice(item_types), price=rng.randint(1, 10_000),
+                 rarity=rng.randint(1, 6))
+            for i in range(1, scale["items"] + 1)])
+        db.execute(insert(RewardPool), [dict(id=i, name=f"pool_{i}") for i in range(1, 101)])
+        db.execute(insert(RewardPoolItem), [
+            dict(pool_id=p, item_id=item_id, probability=rng.random())
+            for p in range(1, 101) for item_id in rng.sample(range(1, scale["items"] + 1), 10)])
+        db.execute(insert(Monster), [
+            dict(id=i, name=f"monster_{i}", hp=rng.randint(10, 999), mp=1, atk=rng.randint(1, 99),
+                 spd=rng.randint(1, 99), def_=rng.randint(1, 99), drop_pool_id=rng.randint(1, 100))
+            for i in range(1, scale["monsters"] + 1)])
+        db.execute(insert(Event), [
+            dict(id=i, name=f"event_{i}", type="normal", description="lorem ipsum " * 20)
+            for i in range(1, scale["events"] + 1)])
+        db.execute(insert(Map), [
+            dict(id=i, name=f"map_{i}", description="a map " * 20) for i in range(1, scale["maps"] + 1)])
+        db.execute(insert(MapArea), [
+            dict(id=i, map_id=i, name=f"area_{i}", init_npc=[]) for i in range(1, scale["maps"] + 1)])
+        db.execute(insert(MapEventAssociation), [
+            dict(map_id=m, event_id=e, probability=rng.random())
+            for m in range(1, scale["maps"] + 1)
+            for e in rng.sample(range(1, scale["events"] + 1), scale["events_per_map"])])
+        db.execute(insert(MapConnection), [
+            dict(map_a_id=m, map_b_id=m + 1) for m in range(1, scale["maps"])])
+        db.commit()
+
+
+# ---------------------- Harness ----------------------
+
+
+def run_benchmark(fn: Callable[[], None], iterations: int, warmup: int,
+                  teardown: Optional[Callable[[], None]] = None) -> Dict[str, float]:
+    for _ in range(warmup):
+        fn()
+        if teardown:
+            teardown()
+    samples: List[float] = []
+    self_timed = getattr(fn, "self_timed", False)
+    for _ in range(iterations):
+        start = time.perf_counter()
+        elapsed = fn()
+        samples.append(elapsed if self_timed else time.perf_counter() - start)
+        if teardown:
+            teardown()
+    samples.sort()
+    p99_index = min(len(samples) - 1, int(round(0.99 * (len(samples) - 1))))
+    return {
+        "iterations": iterations,
+        "ops_per_sec": len(samples) / sum(samples),
+        "p50_ms": statistics.median(samples) * 1000,
+        "p99_ms": samples[p99_index] * 1000,
+    }
+
+
+def build_benchmarks(scale: dict) -> Dict[str, tuple]:
+    """name -> (fn, teardown, iterations multiplier)"""
+    db = SessionLocal()
+    rng = random.Random(7)
+    benches: Dict[str, tuple] = {}
+
+    for size in (10, 100, 1_000, 10_000):
+        pool = [(i, rng.random()) for i in range(size)]
+        benches[f"weighted_choice[{size}]"] = (lambda pool=pool: weighted_choice(pool), None, 10)
+
+    def draw():
+        event_service.draw_current_map_event(db, rng.randint(1, scale["maps"]))
+        db.expunge_all()
+    benches["draw_current_map_event"] = (draw, None, 1)
+
+    def get_map():
+        map_service.get_map_by_id(db, rng.randint(1, scale["maps"]))
+        db.expunge_all()
+    benches["get_map_by_id"] = (get_map, None, 1)
+
+    deep_item = scale["items"] - 100
+    deep_event = scale["events"] - 100
+    deep_map = scale["maps"] - 60
+    deep_monster = scale["monsters"] - 100
+    benches["fetch_items[deep]"] = (lambda: (item_service.fetch_items(db, None, deep_item, 50), db.expunge_all()), None, 1)
+    benches["fetch_items[deep,type]"] = (lambda: (item_service.fetch_items(db, "material", deep_item, 50), db.expunge_all()), None, 1)
+    benches["fetch_events[deep]"] = (lambda: (event_service.fetch_events(db, deep_event, 50), db.expunge_all()), None, 1)
+    benches["fetch_maps[deep]"] = (lambda: (map_service.fetch_maps(db, deep_map, 50), db.expunge_all()), None, 1)
+    benches["fetch_monsters[deep]"] = (lambda: (monster_service.fetch_monsters(db, deep_monster, 50), db.expunge_all()), None, 1)
+
+    def rollback():
+        db.rollback()
+        db.expunge_all()
+
+    upsert = [{"event_id": e, "probability": rng.random()} for e in range(1, 501)]
+    benches["update_map_event_associations[500]"] = (
+        lambda: map_service.update_map_event_associations(db, 1, upsert=upsert, normalize=True), rollback, 0.1)
+
+    counter = iter(range(10 ** 9))
+    benches["create_user_with_defaults"] = (
+        lambda: user_service.create_user_with_defaults(db, f"bench_user_{next(counter)}", "password"), rollback, 0.5)
+
+    def create_team() -> float:
+        # Only the create_team call itself is timed; the user setup is not
+        user = user_service.create_user_with_defaults(db, f"team_user_{next(counter)}", "password")
+        db.flush()
+        user_data = user.user_data
+        chars = [user_service.create_user_char(db, c, user_data.id) for c in range(3, 7)]
+        db.flush()
+        start = time.perf_counter()
+        user_service.create_team(db, user_data, [c.id for c in chars])
+        db.flush()
+        return time.perf_counter() - start
+    create_team.self_timed = True
+    benches["create_team"] = (create_team, rollback, 0.5)
+    return benches
+
+
+def compare_to_baseline(results: Dict[str, dict], baseline: Dict[str, dict], threshold: float) -> List[str]:
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for metric in ("p50_ms", "p99_ms"):
+            if result[metric] > base[metric] * (1 + threshold):
+                regressions.append(f"{name}: {metric} {base[metric]:.3f} -> {result[metric]:.3f} "
+                                   f"(+{(result[metric] / base[metric] - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--filter", help="only run benchmarks whose name contains this text")
+    parser.add_argument("--catalog", action="store_true", help="load the content catalog before running")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="relative slowdown (p50/p99) reported as a regression")
+    args = parser.parse_args(argv)
+
+    scale = SCALES[args.scale]
+    print(f"Seeding {args.scale} database in {_TMP_DIR} ...")
+    seed_database(scale)
+    if args.catalog:
+        with SessionLocal() as session:
+            load_content_catalog(session)
+    else:
+        set_content_catalog(None)
+
+    results: Dict[str, dict] = {}
+    for name, (fn, teardown, multiplier) in build_benchmarks(scale).items():
+        if args.filter and args.filter not in name:
+            continue
+        iterations = max(5, int(args.iterations * multiplier))
+        results[name] = run_benchmark(fn, iterations, max(1, int(args.warmup * multiplier)), teardown)
+        r = results[name]
+        print(f"{name:<40} {r['ops_per_sec']:>12.1f} ops/s  p50 {r['p50_ms']:>9.3f}ms  p99 {r['p99_ms']:>9.3f}ms")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump({"python": platform.python_version(), "scale": args.scale, "results": results},
+                      f, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.baseline}")
+
+    if args.compare:
+        if not os.path.exists(args.baseline):
+            print(f"No baseline at {args.baseline}; run with --save-baseline first.")
+            return 1
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("scale") != args.scale:
+            print(f"Baseline was recorded at scale '{baseline.get('scale')}', not '{args.scale}'.")
+        regressions = compare_to_baseline(results, baseline["results"], args.threshold)
+        if regressions:
+            print("Regressions beyond threshold:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("No regressions beyond threshold.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
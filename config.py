@@ -1,7 +1,15 @@
+import os
+
 # A single source of truth for application configuration.
 
 # It's highly recommended to load this from environment variables
 # instead of hardcoding, especially for production.
 SECRET_KEY = "your_super_secret_and_long_key_that_is_not_in_git"
 ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 30
\ No newline at end of file
+ACCESS_TOKEN_EXPIRE_MINUTES = 30
+
+# 劇情文字（GeneralEventLogic / EventResult.story_text）壓縮存放。
+# 開啟後，新寫入且長度達門檻的值以 zlib 壓縮；讀取時壓縮與未壓縮的值皆可，
+# 因此可以隨時切換而不需搬移既有資料。
+STORY_TEXT_COMPRESSION = os.getenv("STORY_TEXT_COMPRESSION", "0") == "1"
+STORY_TEXT_COMPRESSION_MIN_BYTES = int(os.getenv("STORY_TEXT_COMPRESSION_MIN_BYTES", "512"))
@@ -4,4 +4,9 @@ from .user import User, UserChar, UserTeamMember
 from .maps import Map, MapArea
 from .event import Event,EventResult,BattleEventLogic,GeneralEventLogic,RewardPool,Event,EventResult
 from .monsters import Monster,MonsterPool,MonsterPoolEntry
+from .inventory import UserInventoryItem
+from .audit import DrawAuditLog
+from .leaderboard import LeaderboardSnapshot
+from .currency import CurrencyLedgerEntry
 
+from .invalidation import ContentInvalidation
@@ -9,8 +9,9 @@ if TYPE_CHECKING:
 
 class MapEventAssociation(Base):
     __tablename__ = "map_event_association"
-    map_id: Mapped[int] = mapped_column(ForeignKey("maps.id"), primary_key=True)
-    event_id: Mapped[int] = mapped_column(ForeignKey("events.id"), primary_key=True)
+    map_id: Mapped[int] = mapped_column(ForeignKey("maps.id", ondelete="CASCADE"), primary_key=True)
+    # 主鍵 (map_id, event_id) 只涵蓋以 map_id 開頭的查詢；依 event 反查另需索引
+    event_id: Mapped[int] = mapped_column(ForeignKey("events.id", ondelete="CASCADE"), primary_key=True, index=True)
     probability: Mapped[float] = mapped_column(Float, nullable=False, default=1.0)
 
     # 關聯
@@ -20,8 +21,8 @@ class MapEventAssociation(Base):
 
 class MapAreaEventAssociation(Base):
     __tablename__ = "map_area_event_association"
-    map_area_id: Mapped[int] = mapped_column(ForeignKey("map_areas.id"), primary_key=True)
-    event_id: Mapped[int] = mapped_column(ForeignKey("events.id"), primary_key=True)
+    map_area_id: Mapped[int] = mapped_column(ForeignKey("map_areas.id", ondelete="CASCADE"), primary_key=True)
+    event_id: Mapped[int] = mapped_column(ForeignKey("events.id", ondelete="CASCADE"), primary_key=True, index=True)
     probability: Mapped[float] = mapped_column(Float, nullable=False, default=1.0)
 
     # 關聯
@@ -37,8 +38,9 @@ class MapConnection(Base):
     )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
-    map_a_id: Mapped[int] = mapped_column(ForeignKey("maps.id"), nullable=False)
-    map_b_id: Mapped[int] = mapped_column(ForeignKey("maps.id"), nullable=False)
+    map_a_id: Mapped[int] = mapped_column(ForeignKey("maps.id", ondelete="CASCADE"), nullable=False)
+    # map_a_id 已由 uq_map_connection_pair 涵蓋
+    map_b_id: Mapped[int] = mapped_column(ForeignKey("maps.id", ondelete="CASCADE"), nullable=False, index=True)
 
     # 未來開啟條件欄位範例
     is_locked: Mapped[bool] = mapped_column(default=False)
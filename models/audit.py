@@ -0,0 +1,25 @@
+from datetime import datetime
+from sqlalchemy import JSON, DateTime, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+from core_system.models.database import Base
+
+
+class DrawAuditLog(Base):
+    """
+    Append-only record of each event draw and its outcome, written in batches
+    by services/draw_audit.py. Rows are never updated; ids only grow, so
+    readers stream it with `id > last_seen_id`.
+    """
+    __tablename__ = "draw_audit_log"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    drawn_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    # "draw" (單次抽事件) / "idle" (離線探索) 等來源
+    source: Mapped[str] = mapped_column(String(20), nullable=False, default="draw")
+    user_data_id: Mapped[int] = mapped_column(Integer, nullable=True)
+    map_id: Mapped[int] = mapped_column(Integer, nullable=True)
+    area_id: Mapped[int] = mapped_column(Integer, nullable=True)
+    event_id: Mapped[int] = mapped_column(Integer, nullable=True)
+    event_result_id: Mapped[int] = mapped_column(Integer, nullable=True)
+    # {"<item_id>": quantity}
+    rewards: Mapped[dict] = mapped_column(JSON, nullable=True)
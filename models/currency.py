@@ -0,0 +1,31 @@
+from datetime import datetime
+from sqlalchemy import BigInteger, DateTime, Index, Integer, String
+from sqlalchemy.sql import func
+from sqlalchemy.orm import Mapped, mapped_column
+from core_system.models.database import Base
+
+
+class CurrencyLedgerEntry(Base):
+    """
+    Append-only record of every UserData.money change made through
+    services/currency_service.py, written in the same transaction as the
+    balance update. Rows are never updated; a player's history is read with
+    `user_data_id = ? ORDER BY id`. Lives on the player's shard.
+    """
+    __tablename__ = "currency_ledger"
+    __table_args__ = (
+        Index("ix_currency_ledger_user_id", "user_data_id", "id"),
+        {"sqlite_autoincrement": True},
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    user_data_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    # 正數為收入、負數為支出
+    delta: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    balance_after: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    # e.g. "shop_buy", "idle_reward", "settlement"
+    reason: Mapped[str] = mapped_column(String(50), nullable=False)
+    # 關聯的外部單號 / 物件 id（選填）
+    reference: Mapped[str] = mapped_column(String(100), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False)
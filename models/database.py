@@ -1,17 +1,35 @@
 from __future__ import annotations
 import os
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker,DeclarativeBase
 from dotenv import load_dotenv
+from core_system.models.sharding import (build_sharded_sessionmaker, create_player_shard_engines,
+                                         player_shard_urls_from_env)
 load_dotenv()
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///../game_data.db")
 
 print(f"DATABASE_URL: {DATABASE_URL}")
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
 
-with engine.connect() as connection:
-    connection.execute(text("PRAGMA foreign_keys = ON;"))
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+@event.listens_for(engine, "connect")
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    # SQLite enforces foreign keys (and ON DELETE actions) per connection,
+    # so every pooled connection needs the pragma, not just the first one.
+    if engine.dialect.name == "sqlite":
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys = ON")
+        cursor.close()
+
+
+# 玩家資料分片（未設定時所有資料都在 DATABASE_URL）
+PLAYER_SHARD_URLS = player_shard_urls_from_env()
+player_shard_engines = create_player_shard_engines(PLAYER_SHARD_URLS)
+if player_shard_engines:
+    print(f"PLAYER_SHARDS: {len(player_shard_engines)}")
+    SessionLocal = build_sharded_sessionmaker(engine, player_shard_engines)
+else:
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 class Base(DeclarativeBase):
     pass
@@ -3,8 +3,9 @@ import json
 from typing import TYPE_CHECKING, List, Optional
 from pydantic import BaseModel
 from sqlalchemy import Column, Integer, String, Text, ForeignKey, text
-from sqlalchemy.orm import relationship, Mapped, mapped_column
+from sqlalchemy.orm import relationship, Mapped, mapped_column, deferred
 from core_system.models.database import Base
+from core_system.models.types import CompressedText
 
 if TYPE_CHECKING:
     from core_system.models import RewardPoolItem
@@ -29,19 +30,22 @@ class Event(Base):
     name: Mapped[str] = mapped_column(String(100))
     # "battle", "normal", "special"
     type: Mapped[str] = mapped_column(String(50))
-    description: Mapped[str] = mapped_column(Text)
+    # 列表只需要 id / name / type；詳細欄位屬於 "detail" 群組，需要時才載入
+    description: Mapped[str] = mapped_column(Text, deferred=True, deferred_group="detail")
 
     map_associations: Mapped[list["MapEventAssociation"]] = relationship(
-        "MapEventAssociation", back_populates="event", cascade="all, delete-orphan"
+        "MapEventAssociation", back_populates="event", cascade="all, delete-orphan",
+        passive_deletes=True
     )
 
     area_associations: Mapped[list["MapAreaEventAssociation"]] = relationship( 
-        "MapAreaEventAssociation", back_populates="event", cascade="all, delete-orphan"
+        "MapAreaEventAssociation", back_populates="event", cascade="all, delete-orphan",
+        passive_deletes=True
     )
     # typing
     general_logic: Mapped[Optional["GeneralEventLogic"]] = relationship(
         "GeneralEventLogic", back_populates="event", uselist=False,
-        cascade="all, delete-orphan"
+        cascade="all, delete-orphan", passive_deletes=True
     )
     # 其他欄位如事件劇情、條件、結果等在這邊擴充
 
@@ -55,9 +59,9 @@ class EventResult(Base):
     prior = Column(Integer, nullable=True, default=0)
     # e.g., {"poison": 3, "heal": 100}
     status_effects_json = Column(Text, nullable=True, default="[]")
-    story_text = Column(Text, nullable=True, default="[]")
+    story_text = deferred(Column(CompressedText, nullable=True, default="[]"), group="detail")
 
-    reward_pool_id = Column(Integer, ForeignKey('reward_pools.id'))
+    reward_pool_id = Column(Integer, ForeignKey('reward_pools.id', ondelete="SET NULL"), index=True)
     reward_pool: Mapped["RewardPool"] = relationship(
         "RewardPool",
         back_populates="event_results",
@@ -69,7 +73,8 @@ class EventResult(Base):
     general_event_logic_id = Column(
         Integer,
         ForeignKey('general_event_logic.id', ondelete="CASCADE"),
-        nullable=True
+        nullable=True,
+        index=True
     )
     general_event_logic = relationship("GeneralEventLogic",
                                        back_populates="event_results")
@@ -102,7 +107,8 @@ class RewardPool(Base):
 
     # 關聯到 pool_items
     items: Mapped[List["RewardPoolItem"]] = relationship(  # type: ignore
-        "RewardPoolItem", back_populates="pool", cascade="all, delete-orphan")
+        "RewardPoolItem", back_populates="pool", cascade="all, delete-orphan",
+        passive_deletes=True)
     monsters = relationship(
         "Monster", back_populates="drop_pool")  # 哪些怪物使用這個 pool
 
@@ -115,7 +121,7 @@ class GeneralEventLogic(Base):
     id = Column(Integer, primary_key=True)
     event_id = Column(Integer, ForeignKey(
         'events.id', ondelete="CASCADE"), unique=True)
-    story_text = Column(Text, default="[]")  # 可為 JSON 字串，支援多段落
+    story_text = deferred(Column(CompressedText, default="[]"), group="detail")  # 可為 JSON 字串，支援多段落
     # TODO 未來補上 儲存條件，例如 {"has_item": "torch"}
 
     event: Mapped["Event"] = relationship(
@@ -125,7 +131,8 @@ class GeneralEventLogic(Base):
     )
     event_results: Mapped[List["EventResult"]] = relationship("EventResult",
                                                               back_populates="general_event_logic",
-                                                              cascade="all, delete-orphan")
+                                                              cascade="all, delete-orphan",
+                                                              passive_deletes=True)
 
     def get_story_text(self) -> list[StoryTextData]:
         return [StoryTextData(**item) for item in json.loads(self.story_text)]
@@ -147,14 +154,18 @@ class ConditionData(BaseModel):
 class StatusEffectData(BaseModel):
     status_effect_key: Optional[str] = None
     status_effect_value: Optional[str] = None
+    # 持續秒數，None 表示永久（直到被移除）
+    duration: Optional[int] = None
+    # 每跳間隔秒數（例如中毒每 10 秒扣一次），None 表示不分跳
+    tick_interval: Optional[int] = None
 
 
 class BattleEventLogic(Base):
     __tablename__ = 'battle_event_logic'
     id = Column(Integer, primary_key=True)
-    event_id = Column(Integer, ForeignKey('events.id'))
+    event_id = Column(Integer, ForeignKey('events.id', ondelete="SET NULL"), index=True)
     story_text = Column(Text)
-    monster_pool_id = Column(Integer, ForeignKey('monster_pools.id'))
-    reward_pool_id = Column(Integer, ForeignKey('reward_pools.id'))
+    monster_pool_id = Column(Integer, ForeignKey('monster_pools.id'), index=True)
+    reward_pool_id = Column(Integer, ForeignKey('reward_pools.id', ondelete="SET NULL"), index=True)
 
     event = relationship("Event", backref="battle_logic")
@@ -0,0 +1,25 @@
+from datetime import datetime
+from sqlalchemy import DateTime, Integer, String
+from sqlalchemy.sql import func
+from sqlalchemy.orm import Mapped, mapped_column
+from core_system.models.database import Base
+
+
+class ContentInvalidation(Base):
+    """
+    Append-only invalidation messages for in-process content caches, written
+    by services/invalidation_bus.py in the same transaction as the edit.
+    The id is the message version: workers poll `id > last_seen_id` and evict
+    what the newer rows name. Old rows are only deleted by pruning.
+    """
+    __tablename__ = "content_invalidations"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    # e.g. "content_catalog", "map_detail", "movement_graph"
+    entity: Mapped[str] = mapped_column(String(50), nullable=False)
+    # NULL 表示該類快取全部失效
+    entity_id: Mapped[int] = mapped_column(Integer, nullable=True)
+    # 發出訊息的 process token；自己發的訊息在 commit 時已經處理過
+    source: Mapped[str] = mapped_column(String(32), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
@@ -0,0 +1,23 @@
+from typing import TYPE_CHECKING
+from sqlalchemy import CheckConstraint, ForeignKey, Integer
+from sqlalchemy.orm import relationship, Mapped, mapped_column
+from core_system.models.database import Base
+
+if TYPE_CHECKING:
+    from core_system.models.items import Item
+    from core_system.models.user import UserData
+
+
+class UserInventoryItem(Base):
+    __tablename__ = "user_inventory"
+    __table_args__ = (
+        CheckConstraint("quantity >= 0", name="chk_inventory_quantity_non_negative"),
+    )
+
+    # 一個玩家對同一道具只有一列，數量以 quantity 累加
+    user_data_id: Mapped[int] = mapped_column(ForeignKey("user_data.id"), primary_key=True)
+    item_id: Mapped[int] = mapped_column(ForeignKey("items.id"), primary_key=True, index=True)
+    quantity: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+    user_data: Mapped["UserData"] = relationship(back_populates="inventory")
+    item: Mapped["Item"] = relationship("Item")
@@ -1,11 +1,15 @@
 from __future__ import annotations
-from sqlalchemy import Column, Integer, String, ForeignKey, Float
+from sqlalchemy import Column, Index, Integer, String, ForeignKey, Float, UniqueConstraint
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from core_system.models.database import Base
 
 
 class Item(Base):
     __tablename__ = "items"
+    __table_args__ = (
+        # fetch_items 依 item_type 篩選並以 id 排序分頁
+        Index("ix_items_item_type_id", "item_type", "id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str] = mapped_column(String(50), nullable=False)
@@ -33,10 +37,15 @@ class Item(Base):
 
 class RewardPoolItem(Base):
     __tablename__ = 'reward_pool_items'
+    __table_args__ = (
+        # 同一個 pool 內每個道具只有一筆機率，批次 upsert 以此為衝突鍵
+        UniqueConstraint("pool_id", "item_id", name="uq_reward_pool_item"),
+    )
     id = Column(Integer, primary_key=True)
 
-    pool_id = Column(Integer, ForeignKey('reward_pools.id'), nullable=False)
-    item_id = Column(Integer, ForeignKey('items.id'), nullable=False)
+    pool_id = Column(Integer, ForeignKey('reward_pools.id', ondelete="CASCADE"), nullable=False)
+    # pool_id 已由 uq_reward_pool_item 涵蓋
+    item_id = Column(Integer, ForeignKey('items.id'), nullable=False, index=True)
     probability = Column(Float, nullable=False)  # 0.0 ~ 1.0
 
     pool = relationship("RewardPool", back_populates="items")
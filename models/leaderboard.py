@@ -0,0 +1,25 @@
+from datetime import datetime
+from sqlalchemy import BigInteger, DateTime, Index, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+from core_system.models.database import Base
+
+
+class LeaderboardSnapshot(Base):
+    """
+    Periodic copy of an in-memory leaderboard (services/leaderboard_service.py),
+    one row per ranked player. Each snapshot of a board replaces the previous
+    one; the boards can be reloaded from here on startup instead of
+    aggregating user_data / user_chars.
+    """
+    __tablename__ = "leaderboard_snapshots"
+    __table_args__ = (
+        Index("ix_leaderboard_snapshots_board_rank", "board", "rank"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    # "money" / "max_level" / "team_power"
+    board: Mapped[str] = mapped_column(String(32), nullable=False)
+    rank: Mapped[int] = mapped_column(Integer, nullable=False)  # 1 = 第一名
+    user_data_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    score: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    taken_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
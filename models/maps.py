@@ -1,8 +1,8 @@
 # app/models/map.py
 
 from typing import TYPE_CHECKING
-from sqlalchemy import (JSON, Column, ForeignKey, Integer, String, Table, Text)
-from sqlalchemy.orm import relationship, Mapped, mapped_column
+from sqlalchemy import (JSON, Column, ForeignKey, Integer, String, Table, Text, UniqueConstraint)
+from sqlalchemy.orm import relationship, Mapped, mapped_column, deferred
 from core_system.models.database import Base
 from core_system.models.user import UserData
 from core_system.models.association_tables import MapConnection, MapEventAssociation, MapAreaEventAssociation
@@ -16,23 +16,26 @@ class Map(Base):
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     name: Mapped[str] = mapped_column(String(100), nullable=False)
-    description: Mapped[str] = mapped_column(Text, nullable=True)
+    # 列表只需要 id / name / image_url；詳細欄位屬於 "detail" 群組，需要時才載入
+    description: Mapped[str] = mapped_column(Text, nullable=True, deferred=True, deferred_group="detail")
     image_url: Mapped[str] = mapped_column(String(255), nullable=True)
 
     # 透過關聯物件與 Event 建立關聯
     event_associations: Mapped[list['MapEventAssociation']] = relationship(
-        "MapEventAssociation", back_populates="map", cascade="all, delete-orphan"
+        "MapEventAssociation", back_populates="map", cascade="all, delete-orphan",
+        passive_deletes=True
     )
 
     # 每個 map 會有多個使用者進度
     user_progresses: Mapped[list["UserMapProgress"]] = relationship(
         "UserMapProgress",
-        back_populates="map"
+        back_populates="map",
+        passive_deletes=True
     )
 
     # 小地圖
     areas: Mapped[list["MapArea"]] = relationship(
-        "MapArea", back_populates="map"
+        "MapArea", back_populates="map", passive_deletes=True
     )
 
     # 與 MapConnection 的雙向關聯（無方向連線）
@@ -40,13 +43,15 @@ class Map(Base):
         "MapConnection",
         foreign_keys="[MapConnection.map_a_id]",
         back_populates="map_a",
-        cascade="all, delete-orphan"
+        cascade="all, delete-orphan",
+        passive_deletes=True
     )
     connections_b: Mapped[list["MapConnection"]] = relationship(
         "MapConnection",
         foreign_keys="[MapConnection.map_b_id]",
         back_populates="map_b",
-        cascade="all, delete-orphan"
+        cascade="all, delete-orphan",
+        passive_deletes=True
     )
 
     @property
@@ -69,10 +74,16 @@ class Map(Base):
 
 class UserMapProgress(Base):
     __tablename__ = "user_map_progress"
+    __table_args__ = (
+        # 每位玩家每張地圖只有一筆進度，批次累加時以此作為 upsert 的衝突鍵
+        UniqueConstraint("user_data_id", "map_id", name="uq_user_map_progress"),
+        {"sqlite_autoincrement": True},
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     user_data_id: Mapped[int] = mapped_column(ForeignKey("user_data.id"))
-    map_id: Mapped[int] = mapped_column(ForeignKey("maps.id"))
+    # user_data_id 已由 uq_user_map_progress 涵蓋
+    map_id: Mapped[int] = mapped_column(ForeignKey("maps.id", ondelete="CASCADE"), index=True)
 
     # 進度數值可以是百分比、已完成事件數等
     progress: Mapped[int] = mapped_column(default=0)
@@ -87,16 +98,17 @@ class MapArea(Base):
     __tablename__ = "map_areas"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    map_id = Column(Integer, ForeignKey("maps.id"), nullable=False)
+    map_id = Column(Integer, ForeignKey("maps.id", ondelete="CASCADE"), nullable=False, index=True)
     name = Column(String(100), nullable=False)
-    description = Column(Text, nullable=True)
+    description = deferred(Column(Text, nullable=True), group="detail")
     image_url = Column(String(255), nullable=True)
 
     # 關聯 Map 和 Event
     map = relationship("Map", back_populates="areas")
     # 透過關聯物件與 Event 建立關聯
     event_associations: Mapped[list["MapAreaEventAssociation"]] = relationship( # type: ignore
-        "MapAreaEventAssociation", back_populates="area", cascade="all, delete-orphan"
+        "MapAreaEventAssociation", back_populates="area", cascade="all, delete-orphan",
+        passive_deletes=True
     )
 
     # 儲存初始 NPC 資料，若未來有變動或需要擴展，可以改為關聯到 NPC 表
@@ -104,7 +116,7 @@ class MapArea(Base):
     #     {"npc_id": 1, "npc_name": "森林守衛", "npc_role": "守護者"},
     #     {"npc_id": 2, "npc_name": "魔法商人", "npc_role": "商人"}
     # ]
-    init_npc = Column(JSON, nullable=True)  # 存放區域的初始 NPC 資訊
+    init_npc = deferred(Column(JSON, nullable=True), group="detail")  # 存放區域的初始 NPC 資訊
 
     def __repr__(self):
         return f"<MapArea(id={self.id}, name={self.name}, map_id={self.map_id})>"
\ No newline at end of file
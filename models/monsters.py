@@ -1,7 +1,7 @@
 from __future__ import annotations
 from typing import TYPE_CHECKING, Optional
 from sqlalchemy import Column, Integer, String, ForeignKey, Float
-from sqlalchemy.orm import relationship, Mapped, mapped_column
+from sqlalchemy.orm import relationship, Mapped, mapped_column, deferred
 from core_system.models.database import Base
 
 if TYPE_CHECKING:
@@ -13,7 +13,7 @@ class Monster(Base):
     # Add more detail
     id = Column(Integer, primary_key=True)
     name = Column(String)
-    description = Column(String, nullable=True)
+    description = deferred(Column(String, nullable=True), group="detail")
 
     # attribute
     hp = Column(Integer, nullable=False, default=1)
@@ -24,7 +24,7 @@ class Monster(Base):
 
     # Connect to RewardPool
     drop_pool_id = Column(Integer, ForeignKey(
-        'reward_pools.id'), nullable=True)
+        'reward_pools.id', ondelete="SET NULL"), nullable=True, index=True)
     drop_pool: Mapped[Optional["RewardPool"]] = relationship(
         "RewardPool", back_populates="monsters")  # type: ignore
 
@@ -39,8 +39,8 @@ class MonsterPoolEntry(Base):
     # == reward_pool_items Use this class to link monster and MonsterPool to countrol monster probability
     __tablename__ = 'monster_pool_entries'
     id = Column(Integer, primary_key=True)
-    pool_id = Column(Integer, ForeignKey('monster_pools.id'))
-    monster_id = Column(Integer, ForeignKey('monsters.id'))
+    pool_id = Column(Integer, ForeignKey('monster_pools.id'), index=True)
+    monster_id = Column(Integer, ForeignKey('monsters.id'), index=True)
     probability = Column(Float)
 
     monster = relationship("Monster")
@@ -1,6 +1,6 @@
 
 
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, Table,Boolean
+from sqlalchemy import Column, Index, Integer, String, Text, ForeignKey, Table, Boolean, UniqueConstraint
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from core_system.models.database import Base
 
@@ -17,14 +17,24 @@ class NPC(Base):
 
 
 class UserNPCState(Base):
+    """
+    Copy-on-write NPC state: a row exists only when the NPC deviates for this
+    user from its default placement in MapArea.init_npc (moved, hidden or
+    talked to). Reads merge these rows over the defaults, see services/npc_service.py.
+    """
     __tablename__ = "user_npc_states"
+    __table_args__ = (
+        UniqueConstraint("user_id", "npc_id", name="uq_user_npc_state"),
+        Index("ix_user_npc_states_user_area", "user_id", "map_area_id"),
+        {"sqlite_autoincrement": True},
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
-    npc_id: Mapped[int] = mapped_column(ForeignKey("npcs.id"))
+    npc_id: Mapped[int] = mapped_column(ForeignKey("npcs.id"), index=True)
 
-    # NPC 對該名使用者而言的所在區域
-    map_area_id: Mapped[int] = mapped_column(ForeignKey("map_areas.id"))
+    # NPC 對該名使用者而言的所在區域；None 表示仍在 init_npc 的預設區域
+    map_area_id: Mapped[int | None] = mapped_column(ForeignKey("map_areas.id", ondelete="SET NULL"), nullable=True, index=True)
 
     # 是否已互動、劇情進度、是否隱藏等等（可選欄位）
     has_talked: Mapped[bool] = mapped_column(default=False)
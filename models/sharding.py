@@ -0,0 +1,367 @@
+from __future__ import annotations
+import logging
+import os
+import re
+from collections import defaultdict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.horizontal_shard import ShardedSession
+from sqlalchemy.orm import Mapper, ORMExecuteState, Session, sessionmaker
+from sqlalchemy.sql import operators, visitors
+from sqlalchemy.sql.elements import BindParameter
+
+# Player-state sharding.
+#
+# Player tables are spread over N databases ("player_0" .. "player_{N-1}") by
+# user_data_id; everything else (users, static content, audit) lives on the
+# main database ("main"). With sharding enabled UserData.id is assigned equal
+# to User.id, so tables keyed by user_id (user_npc_states) route the same way.
+#
+# Routing is done by SQLAlchemy's ShardedSession:
+#   - flushes route each instance by its shard key attribute
+#   - queries route by `<shard key> == :value` / `IN (...)` comparisons, and
+#     fan out to every player shard when there is none (results are
+#     concatenated, so aggregates such as COUNT(*) need a shard key)
+#   - multi-row Core INSERTs must not span shards; use group_by_shard()
+#
+# Shard databases only hold player tables, so foreign keys pointing at the
+# main database cannot be enforced there and shard engines run with
+# foreign-key enforcement off.
+#
+# Player tables with their own surrogate id (SHARD_ID_RANGE_TABLES) get it
+# from the shard's id sequence, and every shard hands out ids from a disjoint
+# range (shard_id_range), so ids never collide across shards and
+# db.get(UserChar, id) goes straight to the shard owning the id. The ranges
+# are reserved by create_sharded_schema() / tools/upgrade_schema.py.
+#
+# Enable with PLAYER_SHARD_URLS (comma separated URLs), or for local testing
+# PLAYER_SHARD_COUNT=N (+ optional PLAYER_SHARD_DIR) for N SQLite files.
+
+MAIN_SHARD = "main"
+
+# table name -> columns holding the user_data_id (the first one is used for flushes)
+PLAYER_SHARD_KEYS: Dict[str, Tuple[str, ...]] = {
+    "user_data": ("id", "user_id"),
+    "user_chars": ("user_data_id",),
+    "user_team_members": ("user_data_id",),
+    "user_map_progress": ("user_data_id",),
+    "user_npc_states": ("user_id",),
+    "user_inventory": ("user_data_id",),
+    "currency_ledger": ("user_data_id",),
+}
+
+# player tables whose `id` is assigned by the shard, from the shard's id range
+SHARD_ID_RANGE_TABLES: Tuple[str, ...] = (
+    "user_chars", "user_team_members", "user_map_progress", "user_npc_states", "currency_ledger",
+)
+
+# Largest id of the (32-bit) INTEGER id columns; split evenly between the shards
+_MAX_ID = 2 ** 31 - 1
+
+_MULTI_VALUES_PARAM = re.compile(r"^(?P<name>.+)_m\d+$")
+
+
+class CrossShardStatementError(ValueError):
+    pass
+
+
+def player_shard_id(user_data_id: int, shard_count: int) -> str:
+    return f"player_{user_data_id % shard_count}"
+
+
+def shard_id_range(shard_index: int, shard_count: int) -> Tuple[int, int]:
+    """First and last id player shard `shard_index` assigns in SHARD_ID_RANGE_TABLES."""
+    size = _MAX_ID // shard_count
+    return shard_index * size + 1, (shard_index + 1) * size
+
+
+def shard_index_for_id(row_id: int, shard_count: int) -> int:
+    """The shard whose id range holds `row_id` (see shard_id_range)."""
+    return min(max(row_id - 1, 0) // (_MAX_ID // shard_count), shard_count - 1)
+
+
+def reserve_shard_id_range(connection, shard_index: int, shard_count: int,
+                           tables: Iterable[str] = SHARD_ID_RANGE_TABLES) -> List[str]:
+    """
+    Moves the id sequence of each table on one player shard to the start of
+    the shard's range. Sequences already at or past it are left alone, so
+    this is safe to rerun. Returns the tables whose sequence was moved.
+    SQLite tables need AUTOINCREMENT for this (their sqlite_sequence entry).
+    """
+    first, _ = shard_id_range(shard_index, shard_count)
+    if first == 1:
+        return []
+    dialect = connection.dialect.name
+    moved = []
+    for table in tables:
+        if dialect == "sqlite":
+            seq = connection.execute(text("SELECT seq FROM sqlite_sequence WHERE name = :t"), {"t": table}).scalar()
+            if seq is not None and seq >= first - 1:
+                continue
+            connection.execute(text("DELETE FROM sqlite_sequence WHERE name = :t"), {"t": table})
+            connection.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES (:t, :seq)"),
+                               {"t": table, "seq": first - 1})
+        elif dialect == "postgresql":
+            sequence = connection.execute(text("SELECT pg_get_serial_sequence(:t, 'id')"), {"t": table}).scalar()
+            if connection.execute(text(f"SELECT last_value FROM {sequence}")).scalar() >= first - 1:
+                continue
+            connection.execute(text("SELECT setval(:sequence, :value)"), {"sequence": sequence, "value": first - 1})
+        elif dialect in ("mysql", "mariadb"):
+            # Values below the current AUTO_INCREMENT are ignored by the server
+            connection.exec_driver_sql(f"ALTER TABLE {table} AUTO_INCREMENT = {first}")
+        else:
+            raise RuntimeError(f"Cannot reserve shard id ranges on dialect '{dialect}'")
+        moved.append(table)
+    return moved
+
+
+def local_sqlite_shard_urls(directory: str, shard_count: int) -> List[str]:
+    """URLs of `shard_count` SQLite files in `directory`, for local testing."""
+    os.makedirs(directory, exist_ok=True)
+    return [f"sqlite:///{os.path.join(directory, f'players_{i}.db')}" for i in range(shard_count)]
+
+
+def player_shard_urls_from_env() -> List[str]:
+    urls = os.getenv("PLAYER_SHARD_URLS")
+    if urls:
+        return [url.strip() for url in urls.split(",") if url.strip()]
+    count = int(os.getenv("PLAYER_SHARD_COUNT", "0"))
+    if count > 0:
+        return local_sqlite_shard_urls(os.getenv("PLAYER_SHARD_DIR", "../player_shards"), count)
+    return []
+
+
+def create_player_shard_engines(urls: Sequence[str]) -> Dict[str, Engine]:
+    engines = {}
+    for i, url in enumerate(urls):
+        connect_args = {"check_same_thread": False} if url.startswith("sqlite") else {}
+        engines[f"player_{i}"] = create_engine(url, connect_args=connect_args)
+    return engines
+
+
+def _table_name(mapper: Optional[Mapper]) -> Optional[str]:
+    if mapper is None:
+        return None
+    return getattr(mapper.local_table, "name", None)
+
+
+class PlayerShardRouter:
+    """The shard / identity / execute choosers used by ShardedSession."""
+
+    def __init__(self, player_shard_ids: Sequence[str]):
+        if not player_shard_ids:
+            raise ValueError("At least one player shard is required")
+        self.player_shard_ids = list(player_shard_ids)
+
+    def shard_for(self, user_data_id: int) -> str:
+        return player_shard_id(int(user_data_id), len(self.player_shard_ids))
+
+    # ---------------------- Flush routing ----------------------
+
+    def shard_chooser(self, mapper: Mapper, instance: Any, clause=None, **kw) -> str:
+        table = _table_name(mapper)
+        if table not in PLAYER_SHARD_KEYS:
+            return MAIN_SHARD
+        if instance is None:
+            shards = self._shards_for_statement(clause, None) if clause is not None else None
+            if shards and len(shards) == 1:
+                return shards[0]
+            raise CrossShardStatementError(f"Cannot choose a player shard for {table} without an instance")
+        user_data_id = self._instance_key(mapper, instance)
+        if user_data_id is None:
+            raise CrossShardStatementError(
+                f"{type(instance).__name__} has no user_data_id yet; cannot choose its player shard")
+        return self.shard_for(user_data_id)
+
+    @staticmethod
+    def _instance_key(mapper: Mapper, instance: Any) -> Optional[int]:
+        table = _table_name(mapper)
+        for column_name in PLAYER_SHARD_KEYS[table]:
+            prop = mapper.get_property_by_column(mapper.local_table.c[column_name])
+            value = getattr(instance, prop.key, None)
+            if value is not None:
+                return value
+        # Children appended through a relationship only get the key at flush
+        # time; fall back to the parent's key (e.g. UserTeamMember.user_data).
+        for rel in mapper.relationships:
+            if _table_name(rel.mapper) == "user_data" and rel.direction.name == "MANYTOONE":
+                parent = getattr(instance, rel.key, None)
+                if parent is not None and parent.id is not None:
+                    return parent.id
+        return None
+
+    # ---------------------- Identity routing ----------------------
+
+    def identity_chooser(self, mapper: Mapper, primary_key: Sequence[Any], *,
+                         lazy_loaded_from=None, **kw) -> List[str]:
+        table = _table_name(mapper)
+        if table not in PLAYER_SHARD_KEYS:
+            return [MAIN_SHARD]
+        keys = PLAYER_SHARD_KEYS[table]
+        for column, value in zip(mapper.primary_key, primary_key):
+            if column.name in keys and value is not None:
+                return [self.shard_for(value)]
+            if column.name == "id" and table in SHARD_ID_RANGE_TABLES and value is not None:
+                # e.g. db.get(UserChar, id): the id range says which shard
+                return [self.player_shard_ids[shard_index_for_id(int(value), len(self.player_shard_ids))]]
+        if lazy_loaded_from is not None and lazy_loaded_from.identity_token in self.player_shard_ids:
+            return [lazy_loaded_from.identity_token]
+        return list(self.player_shard_ids)
+
+    # ---------------------- Statement routing ----------------------
+
+    def execute_chooser(self, orm_context: ORMExecuteState) -> List[str]:
+        statement = orm_context.statement
+        table = _table_name(orm_context.bind_mapper)
+        if table is None:
+            table = getattr(getattr(statement, "table", None), "name", None)
+        if table is None:
+            froms = [getattr(f, "name", None) for f in getattr(statement, "get_final_froms", lambda: [])()]
+            table = next((name for name in froms if name in PLAYER_SHARD_KEYS), None)
+        if table not in PLAYER_SHARD_KEYS:
+            return [MAIN_SHARD]
+
+        shards = self._shards_for_statement(statement, orm_context.parameters)
+        if shards:
+            return shards
+        if orm_context.is_insert:
+            raise CrossShardStatementError(
+                f"INSERT into {table} has no {PLAYER_SHARD_KEYS[table][0]}; cannot choose a player shard")
+        return list(self.player_shard_ids)
+
+    def _shards_for_statement(self, statement, parameters) -> Optional[List[str]]:
+        values = self._where_key_values(statement)
+        if getattr(statement, "is_insert", False):
+            values |= self._insert_key_values(statement, parameters)
+        if not values:
+            return None
+        shards = sorted({self.shard_for(value) for value in values})
+        if getattr(statement, "is_insert", False) and len(shards) > 1:
+            raise CrossShardStatementError(
+                "Multi-row INSERT spans several player shards; split the rows with group_by_shard()")
+        return shards
+
+    @staticmethod
+    def _is_key_column(column) -> bool:
+        table = getattr(getattr(column, "table", None), "name", None)
+        if not hasattr(column, "name"):
+            return False
+        return table in PLAYER_SHARD_KEYS and column.name in PLAYER_SHARD_KEYS[table]
+
+    def _where_key_values(self, statement) -> set:
+        """Shard key values compared with == / IN anywhere in the statement (incl. subqueries)."""
+        if statement is None:
+            return set()
+        values = set()
+
+        def visit_binary(binary):
+            if binary.operator not in (operators.eq, operators.in_op):
+                return
+            for column, bind in ((binary.left, binary.right), (binary.right, binary.left)):
+                if isinstance(bind, BindParameter) and self._is_key_column(column):
+                    value = bind.effective_value
+                    if value is not None:
+                        values.update(value if isinstance(value, (list, tuple, set)) else [value])
+
+        visitors.traverse(statement, {}, {"binary": visit_binary})
+        return values
+
+    @staticmethod
+    def _insert_key_values(statement, parameters) -> set:
+        keys = PLAYER_SHARD_KEYS[statement.table.name]
+        values = set()
+        rows = parameters if isinstance(parameters, (list, tuple)) else [parameters or {}]
+        for row in rows:
+            for key in keys:
+                if row.get(key) is not None:
+                    values.add(row[key])
+        for name, value in statement.compile().params.items():
+            match = _MULTI_VALUES_PARAM.match(name)
+            if (name in keys or (match and match.group("name") in keys)) and value is not None:
+                values.add(value)
+        return values
+
+
+class PlayerShardedSession(ShardedSession):
+    """
+    ShardedSession whose bare get_bind() (used e.g. to look up the dialect)
+    resolves to the main database. All shards must share one dialect.
+    """
+
+    def get_bind(self, mapper=None, *, shard_id=None, instance=None, clause=None, **kw):
+        if shard_id is None and mapper is None and instance is None:
+            shard_id = MAIN_SHARD
+        return super().get_bind(mapper, shard_id=shard_id, instance=instance, clause=clause, **kw)
+
+
+def build_sharded_sessionmaker(main_engine: Engine, player_engines: Dict[str, Engine]) -> sessionmaker:
+    router = PlayerShardRouter(sorted(player_engines, key=lambda s: int(s.rsplit("_", 1)[1])))
+    return sessionmaker(
+        class_=PlayerShardedSession,
+        autocommit=False,
+        autoflush=False,
+        shards={MAIN_SHARD: main_engine, **player_engines},
+        shard_chooser=router.shard_chooser,
+        identity_chooser=router.identity_chooser,
+        execute_chooser=router.execute_chooser,
+        info={"player_shard_router": router},
+    )
+
+
+def get_shard_router(db: Session) -> Optional[PlayerShardRouter]:
+    return db.info.get("player_shard_router")
+
+
+def is_sharded(db: Session) -> bool:
+    return get_shard_router(db) is not None
+
+
+def shard_bind_arguments(db: Session, user_data_id: int) -> dict:
+    """bind_arguments pinning a statement to the user's shard ({} when unsharded)."""
+    router = get_shard_router(db)
+    if router is None:
+        return {}
+    return {"shard_id": router.shard_for(user_data_id)}
+
+
+def group_by_shard(db: Session, rows: Iterable[dict], key: str = "user_data_id") -> Iterator[Tuple[dict, List[dict]]]:
+    """
+    Splits rows for a multi-row write into (bind_arguments, rows) groups,
+    one per player shard. Unsharded sessions get a single group with {}.
+    """
+    rows = list(rows)
+    router = get_shard_router(db)
+    if router is None:
+        if rows:
+            yield {}, rows
+        return
+    groups: Dict[str, List[dict]] = defaultdict(list)
+    for row in rows:
+        groups[router.shard_for(row[key])].append(row)
+    for shard_id in sorted(groups):
+        yield {"shard_id": shard_id}, groups[shard_id]
+
+
+def per_shard_bind_arguments(db: Session) -> List[dict]:
+    """
+    bind_arguments for running a statement once per player shard, e.g. a
+    keyset scan that must not be merged across shards ([{}] when unsharded).
+    """
+    router = get_shard_router(db)
+    if router is None:
+        return [{}]
+    return [{"shard_id": shard_id} for shard_id in router.player_shard_ids]
+
+
+def create_sharded_schema(metadata, main_engine: Engine, player_engines: Dict[str, Engine]) -> None:
+    """Creates every table on the main database and the player tables on each shard."""
+    metadata.create_all(main_engine)
+    player_tables = [table for name, table in metadata.tables.items() if name in PLAYER_SHARD_KEYS]
+    for shard_id, shard_engine in player_engines.items():
+        metadata.create_all(shard_engine, tables=player_tables)
+        with shard_engine.begin() as connection:
+            reserve_shard_id_range(connection, int(shard_id.rsplit("_", 1)[1]), len(player_engines))
+        logging.info(f"Created {len(player_tables)} player tables on shard {shard_id}.")
+
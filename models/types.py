@@ -0,0 +1,39 @@
+import base64
+import zlib
+
+from sqlalchemy import Text
+from sqlalchemy.types import TypeDecorator
+
+from core_system import config
+
+
+class CompressedText(TypeDecorator):
+    """
+    Text column whose long values may be stored zlib-compressed.
+
+    When config.STORY_TEXT_COMPRESSION is on, values of at least
+    config.STORY_TEXT_COMPRESSION_MIN_BYTES (UTF-8) are written as
+    "zlib:" + base64(zlib(value)), if that is actually shorter. Reads detect
+    the prefix, so compressed and plain rows can coexist and the setting can
+    be switched at any time. Plain values must not start with "zlib:"
+    (story text is a JSON array, so it never does).
+    Equality / LIKE filters on such a column do not see the compressed text.
+    """
+    impl = Text
+    cache_ok = True
+
+    PREFIX = "zlib:"
+
+    def process_bind_param(self, value, dialect):
+        if value is None or not config.STORY_TEXT_COMPRESSION:
+            return value
+        raw = value.encode("utf-8")
+        if len(raw) < config.STORY_TEXT_COMPRESSION_MIN_BYTES:
+            return value
+        packed = self.PREFIX + base64.b64encode(zlib.compress(raw, 6)).decode("ascii")
+        return packed if len(packed) < len(raw) else value
+
+    def process_result_value(self, value, dialect):
+        if value is not None and value.startswith(self.PREFIX):
+            return zlib.decompress(base64.b64decode(value[len(self.PREFIX):])).decode("utf-8")
+        return value
@@ -9,6 +9,7 @@ from core_system.models.database import Base
 if TYPE_CHECKING:
     from core_system.models.maps import Map, MapArea, UserMapProgress
     from core_system.models.char_temp import CharTemp
+    from core_system.models.inventory import UserInventoryItem
 
 
 class User(Base):
@@ -39,9 +40,11 @@ class User(Base):
 
 class UserChar(Base):
     __tablename__ = "user_chars"
+    # AUTOINCREMENT: player shards start their ids at the shard's range, see models/sharding.py
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    char_temp_id: Mapped[int] = mapped_column(ForeignKey("char_temp.id"))
+    char_temp_id: Mapped[int] = mapped_column(ForeignKey("char_temp.id"), index=True)
 
     level: Mapped[int] = mapped_column(Integer, default=1)
     exp: Mapped[int] = mapped_column(Integer, default=0)
@@ -57,7 +60,7 @@ class UserChar(Base):
     owner: Mapped["UserData"] = relationship(
         "UserData", back_populates="characters")
     user_data_id: Mapped[int] = mapped_column(
-        ForeignKey("user_data.id"), nullable=False
+        ForeignKey("user_data.id"), nullable=False, index=True
     )
     template: Mapped["CharTemp"] = relationship(
         "CharTemp", back_populates="user_chars")
@@ -68,6 +71,7 @@ class UserTeamMember(Base):
     __table_args__ = (
         UniqueConstraint("user_data_id", "position", name="uq_user_position"),
         UniqueConstraint("user_data_id", "user_char_id", name="uq_user_char_in_team"),
+        {"sqlite_autoincrement": True},
     )
 
     id: Mapped[int] = mapped_column(primary_key=True)
@@ -76,7 +80,7 @@ class UserTeamMember(Base):
     user_data_id: Mapped[int] = mapped_column(
         ForeignKey("user_data.id"), nullable=False)
     user_char_id: Mapped[int] = mapped_column(
-        ForeignKey("user_chars.id"), nullable=False)
+        ForeignKey("user_chars.id"), nullable=False, index=True)
 
     # 隊伍位置，0~5
     position: Mapped[int] = mapped_column(Integer, nullable=False)
@@ -98,13 +102,15 @@ class UserData(Base):
 
     # 玩家基本資訊
     money: Mapped[int] = mapped_column(default=0)
+    # 目前隊伍的 hp + mp + atk + spd + def_ 總和，由 services/team_power_service.py 維護
+    team_power: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
 
     # 當前所在地圖
     current_map_id: Mapped[int] = mapped_column(
-        ForeignKey("maps.id"), nullable=True)
+        ForeignKey("maps.id", ondelete="SET NULL"), nullable=True, index=True)
     current_map: Mapped["Map"] = relationship()
     current_area_id: Mapped[int] = mapped_column(
-        ForeignKey("map_areas.id"), nullable=True)
+        ForeignKey("map_areas.id", ondelete="SET NULL"), nullable=True, index=True)
     current_area: Mapped["MapArea"] = relationship()
 
     map_progresses: Mapped[list["UserMapProgress"]] = relationship(
@@ -122,3 +128,9 @@ class UserData(Base):
         back_populates="owner",
         cascade="all, delete-orphan"
     )
+
+    # 背包道具
+    inventory: Mapped[list["UserInventoryItem"]] = relationship(
+        back_populates="user_data",
+        cascade="all, delete-orphan"
+    )
@@ -0,0 +1,349 @@
+import itertools
+import logging
+import threading
+from collections import defaultdict
+from types import MappingProxyType
+from typing import Callable, List, Mapping, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from core_system.models.association_tables import (MapAreaEventAssociation, MapConnection,
+                                                   MapEventAssociation)
+from core_system.models.char_temp import CharTemp
+from core_system.models.event import Event, EventResult, GeneralEventLogic, RewardPool
+from core_system.models.items import Item, RewardPoolItem
+from core_system.models.maps import Map, MapArea
+from core_system.models.monsters import Monster, MonsterPool, MonsterPoolEntry
+from core_system.models.database import SessionLocal
+from core_system.services.invalidation_bus import publish_invalidation, register_invalidation_handler
+from core_system.utils.session_hooks import on_commit
+
+# Static design data (items, monsters, templates, events, maps, pools) only
+# changes through admin edits, so it is loaded once into immutable __slots__
+# records and shared by every request instead of being re-queried as ORM objects.
+
+
+# ---------------------- Records ----------------------
+
+
+class _Record:
+    """Immutable, positional __slots__ record. Subclasses only declare __slots__."""
+    __slots__ = ()
+
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is read-only")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is read-only")
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(
+            getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __hash__(self):
+        return hash((type(self).__name__, self.id))
+
+    def __repr__(self):
+        return f"<{type(self).__name__}(id={self.id})>"
+
+
+class ItemRecord(_Record):
+    __slots__ = ("id", "name", "description", "item_type", "price", "rarity", "slot",
+                 "atk_bonus", "def_bonus", "hp_restore", "mp_restore", "related_quest")
+
+
+class MonsterRecord(_Record):
+    __slots__ = ("id", "name", "description", "hp", "mp", "atk", "spd", "def_", "drop_pool_id")
+
+
+class CharTempRecord(_Record):
+    __slots__ = ("id", "name", "rarity", "description", "image_sm_url", "image_lg_url",
+                 "base_hp", "base_mp", "base_atk", "base_spd", "base_def")
+
+
+class EventResultRecord(_Record):
+    # condition_json / status_effects_json are kept as the raw stored JSON strings
+    __slots__ = ("id", "name", "prior", "reward_pool_id", "condition_json", "status_effects_json")
+
+
+class EventRecord(_Record):
+    # results: tuple[EventResultRecord], highest prior first
+    __slots__ = ("id", "name", "type", "description", "general_logic_id", "results")
+
+
+class MapConnectionRecord(_Record):
+    __slots__ = ("id", "map_a_id", "map_b_id", "is_locked", "required_item", "required_level")
+
+
+class MapRecord(_Record):
+    # event_pool: tuple[(event_id, probability)]
+    # connections: tuple[MapConnectionRecord] touching this map (either side)
+    __slots__ = ("id", "name", "description", "image_url", "event_pool", "area_ids", "connections")
+
+
+class MapAreaRecord(_Record):
+    # init_npc: tuple[dict] as stored in MapArea.init_npc; treat as read-only
+    __slots__ = ("id", "map_id", "name", "description", "image_url", "init_npc", "event_pool")
+
+
+class RewardPoolRecord(_Record):
+    # items: tuple[(item_id, probability)]
+    __slots__ = ("id", "name", "items")
+
+
+class MonsterPoolRecord(_Record):
+    # entries: tuple[(monster_id, probability)]
+    __slots__ = ("id", "name", "entries")
+
+
+# ---------------------- Catalog ----------------------
+
+
+class ContentCatalog:
+    """
+    A versioned, read-only snapshot of every static content table, keyed by id.
+    Instances are never mutated; a content change builds a new catalog and swaps it in.
+    """
+    __slots__ = ("version", "items", "monsters", "char_temps", "events", "maps",
+                 "map_areas", "reward_pools", "monster_pools")
+
+    def __init__(self, version: int,
+                 items: Mapping[int, ItemRecord],
+                 monsters: Mapping[int, MonsterRecord],
+                 char_temps: Mapping[int, CharTempRecord],
+                 events: Mapping[int, EventRecord],
+                 maps: Mapping[int, MapRecord],
+                 map_areas: Mapping[int, MapAreaRecord],
+                 reward_pools: Mapping[int, RewardPoolRecord],
+                 monster_pools: Mapping[int, MonsterPoolRecord]):
+        self.version = version
+        # An unchanged item mapping is shared with the previous catalog as is
+        self.items = items if isinstance(items, MappingProxyType) else MappingProxyType(dict(items))
+        self.monsters = MappingProxyType(dict(monsters))
+        self.char_temps = MappingProxyType(dict(char_temps))
+        self.events = MappingProxyType(dict(events))
+        self.maps = MappingProxyType(dict(maps))
+        self.map_areas = MappingProxyType(dict(map_areas))
+        self.reward_pools = MappingProxyType(dict(reward_pools))
+        self.monster_pools = MappingProxyType(dict(monster_pools))
+
+    def get_item(self, item_id: int) -> Optional[ItemRecord]:
+        return self.items.get(item_id)
+
+    def get_monster(self, monster_id: int) -> Optional[MonsterRecord]:
+        return self.monsters.get(monster_id)
+
+    def get_char_temp(self, char_temp_id: int) -> Optional[CharTempRecord]:
+        return self.char_temps.get(char_temp_id)
+
+    def get_event(self, event_id: int) -> Optional[EventRecord]:
+        return self.events.get(event_id)
+
+    def get_map(self, map_id: int) -> Optional[MapRecord]:
+        return self.maps.get(map_id)
+
+    def get_map_area(self, area_id: int) -> Optional[MapAreaRecord]:
+        return self.map_areas.get(area_id)
+
+    def get_reward_pool(self, pool_id: int) -> Optional[RewardPoolRecord]:
+        return self.reward_pools.get(pool_id)
+
+    def get_monster_pool(self, pool_id: int) -> Optional[MonsterPoolRecord]:
+        return self.monster_pools.get(pool_id)
+
+    def get_map_event_pool(self, map_id: int) -> Tuple[Tuple[int, float], ...]:
+        map_record = self.maps.get(map_id)
+        return map_record.event_pool if map_record else ()
+
+    def __repr__(self) -> str:
+        return (f"<ContentCatalog(version={self.version}, items={len(self.items)}, "
+                f"events={len(self.events)}, maps={len(self.maps)})>")
+
+
+_catalog: Optional[ContentCatalog] = None
+_catalog_lock = threading.Lock()
+# One version space for every catalog this process installs, built from the
+# database or mapped from a snapshot file: the caches derived from the
+# catalog (movement graph, compiled pools, item index, NPC defaults, ...) are
+# keyed on catalog.version, so two catalogs must never share one.
+_version_counter = itertools.count(1)
+
+
+def next_catalog_version() -> int:
+    """A catalog version no other catalog of this process has had or will get."""
+    return next(_version_counter)
+
+
+def _columns(model, names):
+    table = model.__table__
+    return [table.c[name] for name in names]
+
+
+def build_content_catalog(db: Session, version: int = 0, previous: Optional[ContentCatalog] = None) -> ContentCatalog:
+    """
+    Reads every static table with plain column selects (no ORM identity map,
+    no deferred/lazy loads) and builds an immutable catalog. When the items
+    equal those of `previous`, its item mapping is reused, so item consumers
+    (the item index) can tell by identity that nothing changed.
+    """
+    items = {
+        row[0]: ItemRecord(*row)
+        for row in db.execute(select(*_columns(Item, ItemRecord.__slots__)))
+    }
+    if previous is not None and previous.items == items:
+        items = previous.items
+    monsters = {
+        row[0]: MonsterRecord(*row)
+        for row in db.execute(select(*_columns(Monster, MonsterRecord.__slots__)))
+    }
+    char_temps = {
+        row[0]: CharTempRecord(*row)
+        for row in db.execute(select(*_columns(CharTemp, CharTempRecord.__slots__)))
+    }
+
+    # Event -> GeneralEventLogic -> EventResult
+    results_by_logic = defaultdict(list)
+    for row in db.execute(select(*_columns(EventResult, EventResultRecord.__slots__),
+                                 EventResult.general_event_logic_id)):
+        results_by_logic[row[-1]].append(EventResultRecord(*row[:-1]))
+    logic_by_event = {
+        event_id: logic_id
+        for logic_id, event_id in db.execute(select(GeneralEventLogic.id, GeneralEventLogic.event_id))
+    }
+    events = {}
+    for event_id, name, event_type, description in db.execute(
+            select(Event.id, Event.name, Event.type, Event.description)):
+        logic_id = logic_by_event.get(event_id)
+        results = sorted(results_by_logic.get(logic_id, ()), key=lambda r: -(r.prior or 0))
+        events[event_id] = EventRecord(event_id, name, event_type, description, logic_id, tuple(results))
+
+    # Maps, areas, event pools and connections
+    map_pools = defaultdict(list)
+    for map_id, event_id, probability in db.execute(select(
+            MapEventAssociation.map_id, MapEventAssociation.event_id, MapEventAssociation.probability
+    ).order_by(MapEventAssociation.map_id, MapEventAssociation.event_id)):
+        map_pools[map_id].append((event_id, probability))
+    area_pools = defaultdict(list)
+    for area_id, event_id, probability in db.execute(select(
+            MapAreaEventAssociation.map_area_id, MapAreaEventAssociation.event_id,
+            MapAreaEventAssociation.probability
+    ).order_by(MapAreaEventAssociation.map_area_id, MapAreaEventAssociation.event_id)):
+        area_pools[area_id].append((event_id, probability))
+    connections_by_map = defaultdict(list)
+    for row in db.execute(select(*_columns(MapConnection, MapConnectionRecord.__slots__))):
+        conn = MapConnectionRecord(*row)
+        connections_by_map[conn.map_a_id].append(conn)
+        connections_by_map[conn.map_b_id].append(conn)
+
+    map_areas = {}
+    area_ids_by_map = defaultdict(list)
+    for area_id, map_id, name, description, image_url, init_npc in db.execute(select(
+            MapArea.id, MapArea.map_id, MapArea.name, MapArea.description,
+            MapArea.image_url, MapArea.init_npc).order_by(MapArea.id)):
+        map_areas[area_id] = MapAreaRecord(area_id, map_id, name, description, image_url,
+                                           tuple(init_npc or ()), tuple(area_pools.get(area_id, ())))
+        area_ids_by_map[map_id].append(area_id)
+    maps = {
+        map_id: MapRecord(map_id, name, description, image_url,
+                          tuple(map_pools.get(map_id, ())),
+                          tuple(area_ids_by_map.get(map_id, ())),
+                          tuple(connections_by_map.get(map_id, ())))
+        for map_id, name, description, image_url in db.execute(
+            select(Map.id, Map.name, Map.description, Map.image_url))
+    }
+
+    # Pools
+    pool_items = defaultdict(list)
+    for pool_id, item_id, probability in db.execute(select(
+            RewardPoolItem.pool_id, RewardPoolItem.item_id, RewardPoolItem.probability
+    ).order_by(RewardPoolItem.pool_id, RewardPoolItem.id)):
+        pool_items[pool_id].append((item_id, probability))
+    reward_pools = {
+        pool_id: RewardPoolRecord(pool_id, name, tuple(pool_items.get(pool_id, ())))
+        for pool_id, name in db.execute(select(RewardPool.id, RewardPool.name))
+    }
+    pool_entries = defaultdict(list)
+    for pool_id, monster_id, probability in db.execute(select(
+            MonsterPoolEntry.pool_id, MonsterPoolEntry.monster_id, MonsterPoolEntry.probability
+    ).order_by(MonsterPoolEntry.pool_id, MonsterPoolEntry.id)):
+        pool_entries[pool_id].append((monster_id, probability))
+    monster_pools = {
+        pool_id: MonsterPoolRecord(pool_id, name, tuple(pool_entries.get(pool_id, ())))
+        for pool_id, name in db.execute(select(MonsterPool.id, MonsterPool.name))
+    }
+
+    return ContentCatalog(version, items, monsters, char_temps, events, maps,
+                          map_areas, reward_pools, monster_pools)
+
+
+def get_content_catalog() -> Optional[ContentCatalog]:
+    """Returns the current catalog, or None if it has not been loaded in this process."""
+    return _catalog
+
+
+def set_content_catalog(catalog: ContentCatalog) -> ContentCatalog:
+    """Atomically installs `catalog` as the current one."""
+    global _catalog
+    with _catalog_lock:
+        _catalog = catalog
+    return catalog
+
+
+def load_content_catalog(db: Session) -> ContentCatalog:
+    """
+    Builds a fresh catalog and swaps it in. Readers holding the previous
+    catalog keep a consistent view until they ask for the current one again.
+    Call once at startup and again whenever static content changes.
+    """
+    previous = _catalog if isinstance(_catalog, ContentCatalog) else None
+    catalog = build_content_catalog(db, version=next_catalog_version(), previous=previous)
+    set_content_catalog(catalog)
+    logging.info(f"Content catalog loaded: {catalog!r}")
+    return catalog
+
+
+# Caches of static content kept outside the catalog (e.g. the NPC defaults
+# read straight from map_areas while no catalog is loaded)
+_content_change_callbacks: List[Callable[[], None]] = []
+
+
+def on_content_change(callback: Callable[[], None]) -> None:
+    """
+    Registers `callback` to run after every static content change: locally
+    once the editing session commits, and in the other workers when the
+    invalidation bus delivers the change (the bus skips this process's own).
+    """
+    _content_change_callbacks.append(callback)
+
+
+def _rebuild_after_commit():
+    for callback in _content_change_callbacks:
+        callback()
+    if _catalog is None:
+        # Nothing to refresh until someone loads the catalog in this process
+        return
+    if not isinstance(_catalog, ContentCatalog):
+        # An installed snapshot (content_snapshot.SnapshotWatcher) wins over the
+        # database; the edit is served once it is exported in a newer snapshot
+        logging.info("Content changed while a snapshot is installed; keeping the snapshot.")
+        return
+    with SessionLocal() as session:
+        load_content_catalog(session)
+
+
+def schedule_content_catalog_rebuild(db: Session) -> None:
+    """
+    Marks static content as changed; the catalog is rebuilt once after `db`
+    commits, here and (through the invalidation bus) in the other workers.
+    This function does NOT commit the transaction.
+    """
+    on_commit(db, "content_catalog", _rebuild_after_commit)
+    publish_invalidation(db, "content_catalog")
+
+
+register_invalidation_handler("content_catalog", lambda _: _rebuild_after_commit())
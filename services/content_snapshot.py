@@ -0,0 +1,467 @@
+import json
+import logging
+import math
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from collections.abc import Mapping
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from sqlalchemy.orm import Session
+
+from core_system.services.content_catalog import (CharTempRecord, ContentCatalog, EventRecord,
+                                                  EventResultRecord, ItemRecord, MapAreaRecord,
+                                                  MapConnectionRecord, MapRecord, MonsterPoolRecord,
+                                                  MonsterRecord, RewardPoolRecord,
+                                                  build_content_catalog, next_catalog_version,
+                                                  set_content_catalog)
+
+# Binary snapshot of the content catalog that every worker process maps
+# read-only, so N workers share one physical copy through the page cache.
+#
+# Layout (little endian):
+#   header     <8sQqI4x   magic, version, created_at (unix seconds), section count
+#   directory  <24sQQ     section name, offset, length   (one entry per section)
+#   sections   "strings" is a UTF-8 blob; every other section is an array of
+#              fixed-size records sorted by their first field (an int64 key).
+#
+# Field kinds: "q" int64 (None = INT64_MIN), "d" float64 (None = NaN),
+#              "s" string reference <II offset, length (None = length 0xFFFFFFFF),
+#              "j" same as "s" but JSON encoded.
+#
+# The header version only orders snapshot files (SnapshotWatcher swaps to
+# newer ones). Each opened view takes its catalog `version` from the same
+# counter as database-built catalogs, so the caches keyed on catalog.version
+# never mistake one for the other. While a snapshot is installed as the
+# catalog, content edits do not replace it; they reach the workers through
+# the next exported snapshot.
+
+SNAPSHOT_MAGIC = b"GCSNAP1\x00"
+_HEADER = struct.Struct("<8sQqI4x")
+_DIR_ENTRY = struct.Struct("<24sQQ")
+_KEY = struct.Struct("<q")
+_NULL_INT = -(2 ** 63)
+_NULL_STR = 0xFFFFFFFF
+
+_STRUCT_CODES = {"q": "q", "d": "d", "s": "II", "j": "II"}
+
+# section name -> field kinds; the first field is the sort/lookup key
+_SECTIONS: Dict[str, Tuple[Tuple[str, str], ...]] = {
+    "items": (("id", "q"), ("name", "s"), ("description", "s"), ("item_type", "s"),
+              ("price", "q"), ("rarity", "q"), ("slot", "s"), ("atk_bonus", "q"),
+              ("def_bonus", "q"), ("hp_restore", "q"), ("mp_restore", "q"), ("related_quest", "q")),
+    "monsters": (("id", "q"), ("name", "s"), ("description", "s"), ("hp", "q"), ("mp", "q"),
+                 ("atk", "q"), ("spd", "q"), ("def_", "q"), ("drop_pool_id", "q")),
+    "char_temps": (("id", "q"), ("name", "s"), ("rarity", "q"), ("description", "s"),
+                   ("image_sm_url", "s"), ("image_lg_url", "s"), ("base_hp", "q"), ("base_mp", "q"),
+                   ("base_atk", "q"), ("base_spd", "q"), ("base_def", "q")),
+    "events": (("id", "q"), ("name", "s"), ("type", "s"), ("description", "s"),
+               ("general_logic_id", "q")),
+    "event_results": (("event_id", "q"), ("id", "q"), ("name", "s"), ("prior", "q"),
+                      ("reward_pool_id", "q"), ("condition_json", "s"), ("status_effects_json", "s")),
+    "maps": (("id", "q"), ("name", "s"), ("description", "s"), ("image_url", "s")),
+    "map_event_pool": (("map_id", "q"), ("event_id", "q"), ("probability", "d")),
+    "map_area_ids": (("map_id", "q"), ("area_id", "q")),
+    "map_connections": (("map_id", "q"), ("id", "q"), ("map_a_id", "q"), ("map_b_id", "q"),
+                        ("is_locked", "q"), ("required_item", "s"), ("required_level", "q")),
+    "map_areas": (("id", "q"), ("map_id", "q"), ("name", "s"), ("description", "s"),
+                  ("image_url", "s"), ("init_npc", "j")),
+    "area_event_pool": (("area_id", "q"), ("event_id", "q"), ("probability", "d")),
+    "reward_pools": (("id", "q"), ("name", "s")),
+    "reward_pool_items": (("pool_id", "q"), ("item_id", "q"), ("probability", "d")),
+    "monster_pools": (("id", "q"), ("name", "s")),
+    "monster_pool_entries": (("pool_id", "q"), ("monster_id", "q"), ("probability", "d")),
+}
+
+
+def _record_struct(fields) -> struct.Struct:
+    return struct.Struct("<" + "".join(_STRUCT_CODES[kind] for _, kind in fields))
+
+
+class SnapshotFormatError(ValueError):
+    pass
+
+
+# ---------------------- Export ----------------------
+
+
+class _StringPool:
+    def __init__(self):
+        self.blob = bytearray()
+        self._offsets: Dict[str, int] = {}
+
+    def add(self, value: Optional[str]) -> Tuple[int, int]:
+        if value is None:
+            return 0, _NULL_STR
+        data = value.encode("utf-8")
+        offset = self._offsets.get(value)
+        if offset is None:
+            offset = len(self.blob)
+            self.blob += data
+            self._offsets[value] = offset
+        return offset, len(data)
+
+
+def _pack_rows(fields, rows: Sequence[tuple], strings: _StringPool) -> bytes:
+    record = _record_struct(fields)
+    out = bytearray(record.size * len(rows))
+    for index, row in enumerate(sorted(rows, key=lambda r: r[0])):
+        values = []
+        for (_, kind), value in zip(fields, row):
+            if kind == "q":
+                values.append(_NULL_INT if value is None else int(value))
+            elif kind == "d":
+                values.append(math.nan if value is None else float(value))
+            elif kind == "j":
+                values.extend(strings.add(None if value is None else json.dumps(value, ensure_ascii=False)))
+            else:
+                values.extend(strings.add(value))
+        record.pack_into(out, index * record.size, *values)
+    return bytes(out)
+
+
+def _catalog_rows(catalog: ContentCatalog) -> Dict[str, List[tuple]]:
+    rows: Dict[str, List[tuple]] = {name: [] for name in _SECTIONS}
+    for item in catalog.items.values():
+        rows["items"].append(tuple(getattr(item, f) for f in ItemRecord.__slots__))
+    for monster in catalog.monsters.values():
+        rows["monsters"].append(tuple(getattr(monster, f) for f in MonsterRecord.__slots__))
+    for temp in catalog.char_temps.values():
+        rows["char_temps"].append(tuple(getattr(temp, f) for f in CharTempRecord.__slots__))
+    for event in catalog.events.values():
+        rows["events"].append((event.id, event.name, event.type, event.description, event.general_logic_id))
+        for result in event.results:
+            rows["event_results"].append(
+                (event.id,) + tuple(getattr(result, f) for f in EventResultRecord.__slots__))
+    for map_record in catalog.maps.values():
+        rows["maps"].append((map_record.id, map_record.name, map_record.description, map_record.image_url))
+        rows["map_event_pool"].extend((map_record.id, e, p) for e, p in map_record.event_pool)
+        rows["map_area_ids"].extend((map_record.id, a) for a in map_record.area_ids)
+        rows["map_connections"].extend(
+            (map_record.id,) + tuple(getattr(conn, f) for f in MapConnectionRecord.__slots__)
+            for conn in map_record.connections)
+    for area in catalog.map_areas.values():
+        rows["map_areas"].append((area.id, area.map_id, area.name, area.description,
+                                  area.image_url, list(area.init_npc)))
+        rows["area_event_pool"].extend((area.id, e, p) for e, p in area.event_pool)
+    for pool in catalog.reward_pools.values():
+        rows["reward_pools"].append((pool.id, pool.name))
+        rows["reward_pool_items"].extend((pool.id, i, p) for i, p in pool.items)
+    for pool in catalog.monster_pools.values():
+        rows["monster_pools"].append((pool.id, pool.name))
+        rows["monster_pool_entries"].extend((pool.id, m, p) for m, p in pool.entries)
+    return rows
+
+
+def read_snapshot_version(path: str) -> Optional[int]:
+    """Reads only the header version of an existing snapshot; None if there is none."""
+    try:
+        with open(path, "rb") as f:
+            header = f.read(_HEADER.size)
+    except FileNotFoundError:
+        return None
+    if len(header) < _HEADER.size or header[:8] != SNAPSHOT_MAGIC:
+        return None
+    return _HEADER.unpack(header)[1]
+
+
+def export_content_snapshot(source: Union[ContentCatalog, Session], path: str,
+                            version: Optional[int] = None) -> int:
+    """
+    Writes the static content to `path` as a binary snapshot and returns its version.
+    `source` may be a loaded catalog or a Session to build one from.
+    The file is written next to `path` and renamed over it, so readers only
+    ever see a complete snapshot. By default the version is one more than the
+    version of the snapshot being replaced.
+    """
+    catalog = build_content_catalog(source) if isinstance(source, Session) else source
+    if version is None:
+        version = (read_snapshot_version(path) or 0) + 1
+
+    strings = _StringPool()
+    rows = _catalog_rows(catalog)
+    packed = [(name, _pack_rows(fields, rows[name], strings)) for name, fields in _SECTIONS.items()]
+    sections = [("strings", bytes(strings.blob))] + packed
+
+    offset = _HEADER.size + _DIR_ENTRY.size * len(sections)
+    directory = bytearray()
+    for name, data in sections:
+        directory += _DIR_ENTRY.pack(name.encode("ascii"), offset, len(data))
+        offset += len(data)
+
+    directory_name = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".snapshot-", dir=directory_name)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_HEADER.pack(SNAPSHOT_MAGIC, version, int(time.time()), len(sections)))
+            f.write(directory)
+            for _, data in sections:
+                f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates 0600 files; workers may run as another user
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    logging.info(f"Content snapshot v{version} written to {path} ({offset} bytes).")
+    return version
+
+
+# ---------------------- Load ----------------------
+
+
+class _Section:
+    """Sorted fixed-size records inside the mapped file."""
+    __slots__ = ("buf", "fields", "record", "count")
+
+    def __init__(self, buf: memoryview, fields):
+        self.buf = buf
+        self.fields = fields
+        self.record = _record_struct(fields)
+        if len(buf) % self.record.size:
+            raise SnapshotFormatError("Corrupt snapshot section length")
+        self.count = len(buf) // self.record.size
+
+    def key_at(self, index: int) -> int:
+        return _KEY.unpack_from(self.buf, index * self.record.size)[0]
+
+    def lower_bound(self, key: int) -> int:
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.key_at(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def raw_at(self, index: int) -> tuple:
+        return self.record.unpack_from(self.buf, index * self.record.size)
+
+
+class SnapshotView:
+    """
+    Read-only view over a memory-mapped snapshot. It exposes the same read API
+    as ContentCatalog (get_* helpers and id-keyed mappings), decoding records
+    from the shared mapping on access instead of holding per-process copies.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buf = memoryview(self._mmap)
+        magic, self.snapshot_version, self.created_at, section_count = _HEADER.unpack_from(buf, 0)
+        if magic != SNAPSHOT_MAGIC:
+            raise SnapshotFormatError(f"{path} is not a content snapshot")
+        self.version = next_catalog_version()
+
+        raw_sections = {}
+        for index in range(section_count):
+            name, offset, length = _DIR_ENTRY.unpack_from(buf, _HEADER.size + index * _DIR_ENTRY.size)
+            raw_sections[name.rstrip(b"\x00").decode("ascii")] = buf[offset:offset + length]
+        try:
+            self._strings = raw_sections.pop("strings")
+            self._sections = {name: _Section(raw_sections[name], fields)
+                              for name, fields in _SECTIONS.items()}
+        except KeyError as e:
+            raise SnapshotFormatError(f"Snapshot is missing section {e}") from None
+
+        self.items = _SnapshotMapping(self, "items", self._decode_item)
+        self.monsters = _SnapshotMapping(self, "monsters", self._decode_monster)
+        self.char_temps = _SnapshotMapping(self, "char_temps", self._decode_char_temp)
+        self.events = _SnapshotMapping(self, "events", self._decode_event)
+        self.maps = _SnapshotMapping(self, "maps", self._decode_map)
+        self.map_areas = _SnapshotMapping(self, "map_areas", self._decode_map_area)
+        self.reward_pools = _SnapshotMapping(self, "reward_pools", self._decode_reward_pool)
+        self.monster_pools = _SnapshotMapping(self, "monster_pools", self._decode_monster_pool)
+
+    # ---- decoding helpers ----
+
+    def _values(self, section: _Section, index: int) -> list:
+        raw = section.raw_at(index)
+        values, pos = [], 0
+        for _, kind in section.fields:
+            if kind == "q":
+                value = raw[pos]
+                values.append(None if value == _NULL_INT else value)
+                pos += 1
+            elif kind == "d":
+                value = raw[pos]
+                values.append(None if math.isnan(value) else value)
+                pos += 1
+            else:
+                offset, length = raw[pos], raw[pos + 1]
+                text = None if length == _NULL_STR else bytes(
+                    self._strings[offset:offset + length]).decode("utf-8")
+                values.append(json.loads(text) if kind == "j" and text is not None else text)
+                pos += 2
+        return values
+
+    def _find(self, name: str, key: int) -> Optional[list]:
+        section = self._sections[name]
+        index = section.lower_bound(key)
+        if index < section.count and section.key_at(index) == key:
+            return self._values(section, index)
+        return None
+
+    def _children(self, name: str, key: int) -> Iterator[list]:
+        section = self._sections[name]
+        index = section.lower_bound(key)
+        while index < section.count and section.key_at(index) == key:
+            yield self._values(section, index)
+            index += 1
+
+    def _ids(self, name: str) -> Iterator[int]:
+        section = self._sections[name]
+        return (section.key_at(i) for i in range(section.count))
+
+    def _decode_item(self, values):
+        return ItemRecord(*values)
+
+    def _decode_monster(self, values):
+        return MonsterRecord(*values)
+
+    def _decode_char_temp(self, values):
+        return CharTempRecord(*values)
+
+    def _decode_event(self, values):
+        results = tuple(EventResultRecord(*row[1:]) for row in self._children("event_results", values[0]))
+        return EventRecord(*values, results)
+
+    def _decode_map(self, values):
+        map_id = values[0]
+        return MapRecord(
+            *values,
+            tuple((row[1], row[2]) for row in self._children("map_event_pool", map_id)),
+            tuple(row[1] for row in self._children("map_area_ids", map_id)),
+            tuple(self._decode_connection(row) for row in self._children("map_connections", map_id)),
+        )
+
+    @staticmethod
+    def _decode_connection(row):
+        _, conn_id, map_a_id, map_b_id, is_locked, required_item, required_level = row
+        return MapConnectionRecord(conn_id, map_a_id, map_b_id, bool(is_locked),
+                                   required_item, required_level)
+
+    def _decode_map_area(self, values):
+        area_id, map_id, name, description, image_url, init_npc = values
+        return MapAreaRecord(area_id, map_id, name, description, image_url,
+                             tuple(init_npc or ()),
+                             tuple((row[1], row[2]) for row in self._children("area_event_pool", area_id)))
+
+    def _decode_reward_pool(self, values):
+        return RewardPoolRecord(*values, tuple((row[1], row[2])
+                                               for row in self._children("reward_pool_items", values[0])))
+
+    def _decode_monster_pool(self, values):
+        return MonsterPoolRecord(*values, tuple((row[1], row[2])
+                                                for row in self._children("monster_pool_entries", values[0])))
+
+    # ---- ContentCatalog-compatible API ----
+
+    def get_item(self, item_id: int) -> Optional[ItemRecord]:
+        return self.items.get(item_id)
+
+    def get_monster(self, monster_id: int) -> Optional[MonsterRecord]:
+        return self.monsters.get(monster_id)
+
+    def get_char_temp(self, char_temp_id: int) -> Optional[CharTempRecord]:
+        return self.char_temps.get(char_temp_id)
+
+    def get_event(self, event_id: int) -> Optional[EventRecord]:
+        return self.events.get(event_id)
+
+    def get_map(self, map_id: int) -> Optional[MapRecord]:
+        return self.maps.get(map_id)
+
+    def get_map_area(self, area_id: int) -> Optional[MapAreaRecord]:
+        return self.map_areas.get(area_id)
+
+    def get_reward_pool(self, pool_id: int) -> Optional[RewardPoolRecord]:
+        return self.reward_pools.get(pool_id)
+
+    def get_monster_pool(self, pool_id: int) -> Optional[MonsterPoolRecord]:
+        return self.monster_pools.get(pool_id)
+
+    def get_map_event_pool(self, map_id: int) -> Tuple[Tuple[int, float], ...]:
+        return tuple((row[1], row[2]) for row in self._children("map_event_pool", map_id))
+
+    def __repr__(self) -> str:
+        return (f"<SnapshotView(version={self.version}, snapshot_version={self.snapshot_version}, "
+                f"path='{self.path}')>")
+
+
+class _SnapshotMapping(Mapping):
+    """id -> record mapping backed by one snapshot section."""
+
+    def __init__(self, view: SnapshotView, section: str, decode):
+        self._view = view
+        self._section = section
+        self._decode = decode
+
+    def __getitem__(self, key: int):
+        values = self._view._find(self._section, key)
+        if values is None:
+            raise KeyError(key)
+        return self._decode(values)
+
+    def __iter__(self):
+        return self._view._ids(self._section)
+
+    def __len__(self):
+        return self._view._sections[self._section].count
+
+
+def open_content_snapshot(path: str) -> SnapshotView:
+    return SnapshotView(path)
+
+
+# ---------------------- Hot reload ----------------------
+
+
+class SnapshotWatcher:
+    """
+    Keeps the current SnapshotView for one snapshot path and swaps to a newer
+    one when the file is replaced. The check is a single os.stat() and runs
+    at most once per `check_interval` seconds, so it can be called on every request.
+    Views that were handed out stay valid; their mapping is released once unreferenced.
+    """
+
+    def __init__(self, path: str, check_interval: float = 1.0, install_as_catalog: bool = True):
+        self.path = path
+        self.check_interval = check_interval
+        self.install_as_catalog = install_as_catalog
+        self._lock = threading.Lock()
+        self._view: Optional[SnapshotView] = None
+        self._stat_key = None
+        self._checked_at = 0.0
+
+    def current(self) -> SnapshotView:
+        if self._view is None or time.monotonic() - self._checked_at >= self.check_interval:
+            self.refresh()
+        return self._view
+
+    def refresh(self) -> bool:
+        """Reloads if the file changed and carries a newer version; returns True on swap."""
+        with self._lock:
+            self._checked_at = time.monotonic()
+            stat = os.stat(self.path)
+            stat_key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            if stat_key == self._stat_key and self._view is not None:
+                return False
+            view = SnapshotView(self.path)
+            self._stat_key = stat_key
+            if self._view is not None and view.snapshot_version <= self._view.snapshot_version:
+                return False
+            self._view = view
+        if self.install_as_catalog:
+            set_content_catalog(view)
+        logging.info(f"Content snapshot v{view.snapshot_version} loaded from {self.path}.")
+        return True
@@ -0,0 +1,157 @@
+import logging
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+from sqlalchemy import case, insert, select, update
+from sqlalchemy.orm import Session
+
+from core_system.models.currency import CurrencyLedgerEntry
+from core_system.models.sharding import group_by_shard, shard_bind_arguments
+from core_system.models.user import UserData
+from core_system.services.leaderboard_service import schedule_leaderboard_refresh
+from core_system.utils.profiling import profile_service
+from core_system.utils.sql_utils import chunked
+
+# UserData.money is only changed with guarded arithmetic in SQL:
+#
+#   UPDATE user_data SET money = money + :delta
+#   WHERE id = :id AND money + :delta >= 0
+#   RETURNING id, money
+#
+# so concurrent earns / spends never overwrite each other, no SELECT is needed
+# first and the row lock is held only for the one statement. A spend that
+# would go negative matches no row and raises InsufficientFundsError.
+# Batch settlement applies many players' deltas in one UPDATE with a CASE
+# per id. Every change is appended to currency_ledger with one batched
+# INSERT in the same transaction.
+
+
+class InsufficientFundsError(ValueError):
+    def __init__(self, message: str, user_data_ids: Iterable[int] = ()):
+        super().__init__(message)
+        self.user_data_ids = sorted(user_data_ids)
+
+
+def _expire_loaded_money(db: Session, user_data_ids: Iterable[int]) -> None:
+    # The UPDATEs bypass the identity map; loaded UserData reload money on next access
+    ids = set(user_data_ids)
+    for obj in list(db.identity_map.values()):
+        if isinstance(obj, UserData) and obj.id in ids:
+            db.expire(obj, ["money"])
+
+
+def _write_ledger(db: Session, rows: List[dict]) -> None:
+    for bind_arguments, shard_rows in group_by_shard(db, rows):
+        # Core insert: ORM bulk inserts are not supported by the sharded session
+        db.execute(insert(CurrencyLedgerEntry.__table__), shard_rows, bind_arguments=bind_arguments)
+
+
+@profile_service(query_budget=2)
+def apply_money_delta(db: Session, user_data_id: int, delta: int, reason: str,
+                      reference: Optional[str] = None) -> int:
+    """
+    Adds `delta` (negative to spend) to the player's money atomically and
+    records it in the ledger. Raises InsufficientFundsError if the balance
+    would become negative; nothing is changed in that case.
+    This function does NOT commit the transaction.
+
+    :return: the balance after the change
+    """
+    if delta == 0:
+        raise ValueError("delta must not be zero")
+    balance = db.execute(
+        update(UserData)
+        .where(UserData.id == user_data_id, UserData.money + delta >= 0)
+        .values(money=UserData.money + delta)
+        .returning(UserData.money)
+        .execution_options(synchronize_session=False),
+        bind_arguments=shard_bind_arguments(db, user_data_id),
+    ).scalar()
+    if balance is None:
+        raise InsufficientFundsError(
+            f"UserData {user_data_id} does not exist or cannot pay {-delta}", [user_data_id])
+
+    _write_ledger(db, [{"user_data_id": user_data_id, "delta": delta, "balance_after": balance,
+                        "reason": reason, "reference": reference}])
+    _expire_loaded_money(db, [user_data_id])
+    schedule_leaderboard_refresh(db, user_data_id)
+    return balance
+
+
+def earn_money(db: Session, user_data_id: int, amount: int, reason: str,
+               reference: Optional[str] = None) -> int:
+    if amount <= 0:
+        raise ValueError("amount must be positive")
+    return apply_money_delta(db, user_data_id, amount, reason, reference)
+
+
+def spend_money(db: Session, user_data_id: int, amount: int, reason: str,
+                reference: Optional[str] = None) -> int:
+    if amount <= 0:
+        raise ValueError("amount must be positive")
+    return apply_money_delta(db, user_data_id, -amount, reason, reference)
+
+
+@profile_service
+def settle_money_deltas(db: Session, deltas: Mapping[int, int], reason: str,
+                        reference: Optional[str] = None, allow_partial: bool = False) -> Dict[int, int]:
+    """
+    Applies {user_data_id: delta} for many players with one guarded UPDATE
+    (per player shard, split only at the bind-parameter limit) and one
+    ledger INSERT. Players that do not exist or cannot afford their delta
+    are skipped with allow_partial=True; otherwise InsufficientFundsError is
+    raised and none of the deltas is applied.
+    This function does NOT commit the transaction.
+
+    :return: {user_data_id: balance after} for the players that were updated
+    """
+    rows = [{"user_data_id": user_data_id, "delta": delta}
+            for user_data_id, delta in sorted(deltas.items()) if delta != 0]
+    if not rows:
+        return {}
+
+    balances: Dict[int, int] = {}
+    # A savepoint keeps a rejected all-or-nothing batch from leaving earlier chunks applied.
+    # Session hooks ignore savepoints, so the caller's queued on_commit work
+    # (leaderboard refreshes, invalidations) survives a rejected batch.
+    with db.begin_nested() as savepoint:
+        for bind_arguments, shard_rows in group_by_shard(db, rows):
+            # id appears in the CASE of SET, the CASE of WHERE and the IN list
+            for chunk in chunked(shard_rows, params_per_row=5):
+                balances.update(_settle_chunk(db, chunk, bind_arguments))
+        rejected = {row["user_data_id"] for row in rows} - set(balances)
+        if rejected and not allow_partial:
+            savepoint.rollback()
+            raise InsufficientFundsError(
+                f"{len(rejected)} players do not exist or cannot pay their share", rejected)
+
+    if balances:
+        _write_ledger(db, [{"user_data_id": user_data_id, "delta": deltas[user_data_id],
+                            "balance_after": balance, "reason": reason, "reference": reference}
+                           for user_data_id, balance in balances.items()])
+        _expire_loaded_money(db, balances)
+        schedule_leaderboard_refresh(db, *balances)
+    logging.debug(f"Settled money for {len(balances)} of {len(rows)} players ({reason}).")
+    return balances
+
+
+def _settle_chunk(db: Session, chunk: List[dict], bind_arguments: dict) -> List[Tuple[int, int]]:
+    delta = case({row["user_data_id"]: row["delta"] for row in chunk}, value=UserData.id)
+    return db.execute(
+        update(UserData)
+        .where(UserData.id.in_([row["user_data_id"] for row in chunk]), UserData.money + delta >= 0)
+        .values(money=UserData.money + delta)
+        .returning(UserData.id, UserData.money)
+        .execution_options(synchronize_session=False),
+        bind_arguments=bind_arguments,
+    ).all()
+
+
+@profile_service(query_budget=1)
+def get_ledger(db: Session, user_data_id: int, after_id: int = 0, limit: int = 50) -> List[CurrencyLedgerEntry]:
+    """A player's ledger entries, oldest first, keyset-paginated by id."""
+    return db.scalars(
+        select(CurrencyLedgerEntry)
+        .where(CurrencyLedgerEntry.user_data_id == user_data_id, CurrencyLedgerEntry.id > after_id)
+        .order_by(CurrencyLedgerEntry.id)
+        .limit(limit)
+    ).all()
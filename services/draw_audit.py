@@ -0,0 +1,362 @@
+import atexit
+import glob
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterator, List, Literal, Optional, Protocol
+
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from core_system.models.audit import DrawAuditLog
+from core_system.models.database import SessionLocal
+
+# Draw / outcome audit trail that never blocks the draw path on I/O:
+#   record_draw() -> bounded in-memory ring buffer -> background writer
+#   -> batched INSERTs (DatabaseAuditSink) or rotating gzip JSONL segments (JsonlSegmentSink)
+# When the buffer is full the configured backpressure policy applies:
+#   "drop"  discard the new record and count it
+#   "block" wait (up to block_timeout) for the writer to make room
+#   "spill" append the record to an uncompressed spill file, re-ingested later
+# A batch the sink rejects is put back at the front of the buffer, and a
+# spill file is only deleted once the sink has accepted all of it, so a sink
+# outage delays records instead of losing them.
+
+Backpressure = Literal["drop", "block", "spill"]
+
+
+@dataclass
+class DrawAuditRecord:
+    map_id: Optional[int]
+    event_id: Optional[int]
+    user_data_id: Optional[int] = None
+    area_id: Optional[int] = None
+    event_result_id: Optional[int] = None
+    # {item_id: quantity}
+    rewards: Dict[int, int] = field(default_factory=dict)
+    source: str = "draw"
+    drawn_at: float = field(default_factory=time.time)
+
+    def to_json(self) -> str:
+        data = asdict(self)
+        data["rewards"] = {str(k): v for k, v in self.rewards.items()}
+        return json.dumps(data, separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, line: str) -> "DrawAuditRecord":
+        data = json.loads(line)
+        data["rewards"] = {int(k): v for k, v in (data.get("rewards") or {}).items()}
+        return cls(**data)
+
+
+class AuditSink(Protocol):
+    def write_batch(self, records: List[DrawAuditRecord]) -> None: ...
+
+    def close(self) -> None: ...
+
+
+# ---------------------- Sinks ----------------------
+
+
+class DatabaseAuditSink:
+    """Writes each batch with one executemany INSERT into draw_audit_log."""
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal):
+        self.session_factory = session_factory
+
+    def write_batch(self, records: List[DrawAuditRecord]) -> None:
+        rows = [{
+            "drawn_at": datetime.fromtimestamp(r.drawn_at, tz=timezone.utc),
+            "source": r.source,
+            "user_data_id": r.user_data_id,
+            "map_id": r.map_id,
+            "area_id": r.area_id,
+            "event_id": r.event_id,
+            "event_result_id": r.event_result_id,
+            "rewards": {str(k): v for k, v in r.rewards.items()},
+        } for r in records]
+        with self.session_factory() as session:
+            session.execute(insert(DrawAuditLog), rows)
+            session.commit()
+
+    def close(self) -> None:
+        pass
+
+
+class JsonlSegmentSink:
+    """
+    Appends batches to a gzip JSONL segment and rotates it after
+    `max_records` records or `max_age` seconds. The active segment is named
+    *.jsonl.gz.part and renamed to *.jsonl.gz once complete, so readers only
+    pick up finished segments.
+    """
+
+    def __init__(self, directory: str, prefix: str = "draw-audit",
+                 max_records: int = 100_000, max_age: float = 3600.0):
+        self.directory = directory
+        self.prefix = prefix
+        self.max_records = max_records
+        self.max_age = max_age
+        os.makedirs(directory, exist_ok=True)
+        self._file = None
+        self._path: Optional[str] = None
+        self._opened_at = 0.0
+        self._count = 0
+        self._seq = 0
+
+    def _open(self) -> None:
+        self._seq += 1
+        name = f"{self.prefix}-{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}-{os.getpid()}-{self._seq:04d}.jsonl.gz"
+        self._path = os.path.join(self.directory, name)
+        self._file = gzip.open(self._path + ".part", "wt", encoding="utf-8")
+        self._opened_at = time.monotonic()
+        self._count = 0
+
+    def _rotate(self) -> None:
+        if self._file is None:
+            return
+        self._file.close()
+        os.replace(self._path + ".part", self._path)
+        self._file = None
+
+    def write_batch(self, records: List[DrawAuditRecord]) -> None:
+        if self._file is not None and (self._count >= self.max_records
+                                       or time.monotonic() - self._opened_at >= self.max_age):
+            self._rotate()
+        if self._file is None:
+            self._open()
+        self._file.write("".join(record.to_json() + "\n" for record in records))
+        self._file.flush()
+        self._count += len(records)
+
+    def close(self) -> None:
+        self._rotate()
+
+
+# ---------------------- Pipeline ----------------------
+
+
+class DrawAuditPipeline:
+    def __init__(self,
+                 sink: AuditSink,
+                 capacity: int = 10_000,
+                 batch_size: int = 500,
+                 flush_interval: float = 1.0,
+                 backpressure: Backpressure = "drop",
+                 spill_path: Optional[str] = None,
+                 block_timeout: Optional[float] = None):
+        if backpressure == "spill" and not spill_path:
+            raise ValueError("spill backpressure requires spill_path")
+        self.sink = sink
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.backpressure = backpressure
+        self.spill_path = spill_path
+        self.block_timeout = block_timeout
+
+        self._buffer: deque = deque()
+        self._cond = threading.Condition()
+        self._spill_lock = threading.Lock()
+        self._write_lock = threading.Lock()  # sinks are not thread-safe
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+        self.dropped = 0
+        self.spilled = 0
+        self.written = 0
+
+    def append(self, record: DrawAuditRecord) -> bool:
+        """Queues a record; returns False if it was dropped."""
+        with self._cond:
+            if len(self._buffer) < self.capacity:
+                self._buffer.append(record)
+                if len(self._buffer) >= self.batch_size:
+                    self._cond.notify_all()
+                return True
+            if self.backpressure == "block":
+                self._cond.notify_all()
+                if self._cond.wait_for(lambda: len(self._buffer) < self.capacity or self._stopped,
+                                       timeout=self.block_timeout) and not self._stopped:
+                    self._buffer.append(record)
+                    return True
+                self.dropped += 1
+                return False
+            if self.backpressure == "drop":
+                self.dropped += 1
+                return False
+        self._spill(record)
+        return True
+
+    def _spill(self, record: DrawAuditRecord) -> None:
+        with self._spill_lock:
+            with open(self.spill_path, "a", encoding="utf-8") as f:
+                f.write(record.to_json() + "\n")
+            self.spilled += 1
+
+    def _take_batch(self) -> List[DrawAuditRecord]:
+        with self._cond:
+            batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+            self._cond.notify_all()
+        return batch
+
+    def _requeue(self, batch: List[DrawAuditRecord]) -> None:
+        # Back at the front, in order; may briefly exceed capacity
+        with self._cond:
+            self._buffer.extendleft(reversed(batch))
+
+    def _claim_spill(self) -> Optional[str]:
+        """
+        Returns the spill file to re-ingest: a *.draining left by a failed
+        drain first, otherwise the current spill file renamed to *.draining
+        (spilling continues into a fresh file). None when there is nothing.
+        """
+        draining = self.spill_path + ".draining"
+        with self._spill_lock:
+            if os.path.exists(draining):
+                return draining
+            if not os.path.exists(self.spill_path):
+                return None
+            os.replace(self.spill_path, draining)
+            return draining
+
+    def _drain_spill_file(self, draining: str) -> None:
+        accepted_bytes = 0
+        try:
+            with open(draining, "rb") as f:
+                batch, batch_bytes = [], 0
+                for line in f:
+                    batch.append(DrawAuditRecord.from_json(line.decode("utf-8")))
+                    batch_bytes += len(line)
+                    if len(batch) >= self.batch_size:
+                        self.sink.write_batch(batch)
+                        self.written += len(batch)
+                        accepted_bytes += batch_bytes
+                        batch, batch_bytes = [], 0
+                if batch:
+                    self.sink.write_batch(batch)
+                    self.written += len(batch)
+        except Exception:
+            # Keep only what the sink has not accepted, so the retry neither
+            # loses nor duplicates records
+            if accepted_bytes:
+                with open(draining, "rb") as src, open(draining + ".tmp", "wb") as dst:
+                    src.seek(accepted_bytes)
+                    dst.write(src.read())
+                os.replace(draining + ".tmp", draining)
+            raise
+        os.unlink(draining)
+
+    def _drain_spill(self) -> None:
+        if not self.spill_path:
+            return
+        # At most a leftover from a failed drain plus the current spill file,
+        # so a sustained spill cannot keep the writer here forever
+        for _ in range(2):
+            draining = self._claim_spill()
+            if draining is None:
+                return
+            self._drain_spill_file(draining)
+
+    def flush(self) -> int:
+        """Drains the buffer (and any spill file) into the sink. Returns records written."""
+        with self._write_lock:
+            before = self.written
+            while True:
+                batch = self._take_batch()
+                if not batch:
+                    break
+                try:
+                    self.sink.write_batch(batch)
+                except Exception:
+                    self._requeue(batch)
+                    raise
+                self.written += len(batch)
+            self._drain_spill()
+            return self.written - before
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="draw-audit-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        self.sink.close()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._stopped or len(self._buffer) >= self.batch_size,
+                                    timeout=self.flush_interval)
+                if self._stopped:
+                    return
+            try:
+                self.flush()
+            except Exception:
+                logging.error("Draw audit writer failed to write a batch.", exc_info=True)
+                time.sleep(self.flush_interval)
+
+
+_pipeline: Optional[DrawAuditPipeline] = None
+
+
+def configure_draw_audit(pipeline: Optional[DrawAuditPipeline], start: bool = True) -> None:
+    """Installs (or removes, with None) the process-wide audit pipeline."""
+    global _pipeline
+    previous, _pipeline = _pipeline, pipeline
+    if previous is not None and previous is not pipeline:
+        previous.stop()
+    if pipeline is not None and start:
+        pipeline.start()
+
+
+def record_draw(map_id: Optional[int], event_id: Optional[int], **kwargs) -> None:
+    """Appends a draw to the audit pipeline; a no-op when auditing is not configured."""
+    pipeline = _pipeline
+    if pipeline is not None:
+        pipeline.append(DrawAuditRecord(map_id=map_id, event_id=event_id, **kwargs))
+
+
+# ---------------------- Readers ----------------------
+
+
+def iter_audit_segments(directory: str, prefix: str = "draw-audit") -> Iterator[DrawAuditRecord]:
+    """Streams records from completed gzip segments, oldest segment first."""
+    for path in sorted(glob.glob(os.path.join(directory, f"{prefix}-*.jsonl.gz"))):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                yield DrawAuditRecord.from_json(line)
+
+
+def iter_audit_log(db: Session, after_id: int = 0, chunk_size: int = 1000) -> Iterator:
+    """
+    Streams draw_audit_log rows (plain Row tuples, not ORM objects) in id
+    order using keyset pagination, so memory stays constant.
+    """
+    table = DrawAuditLog.__table__
+    while True:
+        rows = db.execute(
+            select(table)
+            .where(table.c.id > after_id)
+            .order_by(table.c.id)
+            .limit(chunk_size)
+        ).all()
+        if not rows:
+            return
+        yield from rows
+        after_id = rows[-1].id
@@ -0,0 +1,133 @@
+import random
+import threading
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from itertools import accumulate
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from core_system.models.user import UserData
+from core_system.services.content_catalog import ContentCatalog, get_content_catalog, load_content_catalog
+from core_system.utils.profiling import profile_service
+
+# Difficulty-matched encounters: a monster pool's entries are precompiled
+# into arrays sorted by monster power (hp + mp + atk + spd + def_, the same
+# sum as UserData.team_power), with running totals of the entry probabilities
+# in that order. Picking an encounter is then:
+#
+#   1  read the player's materialized team_power
+#   2  bisect the band [power * (1 - band), power * (1 + band)] in the powers
+#   3  bisect a random point in the band's cumulative probabilities
+#
+# No join across characters and monsters. If no monster of the pool falls in
+# the band, the one closest in power is used (EncounterDTO.in_band=False).
+# Compiled pools are cached for the catalog version they came from.
+
+
+@dataclass(frozen=True)
+class _CompiledMonsterPool:
+    powers: Tuple[int, ...]           # ascending
+    monster_ids: Tuple[int, ...]      # parallel to powers
+    cum_weights: Tuple[float, ...]    # running sum of entry probabilities, in power order
+
+
+@dataclass
+class EncounterDTO:
+    monster_id: int
+    monster_power: int
+    team_power: int
+    in_band: bool
+
+
+_compiled_pools: Dict[int, _CompiledMonsterPool] = {}
+_compiled_version: Optional[int] = None
+_compiled_lock = threading.Lock()
+
+
+def monster_power(monster) -> int:
+    return (monster.hp or 0) + (monster.mp or 0) + (monster.atk or 0) + (monster.spd or 0) + (monster.def_ or 0)
+
+
+def _compile_pool(catalog: ContentCatalog, pool_id: int) -> Optional[_CompiledMonsterPool]:
+    pool = catalog.get_monster_pool(pool_id)
+    if pool is None:
+        return None
+    entries = sorted(
+        (monster_power(monster), monster.id, max(probability or 0.0, 0.0))
+        for monster_id, probability in pool.entries
+        for monster in (catalog.get_monster(monster_id),)
+        if monster is not None
+    )
+    return _CompiledMonsterPool(
+        powers=tuple(power for power, _, _ in entries),
+        monster_ids=tuple(monster_id for _, monster_id, _ in entries),
+        cum_weights=tuple(accumulate(weight for _, _, weight in entries)),
+    )
+
+
+def get_compiled_monster_pool(catalog: ContentCatalog, pool_id: int) -> Optional[_CompiledMonsterPool]:
+    global _compiled_version
+    with _compiled_lock:
+        if _compiled_version != catalog.version:
+            _compiled_pools.clear()
+            _compiled_version = catalog.version
+        compiled = _compiled_pools.get(pool_id)
+    if compiled is None:
+        compiled = _compile_pool(catalog, pool_id)
+        if compiled is None:
+            return None
+        with _compiled_lock:
+            if _compiled_version == catalog.version:
+                _compiled_pools[pool_id] = compiled
+    return compiled
+
+
+def pick_monster(pool: _CompiledMonsterPool, power: int, band: float,
+                 rng: random.Random) -> Optional[Tuple[int, int, bool]]:
+    """(monster_id, monster_power, in_band) for `power`, or None for an empty pool."""
+    powers = pool.powers
+    if not powers:
+        return None
+    lo = bisect_left(powers, power * (1 - band))
+    hi = bisect_right(powers, power * (1 + band))
+    if lo == hi:
+        # Nothing in the band: the closest neighbour on either side
+        if lo == len(powers) or (lo > 0 and power - powers[lo - 1] <= powers[lo] - power):
+            lo -= 1
+        return pool.monster_ids[lo], powers[lo], False
+
+    base = pool.cum_weights[lo - 1] if lo else 0.0
+    total = pool.cum_weights[hi - 1] - base
+    if total > 0:
+        index = bisect_right(pool.cum_weights, base + rng.random() * total, lo, hi - 1)
+    else:
+        index = rng.randrange(lo, hi)
+    return pool.monster_ids[index], powers[index], True
+
+
+@profile_service(query_budget=1)
+def select_encounter(db: Session, user_data_id: int, monster_pool_id: int, band: float = 0.25,
+                     rng: Optional[random.Random] = None) -> Optional[EncounterDTO]:
+    """
+    Picks a monster of `monster_pool_id` whose power is within ±band of the
+    player's team_power, weighted by the pool's probabilities.
+    Returns None if the pool has no monsters.
+    """
+    if band < 0:
+        raise ValueError("band must not be negative")
+    catalog = get_content_catalog() or load_content_catalog(db)
+    pool = get_compiled_monster_pool(catalog, monster_pool_id)
+    if pool is None:
+        raise ValueError(f"MonsterPool {monster_pool_id} does not exist")
+
+    team_power = db.scalar(select(UserData.team_power).where(UserData.id == user_data_id))
+    if team_power is None:
+        raise ValueError(f"UserData {user_data_id} does not exist")
+
+    picked = pick_monster(pool, team_power, band, rng or random.Random())
+    if picked is None:
+        return None
+    monster_id, power, in_band = picked
+    return EncounterDTO(monster_id=monster_id, monster_power=power, team_power=team_power, in_band=in_band)
@@ -1,26 +1,50 @@
 import logging
-from typing import List, Optional
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Union
 
 from fastapi import HTTPException
-from sqlalchemy import  select
-from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session, selectinload, undefer_group
 
 from core_system.models.association_tables import MapAreaEventAssociation, MapEventAssociation
 
 from core_system.models.event import (Event, EventResult, GeneralEventLogic,
                                       StoryTextData)
 
+from core_system.services.draw_audit import record_draw
+from core_system.services.content_catalog import (get_content_catalog,
+                                                  schedule_content_catalog_rebuild)
+from core_system.services.map_detail_cache import schedule_all_map_details_invalidation
+from core_system.services.reward_pool_service import delete_orphan_reward_pools
 # NOTE: The MonsterPoolEntry model might need adjustment for the logic in draw_current_map_event
 from core_system.utils.random_utils import weighted_choice
+from core_system.utils.profiling import profile_service
+from core_system.utils.sql_utils import chunked
+
+
+@dataclass(slots=True)
+class EventSummaryDTO:
+    id: int
+    name: str
+    type: str
+
 
 # region event service
+@profile_service(query_budget=1)
 def fetch_events(
     db: Session,
     started_id: Optional[int],
     limit: int,
-    direction: str = "next"
-):
-    query = db.query(Event)
+    direction: str = "next",
+    summary: bool = False,
+) -> Union[List[Event], List[EventSummaryDTO]]:
+    """
+    summary=True 時只查 id / name / type，回傳 EventSummaryDTO 而非 ORM 物件。
+    """
+    if summary:
+        query = db.query(Event.id, Event.name, Event.type)
+    else:
+        query = db.query(Event).options(undefer_group("detail"))
 
     if started_id is not None:
         if direction == "next":
@@ -36,10 +60,13 @@ def fetch_events(
 
     if direction == "prev":
         events.reverse()
+    if summary:
+        return [EventSummaryDTO(*row) for row in events]
 
     return events
 
 
+@profile_service
 def create_event_service(db: Session, name: str, event_type: str, description: str = None):
     event = Event(name=name,
                   type=event_type,
@@ -48,9 +75,11 @@ def create_event_service(db: Session, name: str, event_type: str, description: s
     db.add(event)
     db.flush()
     logging.debug(f'event id: {event.id}')
+    schedule_content_catalog_rebuild(db)
     return event
 
 
+@profile_service
 def edit_event_service(db: Session, event_id: int,
                        story_text: list[StoryTextData],
                        description: str,
@@ -63,39 +92,91 @@ def edit_event_service(db: Session, event_id: int,
         event.description = description
     if name is not None:
         event.name = name
+        # Map details embed event names
+        schedule_all_map_details_invalidation(db)
     if story_text is not None:
         if event.general_logic is None:
             raise ValueError(
                 f"Event ID {event_id} has no associated general_logic.")
         event.general_logic.set_story_text(story_text)
+    schedule_content_catalog_rebuild(db)
     return event
 
 
+@profile_service
 def get_event_by_event_id(db: Session, event_id: int) -> Event:
-    event = db.query(Event).filter(Event.id == event_id).first()
+    """
+    Event detail: the event's description plus its general logic and results
+    with their (deferred) story_text, loaded in three SELECTs.
+    """
+    general_logic = selectinload(Event.general_logic)
+    event = (
+        db.query(Event)
+        .options(
+            undefer_group("detail"),
+            general_logic.undefer_group("detail"),
+            general_logic.selectinload(GeneralEventLogic.event_results).undefer_group("detail"),
+        )
+        .filter(Event.id == event_id)
+        .first()
+    )
     return event
 
 
+@profile_service
 def delete_event(db: Session, event_id: int):
-    event = db.query(Event).filter(Event.id == event_id).first()
-    db.delete(event)
+    bulk_delete_events(db, [event_id])
     return
+
+
+@profile_service
+def bulk_delete_events(db: Session, event_ids: Iterable[int]) -> int:
+    """
+    Set-based delete of events without loading them or their children.
+    ON DELETE CASCADE removes map / area associations and the general logic,
+    which in turn removes its event results; reward pools left without an
+    owner are deleted afterwards.
+    This function does NOT commit the transaction.
+
+    :return: number of events deleted
+    """
+    ids = sorted(set(event_ids))
+    deleted = 0
+    pool_ids = set()
+    for chunk in chunked(ids, params_per_row=1):
+        pool_ids.update(db.scalars(
+            select(EventResult.reward_pool_id)
+            .join(GeneralEventLogic, EventResult.general_event_logic_id == GeneralEventLogic.id)
+            .where(GeneralEventLogic.event_id.in_(chunk), EventResult.reward_pool_id.is_not(None))
+        ))
+        deleted += db.execute(delete(Event).where(Event.id.in_(chunk))).rowcount
+    delete_orphan_reward_pools(db, pool_ids)
+    if deleted:
+        schedule_all_map_details_invalidation(db)
+        schedule_content_catalog_rebuild(db)
+    logging.debug(f"Deleted {deleted} events and {len(pool_ids)} candidate reward pools.")
+    return deleted
 # endregion
 
 
 # region general logic
+@profile_service
 def edit_general_logic(db: Session, general_logic: GeneralEventLogic, story_text_list: list[StoryTextData] = None):
     if story_text_list:  # move to outside
         general_logic.set_story_text(story_text_list)
+        schedule_content_catalog_rebuild(db)
 
+@profile_service
 def create_general_logic(db: Session, event_id: int):
     general_logic = GeneralEventLogic(event_id=event_id,
                                       story_text="[]")
     db.add(general_logic)
     db.flush()
+    schedule_content_catalog_rebuild(db)
     return general_logic
 
 
+@profile_service
 def get_event_associations_for_map(db: Session, map_id: int) -> List[MapEventAssociation]:
     """
     根據 map_id 撈取所有地圖層級的事件關聯（包含機率）。
@@ -124,6 +205,7 @@ def get_event_associations_for_map(db: Session, map_id: int) -> List[MapEventAss
     return associations
 
 
+@profile_service
 def get_event_associations_for_area(db: Session, area_id: int) -> List[MapAreaEventAssociation]:
     """
     根據 area_id 撈取所有區域層級的事件關聯（包含機率）。
@@ -151,12 +233,14 @@ def get_event_associations_for_area(db: Session, area_id: int) -> List[MapAreaEv
 
 
 # region event result
+@profile_service
 def get_event_result(db: Session, event_result_id: int):
-    event_result = db.query(EventResult).filter(
+    event_result = db.query(EventResult).options(undefer_group("detail")).filter(
         EventResult.id == event_result_id).first()
     return event_result
 
 
+@profile_service
 def create_event_result_service(db: Session, name: str, general_event_logic_id: int, reward_pool_id: int = None):
     event_result = EventResult(name=name,
                                reward_pool_id=reward_pool_id,
@@ -164,9 +248,11 @@ def create_event_result_service(db: Session, name: str, general_event_logic_id:
                                )
     db.add(event_result)
     db.flush()
+    schedule_content_catalog_rebuild(db)
     return event_result
 
 
+@profile_service
 def edit_event_result_service(db: Session,name:str, event_result_id: int, prior: int, story_text: list[StoryTextData], condition: list[dict], status_effects_json: list[dict]):
     logging.info(f"Check go to edit_event_result_service")
     event_result = db.query(EventResult).filter(
@@ -182,24 +268,62 @@ def edit_event_result_service(db: Session,name:str, event_result_id: int, prior:
         event_result.set_condition_list(condition)
     if status_effects_json:
         event_result.set_status_effects_json(status_effects_json)
+    schedule_content_catalog_rebuild(db)
     return event_result
 
 
+@profile_service
 def delete_event_result(db: Session, result_id: int):
-    event_result = db.query(EventResult).filter(
-        EventResult.id == result_id).first()
-    db.delete(event_result)
+    bulk_delete_event_results(db, [result_id])
     return
+
+
+@profile_service
+def bulk_delete_event_results(db: Session, result_ids: Iterable[int]) -> int:
+    """
+    Set-based delete of event results. Each result owns its reward pool, so
+    pools no longer referenced by anything are deleted as well.
+    This function does NOT commit the transaction.
+
+    :return: number of event results deleted
+    """
+    ids = sorted(set(result_ids))
+    deleted = 0
+    pool_ids = set()
+    for chunk in chunked(ids, params_per_row=1):
+        pool_ids.update(db.scalars(
+            select(EventResult.reward_pool_id)
+            .where(EventResult.id.in_(chunk), EventResult.reward_pool_id.is_not(None))
+        ))
+        deleted += db.execute(delete(EventResult).where(EventResult.id.in_(chunk))).rowcount
+    delete_orphan_reward_pools(db, pool_ids)
+    if deleted:
+        schedule_content_catalog_rebuild(db)
+    return deleted
 # endregion
 
 
 # region draw event
+@profile_service(query_budget=2)
 def draw_current_map_event(
     db: Session,
     current_map_id: int,
     # current_area_id: int, IN FURTURE 
+    user_data_id: Optional[int] = None,
 ) -> Event:
 
+    # 已載入 content catalog 時，直接用記憶體中的事件池抽選，只需再以主鍵取回被選中的 Event
+    catalog = get_content_catalog()
+    if catalog is not None:
+        event_pool = catalog.get_map_event_pool(current_map_id)
+        if not event_pool:
+            raise HTTPException(status_code=400, detail="No available events to draw")
+        chosen_event_id = weighted_choice(list(event_pool))
+        if chosen_event_id is None:
+            raise HTTPException(status_code=400, detail="No available events to draw")
+        record_draw(current_map_id, chosen_event_id, user_data_id=user_data_id)
+        return db.get(Event, chosen_event_id)
+
     # 3. 撈 map + area event pool（只 active 的）
     map_associations = get_event_associations_for_map(db,current_map_id)
 
@@ -214,5 +338,7 @@ def draw_current_map_event(
         raise HTTPException(status_code=400, detail="No available events to draw")
 
     chosen_template: Event = weighted_choice(candidate_templates)
+    record_draw(current_map_id, chosen_template.id if chosen_template else None,
+                user_data_id=user_data_id)
     return chosen_template
 # endregion
\ No newline at end of file
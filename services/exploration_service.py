@@ -0,0 +1,217 @@
+import json
+import logging
+import random
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from core_system.models.event import StatusEffectData
+from core_system.models.inventory import UserInventoryItem
+from core_system.models.maps import UserMapProgress
+from core_system.models.sharding import shard_bind_arguments
+from core_system.models.user import UserChar, UserData
+from core_system.services.content_catalog import ContentCatalog, get_content_catalog, load_content_catalog
+from core_system.services.draw_audit import record_draw
+from core_system.services.inventory_service import grant_items
+from core_system.services.status_effect_service import apply_status_effects_to_team
+from core_system.utils.profiling import profile_service
+from core_system.utils.random_utils import WeightedPool
+from core_system.utils.sql_utils import upsert_insert
+
+# Idle ("explore while away") exploration: N draws on the player's current
+# map resolved entirely in memory from the content catalog, then persisted
+# with a constant number of statements in the caller's transaction:
+#
+#   1  player's current map + highest character level
+#   1  inventory item ids (only if a candidate result has a has_item condition)
+#   1  grant_items for every reward of the batch
+#   1  map progress upsert (+N)
+#   2  status effects of the resolved results, merged and applied to the team once
+#
+# Per map the event pool and, per event, the result candidates with their
+# compiled reward pools are cached for the catalog version they came from.
+#
+# Result resolution: an event's results are tried highest `prior` first and the
+# first one whose conditions all hold is used. Supported condition keys are
+# "min_level" (highest character level) and "has_item" (item id held);
+# a result with any other condition key is never chosen.
+# Reward roll: each resolved result rolls its reward pool once for one item;
+# if the pool's probabilities sum to less than 1.0 the remainder is "no drop".
+
+
+@dataclass(frozen=True)
+class _CompiledResult:
+    id: int
+    conditions: Tuple[Tuple[str, str], ...]
+    reward_pool: Optional[WeightedPool]
+    status_effects: Tuple[StatusEffectData, ...]
+
+
+@dataclass(frozen=True)
+class _CompiledMap:
+    event_pool: WeightedPool
+    # event_id -> results, highest prior first
+    results: Dict[int, Tuple[_CompiledResult, ...]]
+
+
+@dataclass
+class IdleExplorationResult:
+    map_id: int
+    count: int
+    # {event_id: times drawn}
+    events: Dict[int, int] = field(default_factory=dict)
+    # {event_result_id: times resolved}; draws that matched no result are not listed
+    results: Dict[int, int] = field(default_factory=dict)
+    # {item_id: quantity} granted
+    rewards: Dict[int, int] = field(default_factory=dict)
+    # {user_char_id: stored status_effects} after the write, empty if none applied
+    status_effects: Dict[int, dict] = field(default_factory=dict)
+
+
+_compiled_maps: Dict[int, _CompiledMap] = {}
+_compiled_version: Optional[int] = None
+_compiled_lock = threading.Lock()
+
+
+def _compile_result(catalog: ContentCatalog, record) -> _CompiledResult:
+    conditions = tuple(
+        (condition.get("condition_key"), str(condition.get("condition_value")))
+        for condition in json.loads(record.condition_json or "[]")
+        if condition.get("condition_key")
+    )
+    pool_record = catalog.get_reward_pool(record.reward_pool_id) if record.reward_pool_id else None
+    reward_pool = WeightedPool(pool_record.items, capacity=1.0) if pool_record and pool_record.items else None
+    status_effects = tuple(
+        StatusEffectData(**effect) for effect in json.loads(record.status_effects_json or "[]"))
+    return _CompiledResult(record.id, conditions, reward_pool, status_effects)
+
+
+def _compile_map(catalog: ContentCatalog, map_id: int) -> _CompiledMap:
+    event_pool = catalog.get_map_event_pool(map_id)
+    results = {}
+    for event_id, _ in event_pool:
+        event = catalog.get_event(event_id)
+        if event is not None:
+            results[event_id] = tuple(_compile_result(catalog, record) for record in event.results)
+    return _CompiledMap(WeightedPool(event_pool), results)
+
+
+def get_compiled_map(catalog: ContentCatalog, map_id: int) -> _CompiledMap:
+    global _compiled_version
+    with _compiled_lock:
+        if _compiled_version != catalog.version:
+            _compiled_maps.clear()
+            _compiled_version = catalog.version
+        compiled = _compiled_maps.get(map_id)
+    if compiled is None:
+        compiled = _compile_map(catalog, map_id)
+        with _compiled_lock:
+            if _compiled_version == catalog.version:
+                _compiled_maps[map_id] = compiled
+    return compiled
+
+
+def _conditions_hold(conditions: Tuple[Tuple[str, str], ...], max_level: int, held_items: frozenset) -> bool:
+    for key, value in conditions:
+        try:
+            if key == "min_level":
+                ok = max_level >= int(value)
+            elif key == "has_item":
+                ok = int(value) in held_items
+            else:
+                ok = False
+        except ValueError:
+            ok = False
+        if not ok:
+            return False
+    return True
+
+
+@profile_service(query_budget=6)
+def run_idle_exploration(db: Session, user_data_id: int, count: int,
+                         rng: Optional[random.Random] = None) -> IdleExplorationResult:
+    """
+    Runs `count` explorations of the player's current map in one batch: draws
+    the events, resolves each event's result, rolls the result's reward pool,
+    and persists the aggregated rewards, map progress and status effects.
+    Each draw is also sent to the draw audit pipeline (source "idle").
+    This function does NOT commit the transaction.
+    """
+    if count <= 0:
+        raise ValueError("count must be positive")
+    rng = rng or random.Random()
+    catalog = get_content_catalog() or load_content_catalog(db)
+
+    max_level = (
+        select(func.max(UserChar.level))
+        .where(UserChar.user_data_id == user_data_id)
+        .scalar_subquery()
+    )
+    player = db.execute(
+        select(UserData.current_map_id, func.coalesce(max_level, 0))
+        .where(UserData.id == user_data_id)
+    ).first()
+    if player is None:
+        raise ValueError(f"UserData {user_data_id} does not exist")
+    map_id, level = player
+    if map_id is None:
+        raise ValueError(f"UserData {user_data_id} is not on a map")
+
+    compiled = get_compiled_map(catalog, map_id)
+    if not compiled.event_pool:
+        raise HTTPException(status_code=400, detail="No available events to draw")
+
+    held_items = frozenset()
+    if any(key == "has_item" for results in compiled.results.values()
+           for result in results for key, _ in result.conditions):
+        held_items = frozenset(db.scalars(
+            select(UserInventoryItem.item_id)
+            .where(UserInventoryItem.user_data_id == user_data_id, UserInventoryItem.quantity > 0)
+        ))
+
+    # Conditions only depend on the player, so each drawn event resolves once per batch
+    drawn = compiled.event_pool.draw_many(count, rng)
+    resolved: Dict[int, Optional[_CompiledResult]] = {}
+    for event_id in set(drawn):
+        resolved[event_id] = next(
+            (result for result in compiled.results.get(event_id, ())
+             if _conditions_hold(result.conditions, level, held_items)), None)
+
+    outcome = IdleExplorationResult(map_id=map_id, count=count, events=dict(Counter(drawn)))
+    rewards = Counter()
+    status_effects: List[StatusEffectData] = []
+    for event_id in drawn:
+        result = resolved[event_id]
+        reward = result.reward_pool.draw(rng) if result is not None and result.reward_pool else None
+        if reward is not None:
+            rewards[reward] += 1
+        record_draw(map_id, event_id, user_data_id=user_data_id,
+                    event_result_id=result.id if result else None,
+                    rewards={reward: 1} if reward is not None else {}, source="idle")
+    for event_id, times in outcome.events.items():
+        result = resolved[event_id]
+        if result is not None:
+            outcome.results[result.id] = outcome.results.get(result.id, 0) + times
+            status_effects.extend(result.status_effects)
+
+    if rewards:
+        outcome.rewards = grant_items(db, user_data_id, rewards.items())
+
+    table = UserMapProgress.__table__
+    stmt = upsert_insert(db, table).values(user_data_id=user_data_id, map_id=map_id, progress=count)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.user_data_id, table.c.map_id],
+        set_={"progress": table.c.progress + stmt.excluded.progress},
+    )
+    db.execute(stmt, bind_arguments=shard_bind_arguments(db, user_data_id))
+
+    if status_effects:
+        outcome.status_effects = apply_status_effects_to_team(db, user_data_id, status_effects)
+    logging.debug(f"Idle exploration of map {map_id} x{count} for user_data_id {user_data_id}: "
+                  f"{sum(outcome.rewards.values())} items.")
+    return outcome
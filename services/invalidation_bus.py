@@ -0,0 +1,207 @@
+import atexit
+import logging
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import delete, event, func, insert, or_, select
+from sqlalchemy.orm import Session
+
+from core_system.models.database import SessionLocal
+from core_system.models.invalidation import ContentInvalidation
+from core_system.utils.session_hooks import in_savepoint
+
+# Cross-process invalidation of the in-process content caches (catalog, map
+# details, movement graph, NPC defaults, ...).
+#
+# The cache modules already drop their own entries after an edit commits
+# (on_commit hooks); that only reaches the process that made the edit. They
+# also publish the edit here, and the message is written to
+# content_invalidations in the edit's own transaction:
+#
+#   publish_invalidation(db, "map_detail", map_id)   # one row per (entity, id)
+#   publish_invalidation(db, "content_catalog")      # entity_id NULL = everything
+#
+# so a message exists exactly when the edit committed. Every worker runs an
+# InvalidationSubscriber that polls `id > last_seen_id` (a primary key range
+# read, normally empty) and calls the handlers the cache modules registered
+# for each entity. Messages published by this process are skipped; they were
+# already handled by its on_commit hooks.
+#
+# Ids can become visible out of order when transactions commit concurrently,
+# so ids skipped over by a poll are re-checked until they show up or
+# gap_timeout passes (a rolled-back insert leaves a permanent gap).
+
+ALL = None  # entity_id meaning "every entry of this entity"
+
+Handler = Callable[[Optional[Set[int]]], None]
+
+PROCESS_TOKEN = uuid.uuid4().hex
+
+_PENDING_INFO_KEY = "pending_content_invalidations"
+_handlers: Dict[str, List[Handler]] = defaultdict(list)
+
+
+def register_invalidation_handler(entity: str, handler: Handler) -> None:
+    """
+    Registers `handler(entity_ids)` for messages about `entity` published by
+    other processes. entity_ids is the set of ids named since the last poll,
+    or None if any message invalidated the whole entity.
+    """
+    _handlers[entity].append(handler)
+
+
+def publish_invalidation(db: Session, entity: str, *entity_ids: int) -> None:
+    """
+    Queues an invalidation message; it is inserted right before `db` commits,
+    deduplicated per transaction. Without ids the whole entity is invalidated.
+    This function does NOT commit the transaction.
+    """
+    pending = db.info.setdefault(_PENDING_INFO_KEY, set())
+    pending.update((entity, entity_id) for entity_id in entity_ids or (ALL,))
+
+
+@event.listens_for(Session, "before_commit")
+def _write_pending_invalidations(session: Session):
+    if in_savepoint(session):
+        return
+    pending = session.info.pop(_PENDING_INFO_KEY, None)
+    if not pending:
+        return
+    # An entity-wide message makes the per-id ones redundant
+    whole = {entity for entity, entity_id in pending if entity_id is ALL}
+    rows = [{"entity": entity, "entity_id": entity_id, "source": PROCESS_TOKEN}
+            for entity, entity_id in sorted(pending, key=lambda p: (p[0], p[1] or 0))
+            if entity_id is ALL or entity not in whole]
+    session.execute(insert(ContentInvalidation.__table__), rows)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_pending_invalidations(session: Session):
+    if in_savepoint(session):
+        return
+    session.info.pop(_PENDING_INFO_KEY, None)
+
+
+def prune_content_invalidations(db: Session, keep: timedelta = timedelta(days=1)) -> int:
+    """
+    Deletes messages older than `keep`. Subscribers only need rows newer than
+    their last poll. This function does NOT commit the transaction.
+    """
+    cutoff = datetime.now(timezone.utc) - keep
+    return db.execute(delete(ContentInvalidation).where(ContentInvalidation.created_at < cutoff)).rowcount
+
+
+class InvalidationSubscriber:
+    def __init__(self,
+                 session_factory: Callable[[], Session] = SessionLocal,
+                 poll_interval: float = 1.0,
+                 gap_timeout: float = 30.0,
+                 max_gaps: int = 1000):
+        self.session_factory = session_factory
+        self.poll_interval = poll_interval
+        self.gap_timeout = gap_timeout
+        self.max_gaps = max_gaps
+
+        self._lock = threading.Lock()  # serializes polls
+        self.last_id: Optional[int] = None
+        # skipped id -> monotonic deadline
+        self._gaps: Dict[int, float] = {}
+        self.received = 0
+
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _read(self, db: Session, last_id: int, gaps: Iterable[int]):
+        condition = ContentInvalidation.id > last_id
+        gaps = list(gaps)
+        if gaps:
+            condition = or_(condition, ContentInvalidation.id.in_(gaps))
+        return db.execute(
+            select(ContentInvalidation.id, ContentInvalidation.entity,
+                   ContentInvalidation.entity_id, ContentInvalidation.source)
+            .where(condition)
+            .order_by(ContentInvalidation.id)
+        ).all()
+
+    def poll(self) -> int:
+        """
+        Reads the messages committed since the last poll and runs their
+        handlers. The first poll only records the current position.
+
+        :return: number of messages from other processes that were handled
+        """
+        with self._lock:
+            with self.session_factory() as db:
+                if self.last_id is None:
+                    self.last_id = db.scalar(select(func.coalesce(func.max(ContentInvalidation.id), 0)))
+                    return 0
+                rows = self._read(db, self.last_id, self._gaps)
+
+            now = time.monotonic()
+            targets: Dict[str, Optional[Set[int]]] = {}
+            handled = 0
+            for message_id, entity, entity_id, source in rows:
+                if message_id in self._gaps:
+                    del self._gaps[message_id]
+                elif message_id > self.last_id:
+                    for skipped in range(self.last_id + 1, message_id):
+                        if len(self._gaps) >= self.max_gaps:
+                            break
+                        self._gaps[skipped] = now + self.gap_timeout
+                    self.last_id = message_id
+                if source == PROCESS_TOKEN:
+                    continue
+                handled += 1
+                if entity_id is ALL:
+                    targets[entity] = ALL
+                elif entity not in targets or targets[entity] is not ALL:
+                    targets.setdefault(entity, set()).add(entity_id)
+            for skipped in [i for i, deadline in self._gaps.items() if deadline <= now]:
+                del self._gaps[skipped]
+
+        for entity, entity_ids in targets.items():
+            for handler in _handlers.get(entity, ()):
+                try:
+                    handler(entity_ids)
+                except Exception:
+                    logging.error(f"Invalidation handler for {entity!r} failed.", exc_info=True)
+        self.received += handled
+        if handled:
+            logging.debug(f"Applied {handled} content invalidations from other workers.")
+        return handled
+
+    # ---------------------- Background polling ----------------------
+
+    def start(self) -> None:
+        """
+        Records the current position and starts polling. Start it before
+        filling the caches, so no edit falls between the load and the first poll.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self.poll()
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="invalidation-subscriber", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.poll_interval):
+            try:
+                self.poll()
+            except Exception:
+                logging.error("Polling content invalidations failed.", exc_info=True)
+
+
+# Process-wide subscriber; each worker calls invalidation_subscriber.start() at startup
+invalidation_subscriber = InvalidationSubscriber()
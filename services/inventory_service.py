@@ -0,0 +1,122 @@
+import logging
+from collections import Counter
+from typing import Dict, Iterable, Tuple
+
+from sqlalchemy import case, select, update
+from sqlalchemy.orm import Session
+
+from core_system.models.inventory import UserInventoryItem
+from core_system.models.sharding import group_by_shard
+from core_system.utils.sql_utils import MAX_BIND_PARAMS, chunked, upsert_insert
+from core_system.utils.profiling import profile_service
+
+
+class InsufficientItemsError(ValueError):
+    pass
+
+
+def aggregate_rewards(rewards: Iterable[Tuple[int, int]]) -> Dict[int, int]:
+    """
+    Sums (item_id, quantity) pairs by item so that a batch of drops becomes
+    one row per distinct item. Non-positive quantities are dropped.
+    """
+    totals = Counter()
+    for item_id, quantity in rewards:
+        totals[item_id] += quantity
+    return {item_id: quantity for item_id, quantity in totals.items() if quantity > 0}
+
+
+@profile_service
+def get_inventory(db: Session, user_data_id: int) -> Dict[int, int]:
+    """Returns {item_id: quantity} for every item the player holds."""
+    rows = db.execute(
+        select(UserInventoryItem.item_id, UserInventoryItem.quantity)
+        .where(UserInventoryItem.user_data_id == user_data_id,
+               UserInventoryItem.quantity > 0)
+    ).all()
+    return dict(rows)
+
+
+@profile_service
+def grant_items_bulk(db: Session, grants: Iterable[Tuple[int, int, int]]) -> Dict[Tuple[int, int], int]:
+    """
+    Grants (user_data_id, item_id, quantity) triples for any number of players.
+    The batch is aggregated in memory and applied as a single
+    INSERT ... ON CONFLICT DO UPDATE SET quantity = quantity + excluded.quantity
+    (split only if it would exceed the bind-parameter limit, or per player
+    shard when sharding is enabled).
+    This function does NOT commit the transaction.
+
+    :return: the aggregated {(user_data_id, item_id): quantity} that was applied.
+    """
+    totals = Counter()
+    for user_data_id, item_id, quantity in grants:
+        totals[(user_data_id, item_id)] += quantity
+    rows = [
+        {"user_data_id": user_data_id, "item_id": item_id, "quantity": quantity}
+        for (user_data_id, item_id), quantity in totals.items() if quantity > 0
+    ]
+    if not rows:
+        return {}
+
+    table = UserInventoryItem.__table__
+    for bind_arguments, shard_rows in group_by_shard(db, rows):
+        for chunk in chunked(shard_rows, params_per_row=3):
+            stmt = upsert_insert(db, table).values(chunk)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.user_data_id, table.c.item_id],
+                set_={"quantity": table.c.quantity + stmt.excluded.quantity},
+            )
+            db.execute(stmt, bind_arguments=bind_arguments)
+    logging.debug(f"Granted {len(rows)} aggregated inventory rows.")
+    return {(row["user_data_id"], row["item_id"]): row["quantity"] for row in rows}
+
+
+@profile_service(query_budget=1)
+def grant_items(db: Session, user_data_id: int, rewards: Iterable[Tuple[int, int]]) -> Dict[int, int]:
+    """
+    Grants a batch of (item_id, quantity) rewards to one player in one statement,
+    e.g. every drop of a farming run. This function does NOT commit the transaction.
+
+    :return: the aggregated {item_id: quantity} that was applied.
+    """
+    totals = aggregate_rewards(rewards)
+    grant_items_bulk(db, ((user_data_id, item_id, quantity) for item_id, quantity in totals.items()))
+    return totals
+
+
+@profile_service(query_budget=3)
+def consume_items(db: Session, user_data_id: int, costs: Iterable[Tuple[int, int]]) -> Dict[int, int]:
+    """
+    Removes a batch of (item_id, quantity) from a player's inventory with one
+    UPDATE guarded by `quantity >= cost`. If any item is missing or short,
+    nothing is consumed and InsufficientItemsError is raised.
+    This function does NOT commit the transaction.
+    """
+    totals = aggregate_rewards(costs)
+    if not totals:
+        return {}
+    # user_data_id, the IN list, and the CASE (a WHEN/THEN pair per item plus
+    # ELSE) rendered in both the WHERE and the SET: 5 binds per item plus 3
+    if len(totals) * 5 + 3 > MAX_BIND_PARAMS:
+        raise ValueError("Too many distinct items to consume in one call")
+
+    cost = case(totals, value=UserInventoryItem.item_id, else_=0)
+    stmt = (
+        update(UserInventoryItem)
+        .where(UserInventoryItem.user_data_id == user_data_id,
+               UserInventoryItem.item_id.in_(totals),
+               UserInventoryItem.quantity >= cost)
+        .values(quantity=UserInventoryItem.quantity - cost)
+        .execution_options(synchronize_session=False)
+    )
+    # A savepoint keeps the partial update from sticking when some rows are short.
+    # Session hooks ignore savepoints, so the caller's queued on_commit work is
+    # neither run early nor dropped when this raises.
+    with db.begin_nested():
+        result = db.execute(stmt)
+        if result.rowcount != len(totals):
+            raise InsufficientItemsError(
+                f"User data {user_data_id} does not hold enough of items {sorted(totals)}")
+    logging.debug(f"Consumed {len(totals)} item kinds for user_data_id {user_data_id}.")
+    return totals
@@ -0,0 +1,246 @@
+import logging
+import math
+import threading
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple, Union
+
+from core_system.services.content_catalog import ItemRecord, get_content_catalog
+
+# In-memory secondary indexes over the item catalog for shop / crafting filters:
+#   hash indexes   item_type -> sorted ids, slot -> sorted ids
+#   sorted arrays  (value, id) for rarity, price, atk_bonus, def_bonus range queries
+# A query drives from the most selective index and checks the remaining
+# predicates against the record itself, so cost scales with the smallest
+# candidate set rather than the catalog size.
+#
+# The index follows the content catalog. A catalog rebuild that leaves the
+# items unchanged reuses the previous catalog's item mapping, so the index
+# only re-diffs items when an item actually changed.
+
+RANGE_FIELDS = ("rarity", "price", "atk_bonus", "def_bonus")
+
+Range = Tuple[Optional[int], Optional[int]]  # inclusive (min, max); None = unbounded
+
+
+class ItemIndex:
+    def __init__(self, records: Union[Mapping[int, ItemRecord], Iterable[ItemRecord]] = (),
+                 catalog_version: Optional[int] = None):
+        self.catalog_version = catalog_version
+        # The id -> record mapping last loaded or synced, if given one
+        self._source: Optional[Mapping[int, ItemRecord]] = None
+        if isinstance(records, Mapping):
+            self._source, records = records, records.values()
+        self._records: Dict[int, ItemRecord] = {}
+        self._all_ids: List[int] = []
+        self._by_type: Dict[str, List[int]] = {}
+        self._by_slot: Dict[str, List[int]] = {}
+        self._sorted: Dict[str, List[Tuple[int, int]]] = {field: [] for field in RANGE_FIELDS}
+        self._lock = threading.RLock()
+        self._bulk_load(records)
+
+    def _bulk_load(self, records: Iterable[ItemRecord]):
+        for record in records:
+            self._records[record.id] = record
+        self._all_ids = sorted(self._records)
+        for item_id in self._all_ids:
+            record = self._records[item_id]
+            if record.item_type is not None:
+                self._by_type.setdefault(record.item_type, []).append(item_id)
+            if record.slot is not None:
+                self._by_slot.setdefault(record.slot, []).append(item_id)
+            for field in RANGE_FIELDS:
+                value = getattr(record, field)
+                if value is not None:
+                    self._sorted[field].append((value, item_id))
+        for keys in self._sorted.values():
+            keys.sort()
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def get(self, item_id: int) -> Optional[ItemRecord]:
+        return self._records.get(item_id)
+
+    # ---------------------- Incremental maintenance ----------------------
+
+    @staticmethod
+    def _discard(ids: List, key) -> None:
+        index = bisect_left(ids, key)
+        if index < len(ids) and ids[index] == key:
+            del ids[index]
+
+    def remove(self, item_id: int) -> None:
+        with self._lock:
+            record = self._records.pop(item_id, None)
+            if record is None:
+                return
+            self._discard(self._all_ids, item_id)
+            if record.item_type is not None:
+                self._discard(self._by_type.get(record.item_type, []), item_id)
+            if record.slot is not None:
+                self._discard(self._by_slot.get(record.slot, []), item_id)
+            for field in RANGE_FIELDS:
+                value = getattr(record, field)
+                if value is not None:
+                    self._discard(self._sorted[field], (value, item_id))
+
+    def upsert(self, record: ItemRecord) -> None:
+        with self._lock:
+            if self._records.get(record.id) == record:
+                return
+            self.remove(record.id)
+            self._records[record.id] = record
+            insort(self._all_ids, record.id)
+            if record.item_type is not None:
+                insort(self._by_type.setdefault(record.item_type, []), record.id)
+            if record.slot is not None:
+                insort(self._by_slot.setdefault(record.slot, []), record.id)
+            for field in RANGE_FIELDS:
+                value = getattr(record, field)
+                if value is not None:
+                    insort(self._sorted[field], (value, record.id))
+
+    def sync(self, records: Mapping[int, ItemRecord], catalog_version: Optional[int] = None) -> int:
+        """
+        Brings the index in line with `records` (id -> record), touching only
+        items that were added, changed or removed. Returns the number of changes.
+        """
+        changed = 0
+        with self._lock:
+            if records is self._source:
+                # Catalog rebuilt without item changes
+                self.catalog_version = catalog_version
+                return 0
+            for item_id in [i for i in self._records if i not in records]:
+                self.remove(item_id)
+                changed += 1
+            for item_id, record in records.items():
+                if self._records.get(item_id) != record:
+                    self.upsert(record)
+                    changed += 1
+            self._source = records
+            self.catalog_version = catalog_version
+        return changed
+
+    # ---------------------- Query ----------------------
+
+    def _range_slice(self, field: str, bounds: Range) -> Tuple[int, int]:
+        keys = self._sorted[field]
+        low, high = bounds
+        start = 0 if low is None else bisect_left(keys, (low,))
+        stop = len(keys) if high is None else bisect_right(keys, (high, math.inf))
+        return start, max(start, stop)
+
+    def query(self,
+              item_type: Optional[str] = None,
+              slot: Optional[str] = None,
+              rarity: Optional[Range] = None,
+              price: Optional[Range] = None,
+              atk_bonus: Optional[Range] = None,
+              def_bonus: Optional[Range] = None,
+              after_id: Optional[int] = None,
+              limit: int = 50) -> List[ItemRecord]:
+        """
+        Returns up to `limit` items matching every given filter, ordered by id
+        and starting after `after_id` (same cursor semantics as fetch_items).
+        """
+        ranges = {field: bounds for field, bounds in
+                  (("rarity", rarity), ("price", price), ("atk_bonus", atk_bonus), ("def_bonus", def_bonus))
+                  if bounds is not None}
+
+        with self._lock:
+            # Pick the smallest candidate set to drive the scan
+            driver_ids: Optional[List[int]] = self._all_ids
+            driver_range: Optional[str] = None
+            driver_size = len(self._all_ids)
+            if item_type is not None:
+                ids = self._by_type.get(item_type, [])
+                if len(ids) < driver_size:
+                    driver_ids, driver_size = ids, len(ids)
+            if slot is not None:
+                ids = self._by_slot.get(slot, [])
+                if len(ids) < driver_size:
+                    driver_ids, driver_size = ids, len(ids)
+            for field, bounds in ranges.items():
+                start, stop = self._range_slice(field, bounds)
+                if stop - start < driver_size:
+                    driver_ids, driver_range, driver_size = None, field, stop - start
+                    driver_slice = (start, stop)
+
+            def matches(record: ItemRecord) -> bool:
+                if item_type is not None and record.item_type != item_type:
+                    return False
+                if slot is not None and record.slot != slot:
+                    return False
+                for field, (low, high) in ranges.items():
+                    value = getattr(record, field)
+                    if value is None or (low is not None and value < low) or (high is not None and value > high):
+                        return False
+                return True
+
+            results: List[ItemRecord] = []
+            if driver_range is None:
+                # Id-ordered driver: resume at the cursor and stop once the page is full
+                start = 0 if after_id is None else bisect_right(driver_ids, after_id)
+                for position in range(start, len(driver_ids)):
+                    record = self._records[driver_ids[position]]
+                    if matches(record):
+                        results.append(record)
+                        if len(results) >= limit:
+                            break
+                return results
+
+            # Range driver: candidates come out in value order, so sort the matches by id
+            start, stop = driver_slice
+            candidate_ids = sorted(
+                item_id for _, item_id in self._sorted[driver_range][start:stop]
+                if after_id is None or item_id > after_id
+            )
+            for item_id in candidate_ids:
+                record = self._records[item_id]
+                if matches(record):
+                    results.append(record)
+                    if len(results) >= limit:
+                        break
+            return results
+
+
+_item_index: Optional[ItemIndex] = None
+_item_index_lock = threading.Lock()
+
+
+def get_item_index() -> ItemIndex:
+    """
+    Returns the process-wide item index, building it from the content catalog
+    on first use and syncing it incrementally whenever the catalog version changes.
+    """
+    global _item_index
+    catalog = get_content_catalog()
+    if catalog is None:
+        raise RuntimeError("Content catalog is not loaded; call load_content_catalog() at startup")
+    with _item_index_lock:
+        if _item_index is None:
+            _item_index = ItemIndex(catalog.items, catalog_version=catalog.version)
+            logging.info(f"Item index built with {len(_item_index)} items.")
+        elif _item_index.catalog_version != catalog.version:
+            changed = _item_index.sync(catalog.items, catalog_version=catalog.version)
+            logging.debug(f"Item index synced to catalog v{catalog.version}: {changed} changes.")
+    return _item_index
+
+
+def search_items(
+    item_type: Optional[str] = None,
+    slot: Optional[str] = None,
+    rarity: Optional[Range] = None,
+    price: Optional[Range] = None,
+    atk_bonus: Optional[Range] = None,
+    def_bonus: Optional[Range] = None,
+    started_id: Optional[int] = None,
+    limit: int = 50,
+) -> List[ItemRecord]:
+    """Shop / crafting filter over the in-memory item index. Ranges are inclusive (min, max)."""
+    return get_item_index().query(
+        item_type=item_type, slot=slot, rarity=rarity, price=price,
+        atk_bonus=atk_bonus, def_bonus=def_bonus, after_id=started_id, limit=limit,
+    )
+
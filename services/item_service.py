@@ -4,8 +4,10 @@ from fastapi import HTTPException
 from sqlalchemy.orm import Session
 from typing import Optional
 from core_system.models import Item
+from core_system.utils.profiling import profile_service
 
 
+@profile_service(query_budget=1)
 def fetch_items(
     db: Session,
     item_type: Optional[str],
@@ -37,6 +39,7 @@ def fetch_items(
     return items
 
 
+@profile_service
 def get_item_by_id(db: Session, item_id: int) -> Item:
     item = db.query(Item).filter(Item.id == item_id).first()
     if not item:
@@ -0,0 +1,357 @@
+import atexit
+import logging
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import delete, event, func, insert, select
+from sqlalchemy.orm import Session, object_session
+
+from core_system.models.database import SessionLocal
+from core_system.models.leaderboard import LeaderboardSnapshot
+from core_system.models.sharding import per_shard_bind_arguments
+from core_system.models.user import UserChar, UserData
+from core_system.services import team_power_service  # noqa: F401  (keeps UserData.team_power current)
+from core_system.utils.session_hooks import on_commit
+from core_system.utils.skiplist import IndexableSkipList
+from core_system.utils.sql_utils import chunked
+
+# In-memory leaderboards, maintained incrementally:
+#   money       UserData.money
+#   max_level   highest UserChar.level the player owns
+#   team_power  UserData.team_power (sum of hp + mp + atk + spd + def_ over the current team)
+#
+# Each board is an indexable skip list keyed by (-score, user_data_id), so
+# updates and rank lookups are O(log n) and page views never touch the DB.
+# Changes are picked up after commit: services (and the ORM attribute
+# listeners below) call schedule_leaderboard_refresh(), which re-reads the
+# scores of just those players once the transaction commits. Core UPDATEs
+# are invisible to the listeners and must schedule the refresh themselves.
+# Boards are built at startup with load_leaderboards() and can be persisted
+# periodically to leaderboard_snapshots by LeaderboardSnapshotter.
+
+BOARDS = ("money", "max_level", "team_power")
+
+_PENDING_INFO_KEY = "leaderboard_pending_refresh"
+
+
+@dataclass
+class LeaderboardEntry:
+    rank: int  # 1 = 第一名
+    user_data_id: int
+    score: int
+
+
+class Leaderboard:
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.RLock()
+        self._scores: Dict[int, int] = {}
+        self._ranking: IndexableSkipList = IndexableSkipList()
+        # Bumped on every change; the snapshotter skips boards that did not change
+        self.version = 0
+
+    @staticmethod
+    def _key(user_data_id: int, score: int) -> Tuple[int, int]:
+        # Higher score first; ties broken by the older (smaller) user_data_id
+        return (-score, user_data_id)
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def load(self, scores: Iterable[Tuple[int, int]]) -> None:
+        """Replaces the board's contents with (user_data_id, score) pairs."""
+        scores = {user_data_id: int(score) for user_data_id, score in scores}
+        ranking = IndexableSkipList.from_sorted(
+            sorted(self._key(user_data_id, score) for user_data_id, score in scores.items()))
+        with self._lock:
+            self._scores, self._ranking = scores, ranking
+            self.version += 1
+
+    def update(self, user_data_id: int, score: int) -> None:
+        score = int(score)
+        with self._lock:
+            previous = self._scores.get(user_data_id)
+            if previous == score:
+                return
+            if previous is not None:
+                self._ranking.remove(self._key(user_data_id, previous))
+            self._ranking.insert(self._key(user_data_id, score))
+            self._scores[user_data_id] = score
+            self.version += 1
+
+    def remove(self, user_data_id: int) -> None:
+        with self._lock:
+            previous = self._scores.pop(user_data_id, None)
+            if previous is not None:
+                self._ranking.remove(self._key(user_data_id, previous))
+                self.version += 1
+
+    def score(self, user_data_id: int) -> Optional[int]:
+        return self._scores.get(user_data_id)
+
+    def rank(self, user_data_id: int) -> Optional[int]:
+        """1-based rank, or None if the player is not on the board."""
+        with self._lock:
+            score = self._scores.get(user_data_id)
+            if score is None:
+                return None
+            return self._ranking.index(self._key(user_data_id, score)) + 1
+
+    def page(self, offset: int = 0, limit: int = 20) -> List[LeaderboardEntry]:
+        with self._lock:
+            entries = []
+            for position, (neg_score, user_data_id) in enumerate(self._ranking.iter_from(offset), start=offset):
+                if len(entries) >= limit:
+                    break
+                entries.append(LeaderboardEntry(rank=position + 1, user_data_id=user_data_id, score=-neg_score))
+            return entries
+
+    def around(self, user_data_id: int, radius: int = 5) -> List[LeaderboardEntry]:
+        """The player's entry with up to `radius` neighbours on each side."""
+        rank = self.rank(user_data_id)
+        if rank is None:
+            return []
+        start = max(0, rank - 1 - radius)
+        return self.page(start, rank - 1 - start + radius + 1)
+
+    def entries(self) -> List[LeaderboardEntry]:
+        with self._lock:
+            return self.page(0, len(self._scores))
+
+
+leaderboards: Dict[str, Leaderboard] = {name: Leaderboard(name) for name in BOARDS}
+
+
+def get_leaderboard(board: str) -> Leaderboard:
+    try:
+        return leaderboards[board]
+    except KeyError:
+        raise ValueError(f"Unknown leaderboard '{board}'") from None
+
+
+def get_leaderboard_page(board: str, offset: int = 0, limit: int = 20) -> List[LeaderboardEntry]:
+    return get_leaderboard(board).page(offset, limit)
+
+
+def get_user_rank(board: str, user_data_id: int) -> Optional[LeaderboardEntry]:
+    leaderboard = get_leaderboard(board)
+    rank = leaderboard.rank(user_data_id)
+    if rank is None:
+        return None
+    return LeaderboardEntry(rank=rank, user_data_id=user_data_id, score=leaderboard.score(user_data_id))
+
+
+# ---------------------- Scores from the database ----------------------
+
+
+def _scores_select():
+    max_level = (
+        select(func.max(UserChar.level))
+        .where(UserChar.user_data_id == UserData.id)
+        .scalar_subquery()
+    )
+    return select(UserData.id, UserData.money, func.coalesce(max_level, 0), UserData.team_power)
+
+
+def _apply_scores(rows) -> None:
+    for user_data_id, money, max_level, team_power in rows:
+        leaderboards["money"].update(user_data_id, money or 0)
+        leaderboards["max_level"].update(user_data_id, max_level)
+        leaderboards["team_power"].update(user_data_id, team_power)
+
+
+def iter_all_scores(db: Session, chunk_size: int = 5000) -> Iterator[Tuple[int, int, int, int]]:
+    """Yields (user_data_id, money, max_level, team_power) for every player, keyset-paginated per shard."""
+    for bind_arguments in per_shard_bind_arguments(db):
+        after_id = 0
+        while True:
+            rows = db.execute(
+                _scores_select().where(UserData.id > after_id).order_by(UserData.id).limit(chunk_size),
+                bind_arguments=bind_arguments,
+            ).all()
+            if not rows:
+                break
+            yield from rows
+            after_id = rows[-1][0]
+
+
+def rebuild_leaderboards(db: Session) -> int:
+    """Rebuilds every board from user_data / user_chars. Meant for startup."""
+    money, max_level, team_power = [], [], []
+    for user_data_id, m, level, power in iter_all_scores(db):
+        money.append((user_data_id, m or 0))
+        max_level.append((user_data_id, level))
+        team_power.append((user_data_id, power))
+    leaderboards["money"].load(money)
+    leaderboards["max_level"].load(max_level)
+    leaderboards["team_power"].load(team_power)
+    logging.info(f"Leaderboards rebuilt for {len(money)} players.")
+    return len(money)
+
+
+def refresh_user_scores(db: Session, user_data_ids: Iterable[int]) -> None:
+    """Re-reads the scores of the given players; players that no longer exist leave the boards."""
+    ids = sorted(set(user_data_ids))
+    seen = set()
+    for chunk in chunked(ids, params_per_row=1):
+        rows = db.execute(_scores_select().where(UserData.id.in_(chunk))).all()
+        _apply_scores(rows)
+        seen.update(row[0] for row in rows)
+    for user_data_id in set(ids) - seen:
+        for leaderboard in leaderboards.values():
+            leaderboard.remove(user_data_id)
+
+
+def _refresh_after_commit(db: Session) -> Callable[[], None]:
+    def callback():
+        user_data_ids = db.info.pop(_PENDING_INFO_KEY, set())
+        if not user_data_ids:
+            return
+        with SessionLocal() as session:
+            refresh_user_scores(session, user_data_ids)
+    return callback
+
+
+def schedule_leaderboard_refresh(db: Session, *user_data_ids: int) -> None:
+    """
+    Marks the players' scores as changed; they are re-read once `db` commits.
+    This function does NOT commit the transaction.
+    """
+    db.info.setdefault(_PENDING_INFO_KEY, set()).update(user_data_ids)
+    on_commit(db, "leaderboards", _refresh_after_commit(db))
+
+
+def _rebuild_after_commit() -> None:
+    with SessionLocal() as session:
+        rebuild_leaderboards(session)
+
+
+def schedule_leaderboard_rebuild(db: Session) -> None:
+    """
+    Rebuilds every board once `db` commits, for UPDATEs that touch all players.
+    This function does NOT commit the transaction.
+    """
+    on_commit(db, "leaderboards_rebuild", _rebuild_after_commit)
+
+
+# These listeners only see attribute changes on loaded ORM objects. Core /
+# bulk UPDATEs of a scored column (UserData.money, UserData.team_power,
+# UserChar.level and stats) bypass them, so every service issuing one must
+# call schedule_leaderboard_refresh() for the affected players in the same
+# transaction, as currency_service does for its money UPDATEs. Otherwise the
+# boards keep the old score until the next load_leaderboards().
+@event.listens_for(UserData.money, "set")
+def _on_money_set(target, value, oldvalue, initiator):
+    db = object_session(target)
+    if db is not None and target.id is not None and value != oldvalue:
+        schedule_leaderboard_refresh(db, target.id)
+
+
+def _on_char_stat_set(target, value, oldvalue, initiator):
+    db = object_session(target)
+    if db is not None and target.user_data_id is not None and value != oldvalue:
+        schedule_leaderboard_refresh(db, target.user_data_id)
+
+
+for _attribute in (UserChar.level, UserChar.hp, UserChar.mp, UserChar.atk, UserChar.spd, UserChar.def_):
+    event.listen(_attribute, "set", _on_char_stat_set)
+
+
+# ---------------------- Snapshots ----------------------
+
+
+_persisted_versions: Dict[str, int] = {}
+
+
+def persist_leaderboard_snapshots(db: Session, force: bool = False) -> int:
+    """
+    Replaces the stored snapshot of every board that changed since the last
+    snapshot. Returns the number of rows written.
+    This function does NOT commit the transaction.
+    """
+    taken_at = datetime.now(timezone.utc)
+    written = 0
+    for name, leaderboard in leaderboards.items():
+        version = leaderboard.version
+        if not force and _persisted_versions.get(name) == version:
+            continue
+        rows = [
+            {"board": name, "rank": entry.rank, "user_data_id": entry.user_data_id,
+             "score": entry.score, "taken_at": taken_at}
+            for entry in leaderboard.entries()
+        ]
+        db.execute(delete(LeaderboardSnapshot).where(LeaderboardSnapshot.board == name))
+        if rows:
+            db.execute(insert(LeaderboardSnapshot), rows)
+        _persisted_versions[name] = version
+        written += len(rows)
+    return written
+
+
+def load_leaderboard_snapshots(db: Session) -> List[str]:
+    """Loads boards from their stored snapshots; returns the boards that had one."""
+    loaded = []
+    for name, leaderboard in leaderboards.items():
+        rows = db.execute(
+            select(LeaderboardSnapshot.user_data_id, LeaderboardSnapshot.score)
+            .where(LeaderboardSnapshot.board == name)
+        ).all()
+        if rows:
+            leaderboard.load(rows)
+            _persisted_versions[name] = leaderboard.version
+            loaded.append(name)
+    return loaded
+
+
+def load_leaderboards(db: Session, from_snapshot: bool = False) -> None:
+    """
+    Startup entry point. Rebuilds from the player tables, or with
+    from_snapshot=True loads the last snapshots (faster, but only as fresh as
+    the last snapshot) and rebuilds only if a board has none.
+    """
+    if from_snapshot and len(load_leaderboard_snapshots(db)) == len(BOARDS):
+        logging.info("Leaderboards loaded from snapshots.")
+        return
+    rebuild_leaderboards(db)
+
+
+class LeaderboardSnapshotter:
+    """Persists changed boards every `interval` seconds on a background thread."""
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal, interval: float = 300.0):
+        self.session_factory = session_factory
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def snapshot(self) -> int:
+        with self.session_factory() as session:
+            written = persist_leaderboard_snapshots(session)
+            session.commit()
+        if written:
+            logging.debug(f"Leaderboard snapshot wrote {written} rows.")
+        return written
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="leaderboard-snapshotter", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.snapshot()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            try:
+                self.snapshot()
+            except Exception:
+                logging.error("Leaderboard snapshot failed.", exc_info=True)
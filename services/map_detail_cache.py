@@ -0,0 +1,179 @@
+import json
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from core_system.services.invalidation_bus import publish_invalidation, register_invalidation_handler
+from core_system.utils.session_hooks import on_commit
+
+# Versioned cache of serialized map-detail DTOs.
+#
+# Every map has a monotonically increasing version; edits bump it twice:
+# immediately (so this process stops serving the old entry while the edit is
+# in flight) and again after the edit commits (evicting anything a concurrent
+# reader cached from the pre-commit data). The ETag is derived from the
+# version alone, so a conditional fetch whose ETag still matches is answered
+# without touching the database, even after the entry itself was evicted.
+#
+# Versions live in process memory; the ETag carries a per-process token so
+# tags issued before a restart (or by another worker) never match by accident.
+
+_PENDING_INFO_KEY = "map_detail_pending_invalidations"
+
+
+@dataclass(frozen=True)
+class CachedMapDetail:
+    map_id: int
+    version: int
+    etag: str
+    body: bytes  # JSON-encoded map detail DTO
+
+    def to_dict(self) -> dict:
+        return json.loads(self.body)
+
+
+class MapDetailCache:
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._token = uuid.uuid4().hex[:12]
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, CachedMapDetail]" = OrderedDict()
+        self._versions: Dict[int, int] = {}
+        # Bumped by invalidate_all(); part of every ETag
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    # ---------------------- Versions ----------------------
+
+    def current_version(self, map_id: int) -> Tuple[int, int]:
+        with self._lock:
+            return self._generation, self._versions.get(map_id, 0)
+
+    def etag_for(self, map_id: int, generation: int, version: int) -> str:
+        return f'"{self._token}.{generation}.{map_id}.{version}"'
+
+    def current_etag(self, map_id: int) -> str:
+        generation, version = self.current_version(map_id)
+        return self.etag_for(map_id, generation, version)
+
+    def invalidate(self, map_ids: Iterable[int]) -> None:
+        """Bumps the version of each map and evicts its cached entry."""
+        with self._lock:
+            for map_id in map_ids:
+                self._versions[map_id] = self._versions.get(map_id, 0) + 1
+                self._entries.pop(map_id, None)
+
+    def invalidate_all(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    # ---------------------- Entries ----------------------
+
+    def get(self, map_id: int) -> Optional[CachedMapDetail]:
+        with self._lock:
+            entry = self._entries.get(map_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(map_id)
+            self.hits += 1
+            return entry
+
+    def put(self, map_id: int, generation: int, version: int, detail: dict) -> CachedMapDetail:
+        """
+        Stores `detail` as built for (generation, version). If the map was
+        invalidated while the detail was being loaded, the entry is returned
+        to the caller but not cached.
+        """
+        entry = CachedMapDetail(
+            map_id=map_id,
+            version=version,
+            etag=self.etag_for(map_id, generation, version),
+            body=json.dumps(detail, ensure_ascii=False, separators=(",", ":")).encode("utf-8"),
+        )
+        with self._lock:
+            if self._generation == generation and self._versions.get(map_id, 0) == version:
+                self._entries[map_id] = entry
+                self._entries.move_to_end(map_id)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return entry
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def get_or_load(self, map_id: int, loader: Callable[[], Optional[dict]],
+                    if_none_match: Optional[str] = None) -> Tuple[Optional[CachedMapDetail], bool]:
+        """
+        Conditional fetch. Returns (entry, not_modified):
+          (None, True)   if_none_match is still current; no load, no DB access
+          (entry, False) cached or freshly loaded detail
+          (None, False)  the loader found no such map
+        """
+        generation, version = self.current_version(map_id)
+        if if_none_match is not None and if_none_match == self.etag_for(map_id, generation, version):
+            with self._lock:
+                self.not_modified += 1
+            return None, True
+
+        entry = self.get(map_id)
+        if entry is not None and entry.version == version:
+            return entry, False
+
+        detail = loader()
+        if detail is None:
+            return None, False
+        return self.put(map_id, generation, version, detail), False
+
+
+map_detail_cache = MapDetailCache()
+
+
+def _invalidate_after_commit(db: Session) -> Callable[[], None]:
+    def callback():
+        map_ids = db.info.pop(_PENDING_INFO_KEY, set())
+        if "*" in map_ids:
+            map_detail_cache.invalidate_all()
+            map_ids.discard("*")
+        map_detail_cache.invalidate(map_ids)
+    return callback
+
+
+def schedule_map_detail_invalidation(db: Session, *map_ids: int) -> None:
+    """
+    Invalidates the cached detail of `map_ids` now and again once `db`
+    commits. This function does NOT commit the transaction.
+    """
+    if not map_ids:
+        return
+    map_detail_cache.invalidate(map_ids)
+    db.info.setdefault(_PENDING_INFO_KEY, set()).update(map_ids)
+    on_commit(db, "map_detail_cache", _invalidate_after_commit(db))
+    publish_invalidation(db, "map_detail", *map_ids)
+
+
+def schedule_all_map_details_invalidation(db: Session) -> None:
+    """For edits that can show up in any map's detail (e.g. renaming an event)."""
+    map_detail_cache.invalidate_all()
+    db.info.setdefault(_PENDING_INFO_KEY, set()).add("*")
+    on_commit(db, "map_detail_cache", _invalidate_after_commit(db))
+    publish_invalidation(db, "map_detail")
+
+
+def _invalidate_from_bus(map_ids):
+    # Edits from other workers; None means every map
+    if map_ids is None:
+        map_detail_cache.invalidate_all()
+    else:
+        map_detail_cache.invalidate(map_ids)
+
+
+register_invalidation_handler("map_detail", _invalidate_from_bus)
@@ -1,11 +1,21 @@
 from dataclasses import dataclass
-from typing import List, Literal, Optional, Tuple
+from typing import Iterable, List, Literal, Optional, Tuple, Union
 
-from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import delete, or_, select, update
+from sqlalchemy.orm import Session, selectinload, undefer_group
 
 from core_system.models.event import Event
-from core_system.models.maps import Map
+from core_system.models.maps import Map, MapArea, UserMapProgress
 from core_system.models.association_tables import MapConnection, MapEventAssociation
+from core_system.models.npc import UserNPCState
+from core_system.models.sharding import is_sharded, per_shard_bind_arguments
+from core_system.models.user import UserData
+from core_system.services.content_catalog import schedule_content_catalog_rebuild
+from core_system.services.map_detail_cache import (CachedMapDetail, map_detail_cache,
+                                                   schedule_map_detail_invalidation)
+from core_system.services.movement_service import schedule_movement_graph_invalidation
+from core_system.utils.profiling import profile_service
+from core_system.utils.sql_utils import chunked
 from schemas.map import CreateMapData
 
 
@@ -25,9 +35,25 @@ class CreatedMapInfoDTO:
     name: str
 
 
+@dataclass(slots=True)
+class MapSummaryDTO:
+    id: int
+    name: str
+    image_url: Optional[str]
+
+
+def _neighbor_ids(db: Session, map_id: int) -> List[int]:
+    rows = db.execute(
+        select(MapConnection.map_a_id, MapConnection.map_b_id)
+        .where(or_(MapConnection.map_a_id == map_id, MapConnection.map_b_id == map_id))
+    ).all()
+    return [b if a == map_id else a for a, b in rows]
+
+
 # ---------------------- Map Basic ----------------------
 
 
+@profile_service
 def patch_map_basic_service(
     db: Session,
     map_id: int,
@@ -50,12 +76,17 @@ def patch_map_basic_service(
     if image_url is not None:
         map_obj.image_url = image_url
 
+    # Neighbours embed this map's name in their connection lists
+    neighbors = _neighbor_ids(db, map_id) if name is not None else []
+    schedule_map_detail_invalidation(db, map_id, *neighbors)
+    schedule_content_catalog_rebuild(db)
     return map_obj
 
 
 # ---------------------- Event Associations ----------------------
 
 
+@profile_service
 def update_map_event_associations(
     db: Session,
     map_id: int,
@@ -118,6 +149,8 @@ def update_map_event_associations(
                 a.probability = a.probability / total
 
     db.flush()
+    schedule_map_detail_invalidation(db, map_id)
+    schedule_content_catalog_rebuild(db)
 
     return [
         EventAssociationDTO(
@@ -132,19 +165,25 @@ def update_map_event_associations(
 # ---------------------- Cursor-based Fetch ----------------------
 
 
+@profile_service(query_budget=1)
 def fetch_maps(
     db: Session,
     cursor_id: Optional[int],
     limit: int,
     direction: Literal["next", "prev"] = "next",
-) -> Tuple[List[Map], Optional[int], Optional[int], bool]:
+    summary: bool = False,
+) -> Tuple[Union[List[Map], List[MapSummaryDTO]], Optional[int], Optional[int], bool]:
     """
     Cursor-based 分頁邏輯。
     回傳：maps（最多 limit 筆）、next_cursor、prev_cursor、has_more（是否還有更多）。
     direction="next" 表示從 cursor_id 之後往前抓（升冪）；
     direction="prev" 表示從 cursor_id 之前往回抓（降冪但最後會反向回傳正序）。
+    summary=True 時只查 id / name / image_url，回傳 MapSummaryDTO 而非 ORM 物件。
     """
-    query = db.query(Map)
+    if summary:
+        query = db.query(Map.id, Map.name, Map.image_url)
+    else:
+        query = db.query(Map).options(undefer_group("detail"))
 
     if direction == "next":
         if cursor_id is not None:
@@ -162,6 +201,8 @@ def fetch_maps(
 
     if direction == "prev":
         results = list(reversed(results))
+    if summary:
+        results = [MapSummaryDTO(*row) for row in results]
 
     next_cursor = results[-1].id if results else None
     prev_cursor = results[0].id if results else None
@@ -172,6 +213,7 @@ def fetch_maps(
 # ---------------------- Get Single Map with Eager Loading ----------------------
 
 
+@profile_service(query_budget=7)
 def get_map_by_id(db: Session, map_id: int) -> Optional[Map]:
     """
     Retrieves a map by its ID, preloading related event associations and connections.
@@ -179,6 +221,7 @@ def get_map_by_id(db: Session, map_id: int) -> Optional[Map]:
     return (
         db.query(Map)
         .options(
+            undefer_group("detail"),
             selectinload(Map.event_associations).selectinload(
                 MapEventAssociation.event
             ),
@@ -190,9 +233,62 @@ def get_map_by_id(db: Session, map_id: int) -> Optional[Map]:
     )
 
 
+def serialize_map_detail(map_obj: Map) -> dict:
+    """Map detail DTO (the shape cached by map_detail_cache)."""
+    connections = [
+        (conn, conn.map_b) for conn in map_obj.connections_a
+    ] + [
+        (conn, conn.map_a) for conn in map_obj.connections_b
+    ]
+    return {
+        "id": map_obj.id,
+        "name": map_obj.name,
+        "description": map_obj.description,
+        "image_url": map_obj.image_url,
+        "events": [
+            {
+                "event_id": assoc.event.id,
+                "event_name": assoc.event.name,
+                "probability": assoc.probability,
+            }
+            for assoc in sorted(map_obj.event_associations, key=lambda a: a.event_id)
+        ],
+        "connections": [
+            {
+                "neighbor_id": neighbor.id,
+                "neighbor_name": neighbor.name,
+                "is_locked": conn.is_locked,
+                "required_item": conn.required_item,
+                "required_level": conn.required_level,
+            }
+            for conn, neighbor in sorted(connections, key=lambda c: c[1].id)
+        ],
+    }
+
+
+@profile_service(query_budget=7)
+def get_map_detail(
+    db: Session,
+    map_id: int,
+    if_none_match: Optional[str] = None,
+) -> Tuple[Optional[CachedMapDetail], bool]:
+    """
+    Cached, conditional version of get_map_by_id.
+    回傳 (detail, not_modified)：
+      - if_none_match 等於目前的 ETag 時回傳 (None, True)，不查 DB
+      - 找不到地圖時回傳 (None, False)
+    """
+    def load() -> Optional[dict]:
+        map_obj = get_map_by_id(db, map_id)
+        return serialize_map_detail(map_obj) if map_obj else None
+
+    return map_detail_cache.get_or_load(map_id, load, if_none_match)
+
+
 # ---------------------- Map Creation / Deletion ----------------------
 
 
+@profile_service
 def create_maps_service(
     db: Session,
     map_datas: List[CreateMapData],
@@ -210,18 +306,66 @@ def create_maps_service(
         db.add(new_map)
         db.flush()  # 取得 new_map.id
         created.append(CreatedMapInfoDTO(id=new_map.id, name=new_map.name))
+    schedule_movement_graph_invalidation(db)
+    schedule_content_catalog_rebuild(db)
     return created
 
 
+@profile_service
 def delete_map_service(db: Session, map_id: int) -> bool:
     """
     刪除指定 map，成功回傳 True；找不到回傳 False。
     """
-    map_to_delete = db.query(Map).filter(Map.id == map_id).first()
-    if not map_to_delete:
-        return False
-    db.delete(map_to_delete)
-    return True
+    return bulk_delete_maps(db, [map_id]) > 0
+
+
+def _delete_player_map_references(db: Session, map_ids: List[int]) -> None:
+    # What ON DELETE CASCADE / SET NULL does on an unsharded database
+    area_ids = db.scalars(select(MapArea.id).where(MapArea.map_id.in_(map_ids))).all()
+    for bind_arguments in per_shard_bind_arguments(db):
+        db.execute(delete(UserMapProgress).where(UserMapProgress.map_id.in_(map_ids)),
+                   bind_arguments=bind_arguments)
+        db.execute(update(UserData).where(UserData.current_map_id.in_(map_ids)).values(current_map_id=None),
+                   bind_arguments=bind_arguments)
+        for chunk in chunked(area_ids, params_per_row=1):
+            db.execute(update(UserData).where(UserData.current_area_id.in_(chunk)).values(current_area_id=None),
+                       bind_arguments=bind_arguments)
+            db.execute(update(UserNPCState).where(UserNPCState.map_area_id.in_(chunk)).values(map_area_id=None),
+                       bind_arguments=bind_arguments)
+
+
+@profile_service
+def bulk_delete_maps(db: Session, map_ids: Iterable[int]) -> int:
+    """
+    批量刪除地圖，不載入任何 ORM 物件。
+    Event associations, connections, areas (and their associations) and map
+    progress are removed by ON DELETE CASCADE; players standing on a deleted
+    map / area get current_map_id / current_area_id set to NULL.
+    Player shards cannot enforce foreign keys into the main database, so
+    with sharding the player-side part is done by explicit statements on
+    every shard (see _delete_player_map_references).
+    This function does NOT commit the transaction.
+
+    :return: number of maps deleted
+    """
+    ids = sorted(set(map_ids))
+    deleted = 0
+    touched = set(ids)
+    # 兩個條件各用一次 id 列表
+    for chunk in chunked(ids, params_per_row=2):
+        for a_id, b_id in db.execute(
+            select(MapConnection.map_a_id, MapConnection.map_b_id)
+            .where(or_(MapConnection.map_a_id.in_(chunk), MapConnection.map_b_id.in_(chunk)))
+        ):
+            touched.update((a_id, b_id))
+        if is_sharded(db):
+            _delete_player_map_references(db, chunk)
+        deleted += db.execute(delete(Map).where(Map.id.in_(chunk))).rowcount
+    if deleted:
+        schedule_map_detail_invalidation(db, *touched)
+        schedule_movement_graph_invalidation(db)
+        schedule_content_catalog_rebuild(db)
+    return deleted
 
 
 # ---------------------- Connections ----------------------
@@ -231,6 +375,7 @@ def get_ordered_pair(id1: int, id2: int) -> Tuple[int, int]:
     return (id1, id2) if id1 < id2 else (id2, id1)
 
 
+@profile_service
 def upsert_connection(
     session: Session,
     map_obj: Map,
@@ -255,6 +400,7 @@ def upsert_connection(
     return conn
 
 
+@profile_service
 def remove_connection(session: Session, map_obj: Map, neighbor: Map):
     a_id, b_id = get_ordered_pair(map_obj.id, neighbor.id)
     conn = (
@@ -266,6 +412,7 @@ def remove_connection(session: Session, map_obj: Map, neighbor: Map):
         session.delete(conn)
 
 
+@profile_service
 def patch_map_connections_service(
     db: Session,
     map_id: int,
@@ -279,6 +426,8 @@ def patch_map_connections_service(
     if not map_obj:
         raise ValueError("Map not found")
 
+    touched = {map_obj.id}
+
     # upsert connections
     if connections:
         for conn_in in connections:
@@ -296,6 +445,7 @@ def patch_map_connections_service(
                 required_item=conn_in.get("required_item"),
                 required_level=conn_in.get("required_level", 0),
             )
+            touched.add(neighbor_id)
 
     # remove connections
     if remove_connections:
@@ -305,5 +455,9 @@ def patch_map_connections_service(
             neighbor = db.get(Map, nid)
             if neighbor:
                 remove_connection(db, map_obj, neighbor)
+                touched.add(nid)
 
+    schedule_map_detail_invalidation(db, *touched)
+    schedule_movement_graph_invalidation(db)
+    schedule_content_catalog_rebuild(db)
     return map_obj
@@ -1,18 +1,41 @@
 
 
+from dataclasses import dataclass
 from fastapi import HTTPException
-from sqlalchemy.orm import Session
-from typing import Optional
+from sqlalchemy.orm import Session, undefer_group
+from typing import List, Optional, Union
 from core_system.models import Monster
+from core_system.utils.profiling import profile_service
 
 
+@dataclass(slots=True)
+class MonsterSummaryDTO:
+    id: int
+    name: Optional[str]
+    hp: int
+    mp: int
+    atk: int
+    spd: int
+    def_: int
+    drop_pool_id: Optional[int]
+
+
+@profile_service(query_budget=1)
 def fetch_monsters(
     db: Session,
     started_id: Optional[int],
     limit: int,
-    direction: str = "next"
-):
-    query = db.query(Monster)
+    direction: str = "next",
+    summary: bool = False,
+) -> Union[List[Monster], List[MonsterSummaryDTO]]:
+    """
+    summary=True 時只查列表需要的欄位（不含 description），回傳 MonsterSummaryDTO。
+    """
+    if summary:
+        query = db.query(Monster.id, Monster.name, Monster.hp, Monster.mp, Monster.atk,
+                         Monster.spd, Monster.def_, Monster.drop_pool_id)
+    else:
+        query = db.query(Monster).options(undefer_group("detail"))
 
     if started_id is not None:
         if direction == "next":
@@ -28,12 +51,15 @@ def fetch_monsters(
 
     if direction == "prev":
         monsters.reverse()
+    if summary:
+        return [MonsterSummaryDTO(*row) for row in monsters]
 
     return monsters
 
 
+@profile_service
 def get_monster_by_id(db: Session, monster_id: int) -> Monster:
-    monster = db.query(Monster).filter(Monster.id == monster_id).first()
+    monster = db.query(Monster).options(undefer_group("detail")).filter(Monster.id == monster_id).first()
     if not monster:
         raise HTTPException(status_code=404, detail="Monster not found")
     return monster
@@ -0,0 +1,248 @@
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import and_, exists, func, select, update
+from sqlalchemy.orm import Session
+
+from core_system.models.association_tables import MapConnection
+from core_system.models.inventory import UserInventoryItem
+from core_system.models.items import Item
+from core_system.models.maps import Map, MapArea
+from core_system.models.user import UserChar, UserData
+from core_system.services.content_catalog import get_content_catalog
+from core_system.services.invalidation_bus import publish_invalidation, register_invalidation_handler
+from core_system.utils.profiling import profile_service
+from core_system.utils.session_hooks import on_commit
+
+# Map-to-map movement validated against a precomputed adjacency structure
+# instead of loading Map.connections_a / connections_b per move.
+#
+#   open_bits[map_id]      bitset of neighbours reachable without conditions
+#   gates[(from, to)]      (required_level, required_item_id) of conditional edges
+#   locked edges           are left out entirely (as Map.get_unlocked_neighbors does)
+#
+# A move reads the player's current map, checks the edge in memory (one
+# bit test, or one gate lookup), and writes with one conditional UPDATE of
+# user_data guarded by `current_map_id = :src` plus the gate's level / item
+# conditions as sub-selects. A concurrent move or a lost condition makes the
+# UPDATE match nothing instead of moving the player along a stale edge.
+# "Level" is the player's highest character level.
+
+
+class MovementError(ValueError):
+    def __init__(self, message: str, reason: str):
+        super().__init__(message)
+        # "unknown_map" / "unknown_area" / "unknown_user" / "not_adjacent" / "locked" /
+        # "level" / "item" / "conflict" (the player moved while this move was checked)
+        self.reason = reason
+
+
+@dataclass(frozen=True)
+class Gate:
+    required_level: int
+    required_item_id: Optional[int]
+
+
+class MovementGraph:
+    def __init__(self, version: Optional[int] = None):
+        self.version = version
+        self.map_ids: set = set()
+        self.open_bits: Dict[int, int] = {}
+        self.gates: Dict[Tuple[int, int], Gate] = {}
+        self.locked: set = set()  # (from, to) pairs of locked edges
+        self.area_map: Dict[int, int] = {}
+        self.default_area: Dict[int, int] = {}
+
+    def add_edge(self, a: int, b: int, is_locked: bool, required_level: Optional[int],
+                 required_item_id: Optional[int]) -> None:
+        for src, dst in ((a, b), (b, a)):
+            if is_locked:
+                self.locked.add((src, dst))
+            elif (required_level or 0) > 0 or required_item_id is not None:
+                self.gates[(src, dst)] = Gate(required_level or 0, required_item_id)
+            else:
+                self.open_bits[src] = self.open_bits.get(src, 0) | (1 << dst)
+
+    def add_area(self, area_id: int, map_id: int) -> None:
+        self.area_map[area_id] = map_id
+        if map_id not in self.default_area or area_id < self.default_area[map_id]:
+            self.default_area[map_id] = area_id
+
+    def is_open(self, src: int, dst: int) -> bool:
+        return (self.open_bits.get(src, 0) >> dst) & 1 == 1
+
+    def gate(self, src: int, dst: int) -> Optional[Gate]:
+        return self.gates.get((src, dst))
+
+
+_graph: Optional[MovementGraph] = None
+_graph_lock = threading.Lock()
+
+
+def _resolve_item_ids(db: Session, names: Iterable[str]) -> Dict[str, int]:
+    """required_item holds an item id or an item name; returns {stored value: item id}."""
+    resolved, by_name = {}, set()
+    for value in names:
+        if value.isdigit():
+            resolved[value] = int(value)
+        else:
+            by_name.add(value)
+    if by_name:
+        catalog = get_content_catalog()
+        if catalog is not None:
+            for item in catalog.items.values():
+                if item.name in by_name:
+                    resolved.setdefault(item.name, item.id)
+        else:
+            for item_id, name in db.execute(select(Item.id, Item.name).where(Item.name.in_(by_name))):
+                resolved.setdefault(name, item_id)
+    return resolved
+
+
+def build_movement_graph(db: Session) -> MovementGraph:
+    catalog = get_content_catalog()
+    if catalog is not None:
+        graph = MovementGraph(version=catalog.version)
+        graph.map_ids = set(catalog.maps)
+        connections = {conn.id: conn for record in catalog.maps.values() for conn in record.connections}
+        edges = [(c.map_a_id, c.map_b_id, c.is_locked, c.required_level, c.required_item)
+                 for c in connections.values()]
+        areas = [(area.id, area.map_id) for area in catalog.map_areas.values()]
+    else:
+        graph = MovementGraph()
+        graph.map_ids = set(db.scalars(select(Map.id)))
+        edges = db.execute(select(MapConnection.map_a_id, MapConnection.map_b_id, MapConnection.is_locked,
+                                  MapConnection.required_level, MapConnection.required_item)).all()
+        areas = db.execute(select(MapArea.id, MapArea.map_id)).all()
+
+    items = _resolve_item_ids(db, {edge[4] for edge in edges if edge[4]})
+    for a, b, is_locked, required_level, required_item in edges:
+        item_id = items.get(required_item) if required_item else None
+        if required_item and item_id is None:
+            logging.warning(f"Map connection {a}<->{b} requires unknown item {required_item!r}; treating it as locked.")
+            is_locked = True
+        graph.add_edge(a, b, bool(is_locked), required_level, item_id)
+    for area_id, map_id in areas:
+        graph.add_area(area_id, map_id)
+    return graph
+
+
+def get_movement_graph(db: Session) -> MovementGraph:
+    """Cached graph; follows the content catalog version when the catalog is loaded."""
+    global _graph
+    catalog = get_content_catalog()
+    with _graph_lock:
+        graph = _graph
+        if graph is not None and (catalog is None or graph.version == catalog.version):
+            return graph
+    graph = build_movement_graph(db)
+    with _graph_lock:
+        _graph = graph
+    return graph
+
+
+def invalidate_movement_graph() -> None:
+    global _graph
+    with _graph_lock:
+        _graph = None
+
+
+def schedule_movement_graph_invalidation(db: Session) -> None:
+    """Drops the graph now and again once `db` commits. Does NOT commit."""
+    invalidate_movement_graph()
+    on_commit(db, "movement_graph", invalidate_movement_graph)
+    publish_invalidation(db, "movement_graph")
+
+
+register_invalidation_handler("movement_graph", lambda _: invalidate_movement_graph())
+
+
+# ---------------------- Moves ----------------------
+
+
+def _gate_condition(user_data_id: int, gate: Gate):
+    conditions = []
+    if gate.required_level > 0:
+        conditions.append(
+            select(func.max(UserChar.level))
+            .where(UserChar.user_data_id == user_data_id)
+            .scalar_subquery() >= gate.required_level
+        )
+    if gate.required_item_id is not None:
+        conditions.append(exists().where(
+            UserInventoryItem.user_data_id == user_data_id,
+            UserInventoryItem.item_id == gate.required_item_id,
+            UserInventoryItem.quantity > 0,
+        ))
+    return and_(*conditions)
+
+
+@profile_service(query_budget=2)
+def move_to_map(db: Session, user_data_id: int, target_map_id: int,
+                target_area_id: Optional[int] = None) -> Tuple[int, Optional[int]]:
+    """
+    Moves the player to `target_map_id` (and `target_area_id`, defaulting to the
+    map's first area) if an unlocked connection from their current map allows
+    it. Moving between areas of the current map is always allowed.
+    One SELECT and one UPDATE on success; raises MovementError otherwise.
+    This function does NOT commit the transaction.
+
+    :return: (current_map_id, current_area_id) after the move
+    """
+    graph = get_movement_graph(db)
+    if target_map_id not in graph.map_ids:
+        raise MovementError(f"Map {target_map_id} does not exist", "unknown_map")
+    if target_area_id is None:
+        target_area_id = graph.default_area.get(target_map_id)
+    elif graph.area_map.get(target_area_id) != target_map_id:
+        raise MovementError(f"Area {target_area_id} is not part of map {target_map_id}", "unknown_area")
+
+    current = db.execute(select(UserData.current_map_id).where(UserData.id == user_data_id)).first()
+    if current is None:
+        raise MovementError(f"UserData {user_data_id} does not exist", "unknown_user")
+    src = current[0]
+
+    conditions = [UserData.id == user_data_id, UserData.current_map_id == src]
+    gate = None
+    if src != target_map_id and not graph.is_open(src, target_map_id):
+        gate = graph.gate(src, target_map_id)
+        if gate is None:
+            if (src, target_map_id) in graph.locked:
+                raise MovementError(f"The way from map {src} to map {target_map_id} is locked", "locked")
+            raise MovementError(f"Map {target_map_id} is not adjacent to map {src}", "not_adjacent")
+        conditions.append(_gate_condition(user_data_id, gate))
+
+    result = db.execute(
+        update(UserData)
+        .where(*conditions)
+        .values(current_map_id=target_map_id, current_area_id=target_area_id)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 1:
+        _expire_loaded_user_data(db, user_data_id)
+        return target_map_id, target_area_id
+    raise _explain_rejected_move(db, user_data_id, src, target_map_id, gate)
+
+
+def _expire_loaded_user_data(db: Session, user_data_id: int) -> None:
+    # The UPDATE bypasses the identity map; a UserData already loaded in this
+    # session reloads its location on next access instead of going stale.
+    for obj in db.identity_map.values():
+        if isinstance(obj, UserData) and obj.id == user_data_id:
+            db.expire(obj, ["current_map_id", "current_area_id", "current_map", "current_area"])
+
+
+def _explain_rejected_move(db: Session, user_data_id: int, src: Optional[int], target_map_id: int,
+                           gate: Optional[Gate]) -> MovementError:
+    """Only runs on the failure path: works out why the guarded UPDATE matched nothing."""
+    current = db.execute(select(UserData.current_map_id).where(UserData.id == user_data_id)).first()
+    if current is None:
+        return MovementError(f"UserData {user_data_id} does not exist", "unknown_user")
+    if current[0] != src or gate is None:
+        return MovementError(f"UserData {user_data_id} moved away from map {src} concurrently", "conflict")
+    if gate.required_item_id is not None and not db.scalar(select(_gate_condition(
+            user_data_id, Gate(0, gate.required_item_id)))):
+        return MovementError(f"Item {gate.required_item_id} is required to enter map {target_map_id}", "item")
+    return MovementError(f"Level {gate.required_level} is required to enter map {target_map_id}", "level")
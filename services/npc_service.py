@@ -0,0 +1,171 @@
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, or_, select
+from sqlalchemy.orm import Session
+
+from core_system.models.maps import MapArea
+from core_system.models.npc import UserNPCState
+from core_system.services.content_catalog import get_content_catalog, on_content_change
+from core_system.utils.profiling import profile_service
+from core_system.utils.sql_utils import upsert_insert
+
+# NPC placement is copy-on-write: MapArea.init_npc is the default placement
+# for every player, and user_npc_states only holds per-user deviations
+# (moved / hidden / talked). Storage grows with player actions, not with
+# players x NPCs.
+
+
+@dataclass
+class VisibleNPC:
+    npc_id: int
+    area_id: int
+    data: dict  # the init_npc entry, e.g. {"npc_id": 1, "npc_name": "森林守衛", "npc_role": "守護者"}
+    has_talked: bool
+
+
+class NPCDefaults:
+    """Default placement derived from MapArea.init_npc."""
+
+    def __init__(self, area_npcs: Dict[int, Tuple[dict, ...]], version: Optional[int] = None):
+        self.version = version
+        self.area_npcs = area_npcs
+        # npc_id -> (default area id, init_npc entry)
+        self.npc_home: Dict[int, Tuple[int, dict]] = {}
+        for area_id, npcs in area_npcs.items():
+            for entry in npcs:
+                npc_id = entry.get("npc_id")
+                if npc_id is not None:
+                    self.npc_home.setdefault(npc_id, (area_id, entry))
+
+    def npc_ids_in(self, area_id: int) -> List[int]:
+        return [entry["npc_id"] for entry in self.area_npcs.get(area_id, ()) if entry.get("npc_id") is not None]
+
+    def default_area_of(self, npc_id: int) -> Optional[int]:
+        home = self.npc_home.get(npc_id)
+        return home[0] if home else None
+
+
+_defaults: Optional[NPCDefaults] = None
+_defaults_lock = threading.Lock()
+
+
+def get_npc_defaults(db: Session) -> NPCDefaults:
+    """
+    Returns the cached default placement table. It follows the content
+    catalog version when the catalog is loaded; otherwise it is read from
+    map_areas once and kept until invalidate_npc_defaults().
+    """
+    global _defaults
+    catalog = get_content_catalog()
+    with _defaults_lock:
+        if catalog is not None:
+            if _defaults is None or _defaults.version != catalog.version:
+                _defaults = NPCDefaults(
+                    {area.id: area.init_npc for area in catalog.map_areas.values() if area.init_npc},
+                    version=catalog.version)
+        elif _defaults is None:
+            rows = db.execute(select(MapArea.id, MapArea.init_npc).where(MapArea.init_npc.is_not(None))).all()
+            _defaults = NPCDefaults({area_id: tuple(npcs or ()) for area_id, npcs in rows})
+        return _defaults
+
+
+def invalidate_npc_defaults() -> None:
+    global _defaults
+    with _defaults_lock:
+        _defaults = None
+
+
+# Without a loaded catalog the defaults are not version-checked; drop them on
+# every content edit, in this worker and the others
+on_content_change(invalidate_npc_defaults)
+
+
+@profile_service(query_budget=1)
+def get_visible_npcs(db: Session, user_id: int, area_id: int) -> List[VisibleNPC]:
+    """
+    Returns the NPCs the user currently sees in `area_id`: the area's
+    defaults, minus NPCs the user moved away or hid, plus NPCs moved here.
+    One indexed query fetches just the deviations that can affect this area.
+    """
+    defaults = get_npc_defaults(db)
+    default_ids = defaults.npc_ids_in(area_id)
+
+    conditions = [UserNPCState.map_area_id == area_id]
+    if default_ids:
+        conditions.append(UserNPCState.npc_id.in_(default_ids))
+    deviations = {
+        row.npc_id: row for row in db.execute(
+            select(UserNPCState.npc_id, UserNPCState.map_area_id,
+                   UserNPCState.has_talked, UserNPCState.is_visible)
+            .where(UserNPCState.user_id == user_id, or_(*conditions))
+        )
+    }
+
+    visible: List[VisibleNPC] = []
+    for entry in defaults.area_npcs.get(area_id, ()):
+        npc_id = entry.get("npc_id")
+        deviation = deviations.pop(npc_id, None)
+        if deviation is None:
+            visible.append(VisibleNPC(npc_id, area_id, entry, False))
+            continue
+        if deviation.map_area_id not in (None, area_id) or not deviation.is_visible:
+            continue
+        visible.append(VisibleNPC(npc_id, area_id, entry, deviation.has_talked))
+
+    # NPCs moved into this area from elsewhere
+    for npc_id, deviation in deviations.items():
+        if deviation.map_area_id == area_id and deviation.is_visible:
+            home = defaults.npc_home.get(npc_id)
+            visible.append(VisibleNPC(npc_id, area_id, home[1] if home else {"npc_id": npc_id},
+                                      deviation.has_talked))
+    return visible
+
+
+def _write_deviation(db: Session, user_id: int, npc_id: int, **changes) -> Optional[dict]:
+    """
+    Applies `changes` to the user's state for `npc_id`. If the merged state
+    equals the default placement the deviation row is deleted instead.
+    """
+    defaults = get_npc_defaults(db)
+    current = db.execute(
+        select(UserNPCState.map_area_id, UserNPCState.has_talked, UserNPCState.is_visible)
+        .where(UserNPCState.user_id == user_id, UserNPCState.npc_id == npc_id)
+    ).first()
+    state = {"map_area_id": None, "has_talked": False, "is_visible": True}
+    if current is not None:
+        state.update(current._asdict())
+    state.update(changes)
+    if state["map_area_id"] is not None and state["map_area_id"] == defaults.default_area_of(npc_id):
+        state["map_area_id"] = None
+
+    if state == {"map_area_id": None, "has_talked": False, "is_visible": True}:
+        if current is not None:
+            db.execute(delete(UserNPCState).where(UserNPCState.user_id == user_id,
+                                                  UserNPCState.npc_id == npc_id))
+            logging.debug(f"NPC {npc_id} back to defaults for user {user_id}; deviation removed.")
+        return None
+
+    table = UserNPCState.__table__
+    stmt = upsert_insert(db, table).values(user_id=user_id, npc_id=npc_id, **state)
+    stmt = stmt.on_conflict_do_update(index_elements=[table.c.user_id, table.c.npc_id], set_=state)
+    db.execute(stmt)
+    return state
+
+
+@profile_service(query_budget=2)
+def move_npc(db: Session, user_id: int, npc_id: int, area_id: Optional[int]):
+    """Moves the NPC for this user; area_id=None returns it to its default area."""
+    return _write_deviation(db, user_id, npc_id, map_area_id=area_id)
+
+
+@profile_service(query_budget=2)
+def set_npc_visibility(db: Session, user_id: int, npc_id: int, is_visible: bool):
+    return _write_deviation(db, user_id, npc_id, is_visible=is_visible)
+
+
+@profile_service(query_budget=2)
+def mark_npc_talked(db: Session, user_id: int, npc_id: int, has_talked: bool = True):
+    return _write_deviation(db, user_id, npc_id, has_talked=has_talked)
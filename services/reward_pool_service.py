@@ -1,27 +1,88 @@
 
 
 import logging
+from dataclasses import dataclass
 from fastapi import HTTPException
+from sqlalchemy import delete, exists, func, insert, select, update
 from sqlalchemy.orm import Session
-from typing import Optional
+from typing import Dict, Iterable, List, Optional
 from core_system.models import RewardPool
-from core_system.models.items import RewardPoolItem
+from core_system.models.event import BattleEventLogic, EventResult
+from core_system.models.items import Item, RewardPoolItem
+from core_system.models.monsters import Monster
+from core_system.services.content_catalog import schedule_content_catalog_rebuild
+from core_system.utils.profiling import profile_service
+from core_system.utils.sql_utils import chunked, upsert_insert
 
 
+@dataclass
+class RewardPoolEntryDTO:
+    item_id: int
+    probability: float
+
+
+@profile_service
 def add_reward_pool(db: Session, name: str):
     new_pool = RewardPool(name=name)
     db.add(new_pool)
     db.flush()
+    schedule_content_catalog_rebuild(db)
     return new_pool.id
 
 
+@profile_service
 def remove_reward_pool(db: Session, pool_id: int):
-    remove_pool = db.query(RewardPool).filter(RewardPool.id == pool_id).first()
-    if remove_pool:
-        db.delete(remove_pool)
+    bulk_delete_reward_pools(db, [pool_id])
     return
 
 
+@profile_service
+def bulk_delete_reward_pools(db: Session, pool_ids: Iterable[int]) -> int:
+    """
+    Set-based delete of reward pools. Pool items go with the pool through
+    ON DELETE CASCADE; event results, monsters and battle logic that used the
+    pool are left without one (ON DELETE SET NULL). No ORM objects are loaded.
+    This function does NOT commit the transaction.
+
+    :return: number of pools deleted
+    """
+    ids = sorted(set(pool_ids))
+    deleted = 0
+    for chunk in chunked(ids, params_per_row=1):
+        deleted += db.execute(delete(RewardPool).where(RewardPool.id.in_(chunk))).rowcount
+    if deleted:
+        schedule_content_catalog_rebuild(db)
+    logging.debug(f"Deleted {deleted} reward pools.")
+    return deleted
+
+
+@profile_service
+def delete_orphan_reward_pools(db: Session, candidate_ids: Iterable[int]) -> int:
+    """
+    Deletes the pools in `candidate_ids` that are no longer referenced by any
+    event result, monster or battle logic. Used after deleting event results,
+    which own their reward pool.
+    This function does NOT commit the transaction.
+    """
+    ids = sorted(set(i for i in candidate_ids if i is not None))
+    deleted = 0
+    for chunk in chunked(ids, params_per_row=1):
+        deleted += db.execute(
+            delete(RewardPool)
+            .where(
+                RewardPool.id.in_(chunk),
+                ~exists().where(EventResult.reward_pool_id == RewardPool.id),
+                ~exists().where(Monster.drop_pool_id == RewardPool.id),
+                ~exists().where(BattleEventLogic.reward_pool_id == RewardPool.id),
+            )
+            .execution_options(synchronize_session=False)
+        ).rowcount
+    if deleted:
+        schedule_content_catalog_rebuild(db)
+    return deleted
+
+
+@profile_service
 def add_reward_pool_item(db: Session, pool_id: int, item_id: int, probability: float = 0):
     reward_pool_item = RewardPoolItem(
         pool_id=pool_id,
@@ -29,15 +90,21 @@ def add_reward_pool_item(db: Session, pool_id: int, item_id: int, probability: f
         probability=probability
     )
     db.add(reward_pool_item)
+    schedule_content_catalog_rebuild(db)
     return
 
 
+@profile_service
 def remove_reward_pool_item(db: Session, pool_id: int, item_id: int):
-    remove_pool_item = db.query(RewardPoolItem).filter(RewardPoolItem.pool_id == pool_id and RewardPoolItem.item_id==item_id).first()
-    db.delete(remove_pool_item)
+    db.execute(
+        delete(RewardPoolItem)
+        .where(RewardPoolItem.pool_id == pool_id, RewardPoolItem.item_id == item_id)
+    )
+    schedule_content_catalog_rebuild(db)
     return
 
 
+@profile_service
 def edit_reward_pool_item(db: Session, pool_id: int, item_id: int,probability:float):
     remove_pool_item = (
     db.query(RewardPoolItem)
@@ -45,4 +112,117 @@ def edit_reward_pool_item(db: Session, pool_id: int, item_id: int,probability:fl
     .first()
 )
     remove_pool_item.probability = probability
-    return
\ No newline at end of file
+    schedule_content_catalog_rebuild(db)
+    return
+
+
+# ---------------------- Batch editing ----------------------
+
+
+def _entries_to_dict(entries: Optional[List[dict]]) -> Dict[int, float]:
+    """[{"item_id": 1, "probability": 0.5}, ...] -> {1: 0.5}; later duplicates win."""
+    return {entry["item_id"]: float(entry["probability"]) for entry in entries or []}
+
+
+def _validate_pool_and_items(db: Session, pool_id: int, item_ids: Iterable[int]) -> None:
+    if db.get(RewardPool, pool_id) is None:
+        raise ValueError(f"Reward pool id {pool_id} does not exist")
+    wanted = set(item_ids)
+    found = set()
+    for chunk in chunked(sorted(wanted), params_per_row=1):
+        found.update(db.scalars(select(Item.id).where(Item.id.in_(chunk))))
+    missing = wanted - found
+    if missing:
+        raise ValueError(f"Item ids {sorted(missing)} do not exist")
+
+
+def _pool_entries(db: Session, pool_id: int) -> List[RewardPoolEntryDTO]:
+    return [
+        RewardPoolEntryDTO(item_id=item_id, probability=probability)
+        for item_id, probability in db.execute(
+            select(RewardPoolItem.item_id, RewardPoolItem.probability)
+            .where(RewardPoolItem.pool_id == pool_id)
+            .order_by(RewardPoolItem.item_id)
+        )
+    ]
+
+
+@profile_service(query_budget=5)
+def replace_reward_pool_items(
+    db: Session,
+    pool_id: int,
+    items: List[dict],  # each dict must have 'item_id' and 'probability'
+    normalize: bool = False,
+) -> List[RewardPoolEntryDTO]:
+    """
+    以 items 整批取代 pool 內的道具清單（DELETE + 一次 executemany INSERT）。
+    Item ids are validated up front so a bad id leaves the pool untouched.
+    This function does NOT commit the transaction.
+    """
+    wanted = _entries_to_dict(items)
+    _validate_pool_and_items(db, pool_id, wanted)
+
+    if normalize:
+        total = sum(wanted.values())
+        if total > 0:
+            wanted = {item_id: probability / total for item_id, probability in wanted.items()}
+
+    db.execute(delete(RewardPoolItem).where(RewardPoolItem.pool_id == pool_id))
+    if wanted:
+        db.execute(insert(RewardPoolItem), [
+            {"pool_id": pool_id, "item_id": item_id, "probability": probability}
+            for item_id, probability in wanted.items()
+        ])
+    schedule_content_catalog_rebuild(db)
+    return [RewardPoolEntryDTO(item_id, probability) for item_id, probability in sorted(wanted.items())]
+
+
+@profile_service(query_budget=7)
+def patch_reward_pool_items(
+    db: Session,
+    pool_id: int,
+    upsert: Optional[List[dict]] = None,  # each dict must have 'item_id' and 'probability'
+    remove: Optional[List[int]] = None,
+    normalize: bool = False,
+) -> List[RewardPoolEntryDTO]:
+    """
+    Upsert / remove 多個道具並可選擇正規化機率總和，每一類變更各一條語句。
+    This function does NOT commit the transaction.
+    """
+    changes = _entries_to_dict(upsert)
+    _validate_pool_and_items(db, pool_id, changes)
+
+    if remove:
+        for chunk in chunked(sorted(set(remove)), params_per_row=1):
+            db.execute(
+                delete(RewardPoolItem)
+                .where(RewardPoolItem.pool_id == pool_id, RewardPoolItem.item_id.in_(chunk))
+            )
+
+    if changes:
+        table = RewardPoolItem.__table__
+        rows = [{"pool_id": pool_id, "item_id": item_id, "probability": probability}
+                for item_id, probability in changes.items()]
+        for chunk in chunked(rows, params_per_row=3):
+            stmt = upsert_insert(db, table).values(chunk)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.pool_id, table.c.item_id],
+                set_={"probability": stmt.excluded.probability},
+            )
+            db.execute(stmt)
+
+    if normalize:
+        total = (
+            select(func.sum(RewardPoolItem.probability))
+            .where(RewardPoolItem.pool_id == pool_id)
+            .scalar_subquery()
+        )
+        db.execute(
+            update(RewardPoolItem)
+            .where(RewardPoolItem.pool_id == pool_id, total > 0)
+            .values(probability=RewardPoolItem.probability / total)
+            .execution_options(synchronize_session=False)
+        )
+
+    schedule_content_catalog_rebuild(db)
+    return _pool_entries(db, pool_id)
@@ -0,0 +1,195 @@
+import logging
+import math
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.orm import Session
+
+from core_system.models.event import EventResult, StatusEffectData
+from core_system.models.sharding import shard_bind_arguments
+from core_system.models.user import UserChar, UserTeamMember
+from core_system.utils.profiling import profile_service
+
+# Stored shape of each entry in UserChar.status_effects:
+# {
+#     "poison": {"value": "3", "applied_at": 1700000000, "duration": 60, "tick_interval": 10},
+#     "blessed": {"value": "1", "applied_at": 1700000000, "duration": null, "tick_interval": null}
+# }
+# Entries are never rewritten by a background job; remaining time and ticks are
+# derived from applied_at on read, and expired entries are dropped on write-back.
+
+
+@dataclass
+class ActiveStatusEffect:
+    key: str
+    value: Optional[str]
+    applied_at: int
+    duration: Optional[int]
+    tick_interval: Optional[int]
+    remaining_seconds: Optional[int]  # None for permanent effects
+    elapsed_ticks: int
+    remaining_ticks: Optional[int]  # None when the effect is permanent or not tick based
+
+
+def _now() -> int:
+    return int(time.time())
+
+
+def _normalize_entry(key: str, raw) -> dict:
+    """
+    Older rows may store plain values (e.g. {"poison": 3}); treat them as
+    permanent effects applied at epoch 0.
+    """
+    if isinstance(raw, dict) and "applied_at" in raw:
+        return raw
+    return {"value": None if raw is None else str(raw), "applied_at": 0,
+            "duration": None, "tick_interval": None}
+
+
+def is_expired(entry: dict, now: int) -> bool:
+    duration = entry.get("duration")
+    if duration is None:
+        return False
+    return entry["applied_at"] + duration <= now
+
+
+def evaluate_status_effect(key: str, raw, now: Optional[int] = None) -> ActiveStatusEffect:
+    """
+    Computes the current state of a single stored effect at `now`.
+    """
+    now = _now() if now is None else now
+    entry = _normalize_entry(key, raw)
+    applied_at = entry["applied_at"]
+    duration = entry.get("duration")
+    tick_interval = entry.get("tick_interval")
+
+    elapsed = max(0, now - applied_at)
+    if duration is not None:
+        elapsed = min(elapsed, duration)
+        remaining_seconds = max(0, duration - elapsed)
+    else:
+        remaining_seconds = None
+
+    if tick_interval:
+        elapsed_ticks = elapsed // tick_interval
+        remaining_ticks = (math.ceil(remaining_seconds / tick_interval)
+                           if remaining_seconds is not None else None)
+    else:
+        elapsed_ticks = 0
+        remaining_ticks = None
+
+    return ActiveStatusEffect(
+        key=key,
+        value=entry.get("value"),
+        applied_at=applied_at,
+        duration=duration,
+        tick_interval=tick_interval,
+        remaining_seconds=remaining_seconds,
+        elapsed_ticks=elapsed_ticks,
+        remaining_ticks=remaining_ticks,
+    )
+
+
+def get_active_status_effects(user_char: UserChar, now: Optional[int] = None) -> List[ActiveStatusEffect]:
+    """
+    Lazily evaluates the character's stored effects. Expired effects are
+    filtered out of the result but left in storage until the next write.
+    """
+    now = _now() if now is None else now
+    effects = user_char.status_effects or {}
+    return [
+        evaluate_status_effect(key, raw, now)
+        for key, raw in effects.items()
+        if not is_expired(_normalize_entry(key, raw), now)
+    ]
+
+
+def compact_status_effects(effects: Optional[dict], now: Optional[int] = None) -> dict:
+    """Returns a copy of `effects` in the stored shape with expired entries removed."""
+    now = _now() if now is None else now
+    compacted = {}
+    for key, raw in (effects or {}).items():
+        entry = _normalize_entry(key, raw)
+        if not is_expired(entry, now):
+            compacted[key] = entry
+    return compacted
+
+
+def merge_status_effects(effects: Optional[dict], new_effects: Iterable[StatusEffectData],
+                         now: Optional[int] = None) -> dict:
+    """
+    Applies `new_effects` on top of `effects`. Re-applying an existing key
+    refreshes it (new value, applied_at and duration). The result is compacted.
+    """
+    now = _now() if now is None else now
+    merged = compact_status_effects(effects, now)
+    for effect in new_effects:
+        if not effect.status_effect_key:
+            continue
+        merged[effect.status_effect_key] = {
+            "value": effect.status_effect_value,
+            "applied_at": now,
+            "duration": effect.duration,
+            "tick_interval": effect.tick_interval,
+        }
+    return merged
+
+
+def _expire_loaded_status_effects(db: Session, user_char_ids: Iterable[int]) -> None:
+    # The UPDATE bypasses the identity map; loaded UserChar reload status_effects on next access
+    ids = set(user_char_ids)
+    for obj in list(db.identity_map.values()):
+        if isinstance(obj, UserChar) and obj.id in ids:
+            db.expire(obj, ["status_effects"])
+
+
+@profile_service(query_budget=2)
+def apply_status_effects_to_team(db: Session, user_data_id: int,
+                                 new_effects: List[StatusEffectData],
+                                 now: Optional[int] = None) -> Dict[int, dict]:
+    """
+    Applies effects to every character in the user's team: one SELECT for the
+    team's current effects and one executemany UPDATE for the write-back.
+    This function does NOT commit the transaction.
+
+    :return: {user_char_id: stored status_effects} after the write.
+    """
+    now = _now() if now is None else now
+    rows = db.execute(
+        select(UserChar.id, UserChar.status_effects)
+        .join(UserTeamMember, UserTeamMember.user_char_id == UserChar.id)
+        .where(UserTeamMember.user_data_id == user_data_id)
+    ).all()
+    if not rows:
+        logging.debug(f"No team members for user_data_id {user_data_id}; no status effects applied.")
+        return {}
+
+    updated = {
+        char_id: merge_status_effects(effects, new_effects, now)
+        for char_id, effects in rows
+    }
+    # Core executemany rather than ORM bulk-update-by-PK, which sharded sessions do not support
+    table = UserChar.__table__
+    db.execute(
+        update(table)
+        .where(table.c.id == bindparam("b_id"))
+        .values(status_effects=bindparam("b_status_effects")),
+        [{"b_id": char_id, "b_status_effects": effects} for char_id, effects in updated.items()],
+        bind_arguments=shard_bind_arguments(db, user_data_id),
+    )
+    _expire_loaded_status_effects(db, updated)
+    logging.debug(f"Applied {len(new_effects)} status effects to {len(updated)} chars of user_data_id {user_data_id}.")
+    return updated
+
+
+@profile_service
+def apply_event_result_to_team(db: Session, user_data_id: int, event_result: EventResult,
+                               now: Optional[int] = None) -> Dict[int, dict]:
+    """
+    Applies the status effects carried by `event_result` to the whole team in one write.
+    This function does NOT commit the transaction.
+    """
+    return apply_status_effects_to_team(
+        db, user_data_id, event_result.get_status_effects_json(), now)
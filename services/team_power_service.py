@@ -0,0 +1,119 @@
+import logging
+from typing import Iterable
+
+from sqlalchemy import event, func, select, update
+from sqlalchemy.orm import Session, object_session
+
+from core_system.models.sharding import group_by_shard, per_shard_bind_arguments
+from core_system.models.user import UserChar, UserData, UserTeamMember
+from core_system.utils.session_hooks import in_savepoint
+from core_system.utils.sql_utils import chunked
+
+# UserData.team_power is the materialized sum of hp + mp + atk + spd + def_
+# over the player's current team, so encounter matching and the team_power
+# leaderboard read one column instead of joining team members and characters.
+#
+# It is recomputed in SQL from the stored rows, in the same transaction as
+# the change:
+#   create_team            refresh_team_power() right after the new team is flushed
+#   UserChar stat changes  the attribute listeners below queue the owner, and
+#                          the queued players are refreshed right before commit
+# Services that change stats with bulk UPDATEs call schedule_team_power_refresh().
+# The recompute is itself a Core UPDATE, so it schedules the team_power
+# leaderboard refresh for the players it touched (a full rebuild for
+# refresh_all_team_power()).
+
+_PENDING_INFO_KEY = "team_power_pending_refresh"
+
+
+def _team_power_subquery():
+    return (
+        select(func.coalesce(func.sum(UserChar.hp + UserChar.mp + UserChar.atk + UserChar.spd + UserChar.def_), 0))
+        .join(UserTeamMember, UserTeamMember.user_char_id == UserChar.id)
+        .where(UserTeamMember.user_data_id == UserData.id)
+        .scalar_subquery()
+    )
+
+
+def team_power_update():
+    """UPDATE recomputing team_power for every player; add a WHERE to narrow it."""
+    return (
+        update(UserData)
+        .values(team_power=_team_power_subquery())
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _expire_loaded_team_power(db: Session, user_data_ids: Iterable[int]) -> None:
+    # The UPDATE bypasses the identity map; loaded UserData reload team_power on next access
+    ids = set(user_data_ids)
+    for obj in list(db.identity_map.values()):
+        if isinstance(obj, UserData) and obj.id in ids:
+            db.expire(obj, ["team_power"])
+
+
+def refresh_team_power(db: Session, *user_data_ids: int) -> None:
+    """
+    Recomputes team_power of the given players from their flushed team.
+    This function does NOT commit the transaction.
+    """
+    rows = [{"user_data_id": user_data_id} for user_data_id in sorted(set(user_data_ids))]
+    for bind_arguments, shard_rows in group_by_shard(db, rows):
+        for chunk in chunked(shard_rows, params_per_row=1):
+            db.execute(
+                team_power_update().where(UserData.id.in_([row["user_data_id"] for row in chunk])),
+                bind_arguments=bind_arguments,
+            )
+    _expire_loaded_team_power(db, user_data_ids)
+    # leaderboard_service imports this module
+    from core_system.services.leaderboard_service import schedule_leaderboard_refresh
+    schedule_leaderboard_refresh(db, *user_data_ids)
+
+
+def refresh_all_team_power(db: Session) -> None:
+    """
+    Recomputes team_power of every player (one UPDATE per shard), e.g. after
+    bulk-loading teams. This function does NOT commit the transaction.
+    """
+    for bind_arguments in per_shard_bind_arguments(db):
+        db.execute(team_power_update(), bind_arguments=bind_arguments)
+    _expire_loaded_team_power(db, [obj.id for obj in db.identity_map.values() if isinstance(obj, UserData)])
+    from core_system.services.leaderboard_service import schedule_leaderboard_rebuild
+    schedule_leaderboard_rebuild(db)
+    logging.info("team_power recomputed for every player.")
+
+
+def schedule_team_power_refresh(db: Session, *user_data_ids: int) -> None:
+    """
+    Queues the players' team_power to be recomputed right before `db` commits.
+    This function does NOT commit the transaction.
+    """
+    db.info.setdefault(_PENDING_INFO_KEY, set()).update(user_data_ids)
+
+
+@event.listens_for(Session, "before_commit")
+def _refresh_pending_team_power(session: Session):
+    if in_savepoint(session):
+        return
+    user_data_ids = session.info.pop(_PENDING_INFO_KEY, None)
+    if not user_data_ids:
+        return
+    session.flush()
+    refresh_team_power(session, *user_data_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_pending_team_power(session: Session):
+    if in_savepoint(session):
+        return
+    session.info.pop(_PENDING_INFO_KEY, None)
+
+
+def _on_char_stat_set(target, value, oldvalue, initiator):
+    db = object_session(target)
+    if db is not None and target.user_data_id is not None and value != oldvalue:
+        schedule_team_power_refresh(db, target.user_data_id)
+
+
+for _attribute in (UserChar.hp, UserChar.mp, UserChar.atk, UserChar.spd, UserChar.def_):
+    event.listen(_attribute, "set", _on_char_stat_set)
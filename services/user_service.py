@@ -1,13 +1,20 @@
 import logging
 from datetime import timedelta
-from typing import List
+from typing import Iterator, List, Optional
 
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from core_system.models.char_temp import CharTemp
+from core_system.models.sharding import is_sharded
 from core_system.models.user import User, UserChar, UserData, UserTeamMember
+from core_system.services.content_catalog import get_content_catalog
+from core_system.services.leaderboard_service import schedule_leaderboard_refresh
+from core_system.services.team_power_service import refresh_team_power
+from core_system.services.write_behind import write_behind_buffer
 from util.auth import create_access_token, get_password_hash, verify_password
 from core_system.config import ACCESS_TOKEN_EXPIRE_MINUTES
+from core_system.utils.profiling import profile_service
 
 # Default values for new user creation
 DEFAULT_STARTING_CHAR_IDS = [1,2]
@@ -19,6 +26,7 @@ class AuthenticationError(Exception):
     pass
 
 
+@profile_service(query_budget=1)
 def authenticate_user(db: Session, username: str, password: str) -> str:
     logging.debug(f"Attempting to authenticate user: {username}")
     user = db.query(User).filter(User.username == username).first()
@@ -31,6 +39,8 @@ def authenticate_user(db: Session, username: str, password: str) -> str:
         raise AuthenticationError("Invalid username or password")
 
     logging.debug(f"User '{username}' authenticated successfully. Creating access token.")
+    # last_login is buffered and written in batches instead of a row write per login
+    write_behind_buffer.touch_last_login(user.id)
     token = create_access_token(
         data={"sub": str(user.id)},
         expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -39,18 +49,81 @@ def authenticate_user(db: Session, username: str, password: str) -> str:
     return token
 
 
+@profile_service
 def get_all_users(db: Session) -> List[str]:
     """Retrieves a list of all usernames."""
     logging.debug("Fetching all users.")
-    users = db.query(User).all()
-    if not users:
+    # Only the username column is selected; no User objects (password hashes, timestamps) are loaded
+    usernames = list(iter_usernames(db))
+    if not usernames:
         logging.debug("No users found in the database.")
         return []
-    usernames = [user.username for user in users]
     logging.debug(f"Found {len(usernames)} users.")
     return usernames
 
 
+def _prefix_upper_bound(prefix: str) -> Optional[str]:
+    """Smallest string greater than every string starting with `prefix` (None if unbounded)."""
+    stripped = prefix.rstrip(chr(0x10FFFF))
+    if not stripped:
+        return None
+    return stripped[:-1] + chr(ord(stripped[-1]) + 1)
+
+
+def iter_usernames(db: Session,
+                   prefix: Optional[str] = None,
+                   chunk_size: int = 1000,
+                   after_username: Optional[str] = None) -> Iterator[str]:
+    """
+    Yields usernames in ascending order in keyset-paginated chunks of
+    `chunk_size`, so memory stays constant however many users exist.
+    Each chunk is one range scan on the unique username index:
+    `username > :last [AND username >= :prefix AND username < :prefix_upper] LIMIT :chunk_size`.
+    Pass the last username seen as `after_username` to resume.
+    """
+    lower = after_username
+    upper = None
+    if prefix:
+        upper = _prefix_upper_bound(prefix)
+    while True:
+        stmt = select(User.username)
+        if lower is not None:
+            stmt = stmt.where(User.username > lower)
+        if prefix:
+            stmt = stmt.where(User.username >= prefix)
+            if upper is not None:
+                stmt = stmt.where(User.username < upper)
+        chunk = db.execute(stmt.order_by(User.username).limit(chunk_size)).scalars().all()
+        if not chunk:
+            return
+        yield from chunk
+        if len(chunk) < chunk_size:
+            return
+        lower = chunk[-1]
+
+
+def stream_usernames(db: Session, prefix: Optional[str] = None, yield_per: int = 1000) -> Iterator[str]:
+    """
+    Yields every username (optionally filtered by prefix) from a single
+    streamed query using yield_per, i.e. a server-side cursor where the
+    driver supports one. Unlike iter_usernames this holds one statement open
+    for the whole iteration.
+    """
+    stmt = select(User.username).order_by(User.username)
+    if prefix:
+        stmt = stmt.where(User.username >= prefix)
+        upper = _prefix_upper_bound(prefix)
+        if upper is not None:
+            stmt = stmt.where(User.username < upper)
+    result = db.execute(stmt.execution_options(yield_per=yield_per))
+    try:
+        for partition in result.scalars().partitions():
+            yield from partition
+    finally:
+        result.close()
+
+
+@profile_service
 def add_user(db: Session, username: str, password: str) -> User:
     """
     Creates a user object, hashes the password, and adds it to the session.
@@ -69,6 +142,7 @@ def add_user(db: Session, username: str, password: str) -> User:
     return new_user
 
 
+@profile_service
 def create_user_data(db: Session, user_id: int) -> UserData:
     """
     Creates default user data and adds it to the session.
@@ -76,6 +150,9 @@ def create_user_data(db: Session, user_id: int) -> UserData:
     """
     logging.debug(f"Creating default UserData for user_id: {user_id}.")
     new_user_data = UserData(user_id=user_id,
+                             # Sharded player data is routed by user_data_id, so it
+                             # must be known before the insert; reuse the user id.
+                             id=user_id if is_sharded(db) else None,
                              money=0,
                              current_map_id=DEFAULT_STARTING_MAP_ID,
                              current_area_id=DEFAULT_STARTING_AREA_ID)
@@ -86,6 +163,7 @@ def create_user_data(db: Session, user_id: int) -> UserData:
     return new_user_data
 
 
+@profile_service
 def create_user_char(db: Session, char_id: int, target_user_data_id: int) -> UserChar:
     """
     Creates a default starting character for the user and adds it to the session.
@@ -93,7 +171,12 @@ def create_user_char(db: Session, char_id: int, target_user_data_id: int) -> Use
     :param target_user_data_id: The ID of the UserData record this character belongs to.
     """
     logging.debug(f"Creating UserChar from template char_id: {char_id} for user_data_id: {target_user_data_id}.")
-    char_temp = db.query(CharTemp).filter(CharTemp.id == char_id).first()
+    # Templates are static content; read them from the in-process catalog when loaded
+    catalog = get_content_catalog()
+    if catalog is not None:
+        char_temp = catalog.get_char_temp(char_id)
+    else:
+        char_temp = db.query(CharTemp).filter(CharTemp.id == char_id).first()
     if not char_temp:
         # It's good practice to handle cases where the template character doesn't exist.
         logging.error(f"Character template with id {char_id} not found during UserChar creation.")
@@ -116,6 +199,7 @@ def create_user_char(db: Session, char_id: int, target_user_data_id: int) -> Use
     logging.debug(f"UserChar object for template {char_id} added to session.")
     return new_user_char
 
+@profile_service
 def create_user_with_defaults(db: Session, username: str, password: str) -> User:
     """
     Handles the business logic for creating a new user with all their default data.
@@ -150,6 +234,7 @@ def create_user_with_defaults(db: Session, username: str, password: str) -> User
         logging.debug(f"Calling create_team for user_data_id: {new_user_data.id} with char_ids: {starting_char_ids}")
         create_team(db=db, user_data=new_user_data, selected_char_ids=starting_char_ids)
         logging.info(f"Step 4/4: Default team created for UserData ID {new_user_data.id}.")
+        schedule_leaderboard_refresh(db, new_user_data.id)
 
         logging.info(f"Successfully prepared user '{username}' for creation.")
         return new_user
@@ -164,6 +249,7 @@ def create_user_with_defaults(db: Session, username: str, password: str) -> User
         raise
 
 
+@profile_service(query_budget=6)
 def create_team(db: Session, user_data: UserData, selected_char_ids: list[int]):
     """
     Creates or updates the user's team, with a maximum of six characters.
@@ -214,3 +300,6 @@ def create_team(db: Session, user_data: UserData, selected_char_ids: list[int]):
         logging.debug(f"Appended char_id: {char_id} to team at position: {idx}")
     logging.debug(user_data.team_members)
     logging.debug(f"Finished creating {len(selected_char_ids)} new team members.")
+    db.flush()
+    refresh_team_power(db, user_data.id)
+    schedule_leaderboard_refresh(db, user_data.id)
@@ -0,0 +1,240 @@
+import atexit
+import logging
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional, Tuple
+
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.orm import Session
+
+from core_system.models.database import SessionLocal
+from core_system.models.maps import UserMapProgress
+from core_system.models.sharding import group_by_shard
+from core_system.models.user import User
+from core_system.utils.sql_utils import chunked, upsert_insert
+
+# UserMapProgress.progress and User.last_login change on nearly every
+# exploration / login. Instead of a row write per change, changes are
+# coalesced in memory per key and written in batched statements:
+#   progress    (user_data_id, map_id) -> summed increment, one upsert per flush
+#   last_login  user_id -> latest timestamp, one executemany UPDATE per flush
+# Readers in this process go through get_map_progress / get_last_login,
+# which overlay the buffered values on top of the stored ones.
+#
+# The interval flusher starts on the first buffered write, and whatever is
+# still buffered is written at interpreter shutdown. Writers never flush
+# themselves, so a failing flush cannot fail the login or exploration that
+# buffered the value; the values stay buffered for the next attempt.
+
+ProgressKey = Tuple[int, int]
+
+
+class WriteBehindBuffer:
+    def __init__(self,
+                 session_factory: Callable[[], Session] = SessionLocal,
+                 max_pending: int = 1000,
+                 flush_interval: float = 5.0):
+        self.session_factory = session_factory
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+
+        self._lock = threading.Lock()          # guards the pending / in-flight dicts
+        self._flush_lock = threading.RLock()   # serializes flushes
+        # Odd while a flush is committing, bumped again once its in-flight
+        # values are cleared; overlay reads retry when it moved under them
+        self._flush_generation = 0
+        self._flush_settled = threading.Condition(self._lock)
+        self._progress: Counter = Counter()
+        self._last_login: Dict[int, datetime] = {}
+        self._inflight_progress: Counter = Counter()
+        self._inflight_last_login: Dict[int, datetime] = {}
+
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._start_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        # Registered up front, so buffered values are written at exit even if
+        # the flusher thread never ran
+        atexit.register(self._stop_at_exit)
+
+    # ---------------------- Writes ----------------------
+
+    @property
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._progress) + len(self._last_login)
+
+    def add_map_progress(self, user_data_id: int, map_id: int, delta: int = 1) -> None:
+        self.start()
+        with self._lock:
+            self._progress[(user_data_id, map_id)] += delta
+            full = len(self._progress) + len(self._last_login) >= self.max_pending
+        if full:
+            self._on_full()
+
+    def touch_last_login(self, user_id: int, at: Optional[datetime] = None) -> None:
+        at = at or datetime.now(timezone.utc)
+        self.start()
+        with self._lock:
+            previous = self._last_login.get(user_id)
+            if previous is None or at > previous:
+                self._last_login[user_id] = at
+            full = len(self._progress) + len(self._last_login) >= self.max_pending
+        if full:
+            self._on_full()
+
+    def _on_full(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            self._wakeup.set()
+            return
+        # Stopped buffer: flush inline, but never fail the caller's write
+        try:
+            self.flush()
+        except Exception:
+            # Already logged by flush(); the values stay buffered
+            pass
+
+    # ---------------------- Reads ----------------------
+
+    def get_map_progress(self, db: Session, user_data_id: int, map_id: int) -> int:
+        """
+        Stored progress plus any increments not yet flushed. The SELECT runs
+        without holding a lock; if a flush committed while it ran, the stored
+        value may or may not include the in-flight increments, so the read is
+        retried. It only waits while a flush is inside its commit.
+        """
+        key = (user_data_id, map_id)
+        while True:
+            with self._lock:
+                self._flush_settled.wait_for(lambda: self._flush_generation % 2 == 0)
+                generation = self._flush_generation
+            stored = db.execute(
+                select(UserMapProgress.progress)
+                .where(UserMapProgress.user_data_id == user_data_id,
+                       UserMapProgress.map_id == map_id)
+            ).scalar_one_or_none() or 0
+            with self._lock:
+                if self._flush_generation == generation:
+                    return stored + self._inflight_progress.get(key, 0) + self._progress.get(key, 0)
+
+    def get_last_login(self, db: Session, user_id: int) -> Optional[datetime]:
+        with self._lock:
+            buffered = self._last_login.get(user_id) or self._inflight_last_login.get(user_id)
+        if buffered is not None:
+            return buffered
+        return db.execute(select(User.last_login).where(User.id == user_id)).scalar_one_or_none()
+
+    # ---------------------- Flush ----------------------
+
+    def flush(self) -> int:
+        """
+        Writes everything buffered so far in one transaction and returns the
+        number of keys written. On failure the values are put back in the buffer.
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._progress and not self._last_login:
+                    return 0
+                self._inflight_progress, self._progress = self._progress, Counter()
+                self._inflight_last_login, self._last_login = self._last_login, {}
+                progress = dict(self._inflight_progress)
+                last_login = dict(self._inflight_last_login)
+
+            committing = False
+            try:
+                with self.session_factory() as session:
+                    self._write(session, progress, last_login)
+                    with self._lock:
+                        self._flush_generation += 1
+                    committing = True
+                    session.commit()
+            except Exception:
+                logging.error("Write-behind flush failed; keeping values buffered.", exc_info=True)
+                with self._lock:
+                    self._progress.update(self._inflight_progress)
+                    for user_id, at in self._inflight_last_login.items():
+                        if user_id not in self._last_login or at > self._last_login[user_id]:
+                            self._last_login[user_id] = at
+                    self._inflight_progress, self._inflight_last_login = Counter(), {}
+                    if committing:
+                        self._settle_flush()
+                raise
+
+            with self._lock:
+                self._inflight_progress, self._inflight_last_login = Counter(), {}
+                self._settle_flush()
+        logging.debug(f"Write-behind flushed {len(progress)} progress and {len(last_login)} login updates.")
+        return len(progress) + len(last_login)
+
+    def _settle_flush(self) -> None:
+        # Called with _lock held, once the in-flight values are cleared
+        self._flush_generation += 1
+        self._flush_settled.notify_all()
+
+    @staticmethod
+    def _write(session: Session, progress: Dict[ProgressKey, int], last_login: Dict[int, datetime]) -> None:
+        if progress:
+            table = UserMapProgress.__table__
+            rows = [{"user_data_id": user_data_id, "map_id": map_id, "progress": delta}
+                    for (user_data_id, map_id), delta in progress.items()]
+            for bind_arguments, shard_rows in group_by_shard(session, rows):
+                for chunk in chunked(shard_rows, params_per_row=3):
+                    stmt = upsert_insert(session, table).values(chunk)
+                    stmt = stmt.on_conflict_do_update(
+                        index_elements=[table.c.user_data_id, table.c.map_id],
+                        set_={"progress": table.c.progress + stmt.excluded.progress},
+                    )
+                    session.execute(stmt, bind_arguments=bind_arguments)
+        if last_login:
+            table = User.__table__
+            session.execute(
+                update(table)
+                .where(table.c.id == bindparam("b_user_id"))
+                .values(last_login=bindparam("b_last_login")),
+                [{"b_user_id": user_id, "b_last_login": at} for user_id, at in last_login.items()],
+            )
+
+    # ---------------------- Background flushing ----------------------
+
+    def start(self) -> None:
+        """Starts the interval flusher; the writes call this on first use."""
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="write-behind-flusher", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stops the flusher and writes out whatever is still buffered."""
+        with self._start_lock:
+            self._stopped.set()
+            self._wakeup.set()
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join()
+        self.flush()
+
+    def _stop_at_exit(self) -> None:
+        try:
+            self.stop()
+        except Exception:
+            # Already logged by flush(); nothing left to retry with at shutdown
+            pass
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            if self._stopped.is_set():
+                break
+            try:
+                self.flush()
+            except Exception:
+                # Already logged by flush(); retry on the next interval
+                pass
+
+
+# Process-wide buffer used by the services
+write_behind_buffer = WriteBehindBuffer()
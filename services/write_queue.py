@@ -0,0 +1,182 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Tuple
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from core_system.models.database import DATABASE_URL, SessionLocal, player_shard_engines
+
+# Single-writer queue with group commit.
+#
+# With SQLite every request opening its own write transaction makes writers
+# contend for the database lock (SQLITE_BUSY, retries, long tails). Instead,
+# write jobs are submitted here and executed one after another by a single
+# writer thread on one connection:
+#
+#   future = write_queue.submit(user_service.create_user_with_defaults, "alice", "pw")
+#   user_id = future.result().id
+#
+# A job is `fn(session, *args, **kwargs)`; services already take the session
+# first and never commit, so they can be submitted as they are. The writer
+# takes whatever jobs are waiting (up to max_batch, waiting at most max_wait
+# for more), runs each inside its own SAVEPOINT and commits the batch once.
+# A failing job only rolls back its savepoint; its future gets the exception
+# and the other jobs of the batch still commit. Futures resolve after the
+# commit, so a result is never observed before it is durable.
+#
+# Jobs run with expire_on_commit=False and the session is closed after the
+# batch: returned ORM objects are detached, with the attributes that were
+# loaded. Session hooks (on_commit() callbacks, invalidation bus messages,
+# team_power refreshes) ignore the per-job SAVEPOINTs and only fire for the
+# batch's outer transaction: after the batch commit, or dropped if it rolls
+# back. Hooks of a job whose savepoint rolled back still run with the batch;
+# they are all idempotent invalidations / refreshes.
+#
+# For plain SQLite the writer uses its own engine with pysqlite's implicit
+# transaction handling turned off, so SAVEPOINT works and each batch starts
+# with BEGIN IMMEDIATE (the write lock is taken up front instead of failing
+# at the first write). Other databases and sharded setups use SessionLocal.
+
+Job = Tuple[Callable[..., Any], tuple, dict, Future]
+
+
+def create_sqlite_writer_engine(url: str) -> Engine:
+    writer_engine = create_engine(url, pool_size=1, max_overflow=0,
+                                  connect_args={"check_same_thread": False})
+
+    @event.listens_for(writer_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        # Let SQLAlchemy emit BEGIN itself (see "begin" below)
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys = ON")
+        # WAL lets readers on other connections proceed while the writer commits
+        cursor.execute("PRAGMA journal_mode = WAL")
+        cursor.execute("PRAGMA busy_timeout = 5000")
+        cursor.close()
+
+    @event.listens_for(writer_engine, "begin")
+    def _on_begin(conn):
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+    return writer_engine
+
+
+def _default_session_factory() -> Callable[[], Session]:
+    if DATABASE_URL.startswith("sqlite") and not player_shard_engines:
+        return sessionmaker(bind=create_sqlite_writer_engine(DATABASE_URL),
+                            autoflush=False, expire_on_commit=False)
+    return lambda: SessionLocal(expire_on_commit=False)
+
+
+class WriteQueue:
+    def __init__(self,
+                 session_factory: Optional[Callable[[], Session]] = None,
+                 max_batch: int = 64,
+                 max_wait: float = 0.002):
+        self._session_factory = session_factory
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._jobs: "queue.Queue[Optional[Job]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    @property
+    def session_factory(self) -> Callable[[], Session]:
+        if self._session_factory is None:
+            self._session_factory = _default_session_factory()
+        return self._session_factory
+
+    def submit(self, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        """Queues `fn(session, *args, **kwargs)`; starts the writer on first use."""
+        future: Future = Future()
+        self.start()
+        self._jobs.put((fn, args, kwargs, future))
+        return future
+
+    def run(self, fn: Callable[..., Any], *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """submit() and wait for the result (re-raises the job's exception)."""
+        return self.submit(fn, *args, **kwargs).result(timeout)
+
+    # ---------------------- Writer thread ----------------------
+
+    def start(self) -> None:
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="write-queue", daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def stop(self) -> None:
+        """Runs every job submitted so far, then stops the writer."""
+        with self._start_lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._jobs.put(None)
+            thread.join()
+
+    def _next_batch(self) -> Tuple[List[Job], bool]:
+        """Blocks for one job, then gathers more for up to max_wait. Returns (jobs, stop requested)."""
+        first = self._jobs.get()
+        if first is None:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            try:
+                job = self._jobs.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if job is None:
+                return batch, True
+            batch.append(job)
+        return batch, False
+
+    def _run(self) -> None:
+        while True:
+            batch, stop = self._next_batch()
+            if batch:
+                self._execute(batch)
+            if stop:
+                return
+
+    def _execute(self, batch: List[Job]) -> None:
+        outcomes: List[Tuple[Future, bool, Any]] = []
+        try:
+            with self.session_factory() as session:
+                for fn, args, kwargs, future in batch:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    try:
+                        with session.begin_nested():
+                            result = fn(session, *args, **kwargs)
+                            session.flush()
+                        outcomes.append((future, True, result))
+                    except Exception as exc:
+                        outcomes.append((future, False, exc))
+                session.commit()
+        except Exception as exc:
+            logging.error(f"Write queue commit of {len(batch)} jobs failed.", exc_info=True)
+            # Nothing of the batch was committed, including the jobs that succeeded
+            for _, _, _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+
+        for future, ok, value in outcomes:
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+        logging.debug(f"Write queue committed {len(outcomes)} jobs in one transaction.")
+
+
+# Process-wide writer used by the services
+write_queue = WriteQueue()
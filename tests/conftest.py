@@ -0,0 +1,47 @@
+import os
+import tempfile
+
+# models/database.py binds its engine from DATABASE_URL on first import;
+# the tests always use a throwaway SQLite file, never a configured database.
+_tmp_dir = tempfile.mkdtemp(prefix="core_system_tests_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp_dir, 'test.db')}"
+os.environ.pop("PLAYER_SHARD_COUNT", None)
+os.environ.pop("PLAYER_SHARD_URLS", None)
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture
+def db():
+    """A session on a freshly created schema."""
+    from core_system import models  # noqa: F401  (registers every mapped table)
+    from core_system.models import audit, bo_admin, inventory, npc  # noqa: F401
+    from core_system.models.database import Base, SessionLocal, engine
+    from core_system.services import content_catalog
+
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    content_catalog.set_content_catalog(None)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def user_data_id(db):
+    """A player created with the default map, area and starting characters."""
+    from core_system.models.char_temp import CharTemp
+    from core_system.models.maps import Map, MapArea
+    from core_system.services import user_service
+
+    db.add_all([CharTemp(id=i, name=f"c{i}", rarity=1, base_hp=10 * i, base_mp=5, base_atk=3,
+                         base_spd=2, base_def=1) for i in (1, 2, 3)])
+    db.add(Map(id=1, name="map1"))
+    db.flush()
+    db.add(MapArea(id=1, map_id=1, name="area1"))
+    db.flush()
+    user_data_id = user_service.create_user_with_defaults(db, "alice", "password").user_data.id
+    db.commit()
+    return user_data_id
@@ -0,0 +1,93 @@
+import random
+
+from core_system.models.association_tables import MapConnection
+from core_system.models.event import RewardPool
+from core_system.models.items import Item, RewardPoolItem
+from core_system.models.maps import Map, MapArea
+from core_system.models.monsters import Monster, MonsterPool, MonsterPoolEntry
+from core_system.services import content_catalog, encounter_service
+from core_system.services.content_snapshot import SnapshotWatcher, export_content_snapshot, open_content_snapshot
+
+_MAPPINGS = ("items", "monsters", "char_temps", "events", "maps", "map_areas", "reward_pools", "monster_pools")
+
+
+def _add_content(db):
+    db.add_all([Item(id=1, name="potion", item_type="consumable", price=10, rarity=1, hp_restore=20),
+                Item(id=2, name="sword", description="sharp", item_type="equipment", price=300, rarity=3,
+                     slot="weapon", atk_bonus=5),
+                Monster(id=1, name="slime", hp=5, mp=0, atk=1, spd=1, def_=1),
+                Monster(id=2, name="wolf", description="fast", hp=30, mp=0, atk=6, spd=9, def_=2),
+                Map(id=2, name="map2", description="forest"),
+                RewardPool(id=1, name="drops"), MonsterPool(id=1, name="field")])
+    db.flush()
+    db.add_all([MapArea(id=2, map_id=2, name="area2", init_npc=[{"npc_id": 1, "npc_name": "guard"}]),
+                MapConnection(map_a_id=1, map_b_id=2, is_locked=True, required_level=3),
+                RewardPoolItem(pool_id=1, item_id=1, probability=0.75),
+                RewardPoolItem(pool_id=1, item_id=2, probability=0.25),
+                MonsterPoolEntry(pool_id=1, monster_id=1, probability=1.0),
+                MonsterPoolEntry(pool_id=1, monster_id=2, probability=0.5)])
+    db.commit()
+
+
+def test_export_and_load_round_trip(db, user_data_id, tmp_path):
+    _add_content(db)
+    catalog = content_catalog.build_content_catalog(db)
+    path = str(tmp_path / "content.snap")
+    assert export_content_snapshot(db, path) == 1
+    assert export_content_snapshot(catalog, path) == 2
+
+    view = open_content_snapshot(path)
+    assert view.snapshot_version == 2
+    for name in _MAPPINGS:
+        assert dict(getattr(view, name)) == dict(getattr(catalog, name)), name
+    assert view.get_map(2).connections == catalog.get_map(2).connections
+    assert view.get_map_area(2).init_npc == ({"npc_id": 1, "npc_name": "guard"},)
+    assert view.get_item(99) is None
+
+
+def test_snapshot_and_database_catalogs_never_share_a_version(db, user_data_id, tmp_path):
+    _add_content(db)
+    loaded = content_catalog.load_content_catalog(db)
+    pool = encounter_service.get_compiled_monster_pool(loaded, 1)
+
+    # A snapshot whose header version happens to equal the loaded catalog's
+    db.get(Monster, 1).hp = 500
+    db.commit()
+    path = str(tmp_path / "content.snap")
+    export_content_snapshot(db, path, version=loaded.version)
+    view = open_content_snapshot(path)
+    assert view.snapshot_version == loaded.version != view.version
+
+    assert encounter_service.get_compiled_monster_pool(view, 1) != pool
+    picked = encounter_service.pick_monster(encounter_service.get_compiled_monster_pool(view, 1), 500, 0.1,
+                                            random.Random(0))
+    assert picked == (1, 503, True)
+
+
+def test_watcher_hot_swaps_newer_snapshots_and_wins_over_database_edits(db, user_data_id, tmp_path):
+    _add_content(db)
+    path = str(tmp_path / "content.snap")
+    export_content_snapshot(db, path, version=5)
+    watcher = SnapshotWatcher(path, check_interval=3600)
+    first = watcher.current()
+    assert content_catalog.get_content_catalog() is first
+    assert not watcher.refresh()
+
+    # An edit in the database does not replace the installed snapshot
+    db.get(Item, 1).price = 11
+    content_catalog.schedule_content_catalog_rebuild(db)
+    db.commit()
+    assert content_catalog.get_content_catalog() is first
+    assert first.get_item(1).price == 10
+
+    # ...until it is exported; older files are ignored
+    export_content_snapshot(db, path)
+    assert watcher.refresh()
+    second = content_catalog.get_content_catalog()
+    assert (second.snapshot_version, second.get_item(1).price) == (6, 11)
+    assert second.version != first.version
+    assert first.get_item(1).price == 10  # views already handed out stay valid
+
+    export_content_snapshot(db, path, version=3)
+    assert not watcher.refresh()
+    assert watcher.current() is second and content_catalog.get_content_catalog() is second
@@ -0,0 +1,19 @@
+import pytest
+
+from core_system.models.user import UserData
+from core_system.services import currency_service
+from core_system.utils.session_hooks import on_commit
+
+
+def test_rejected_settlement_keeps_callers_hooks_and_writes(db, user_data_id):
+    calls = []
+    currency_service.earn_money(db, user_data_id, 10, "quest")
+    on_commit(db, "test", lambda: calls.append("committed"))
+    with pytest.raises(currency_service.InsufficientFundsError):
+        currency_service.settle_money_deltas(db, {user_data_id: -100}, "settlement")
+    assert calls == []
+
+    db.commit()
+    assert calls == ["committed"]
+    assert db.get(UserData, user_data_id).money == 10
+    assert [entry.delta for entry in currency_service.get_ledger(db, user_data_id)] == [10]
@@ -0,0 +1,53 @@
+import pytest
+
+from core_system.services.draw_audit import DrawAuditPipeline, DrawAuditRecord
+
+
+class FlakySink:
+    """Collects event ids; raises on the listed write_batch calls (1-based)."""
+
+    def __init__(self, fail_on=()):
+        self.fail_on = set(fail_on)
+        self.calls = 0
+        self.event_ids = []
+
+    def write_batch(self, records):
+        self.calls += 1
+        if self.calls in self.fail_on:
+            raise RuntimeError("sink unavailable")
+        self.event_ids.extend(record.event_id for record in records)
+
+    def close(self):
+        pass
+
+
+def _append(pipeline, *event_ids):
+    for event_id in event_ids:
+        pipeline.append(DrawAuditRecord(map_id=1, event_id=event_id))
+
+
+def test_rejected_batch_goes_back_to_the_buffer():
+    sink = FlakySink(fail_on={1})
+    pipeline = DrawAuditPipeline(sink, batch_size=2)
+    _append(pipeline, 1, 2, 3)
+
+    with pytest.raises(RuntimeError):
+        pipeline.flush()
+    assert pipeline.flush() == 3
+    assert sink.event_ids == [1, 2, 3]
+
+
+def test_failed_spill_drain_is_resumed_before_the_next_spill_file(tmp_path):
+    sink = FlakySink(fail_on={3})
+    pipeline = DrawAuditPipeline(sink, capacity=1, batch_size=2, backpressure="spill",
+                                 spill_path=str(tmp_path / "draw-audit.spill"))
+    _append(pipeline, 0, 1, 2, 3, 4, 5)  # 0 buffered, 1-5 spilled
+
+    # 0 and the spilled [1, 2] are written, then the sink fails on [3, 4]
+    with pytest.raises(RuntimeError):
+        pipeline.flush()
+    _append(pipeline, 6, 7)  # 6 buffered, 7 spilled into a fresh spill file
+
+    pipeline.flush()
+    assert sink.event_ids == [0, 1, 2, 6, 3, 4, 5, 7]
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,79 @@
+import random
+
+import pytest
+
+from core_system.models.monsters import Monster, MonsterPool, MonsterPoolEntry
+from core_system.models.user import UserData
+from core_system.services import encounter_service
+from core_system.services.encounter_service import _CompiledMonsterPool, pick_monster
+
+
+class FixedRandom(random.Random):
+    def __init__(self, value):
+        super().__init__()
+        self.value = value
+
+    def random(self):
+        return self.value
+
+
+def _pool(*entries):
+    """(power, monster_id, weight) entries, ascending by power."""
+    cum, total = [], 0.0
+    for _, _, weight in entries:
+        total += weight
+        cum.append(total)
+    return _CompiledMonsterPool(powers=tuple(power for power, _, _ in entries),
+                                monster_ids=tuple(monster_id for _, monster_id, _ in entries),
+                                cum_weights=tuple(cum))
+
+
+def test_pick_monster_bisects_the_weights_inside_the_band():
+    pool = _pool((50, 1, 5.0), (90, 2, 1.0), (100, 3, 3.0), (110, 4, 0.0), (200, 5, 5.0))
+    # Band [80, 120] holds monsters 2, 3 and 4 with weights 1, 3, 0
+    assert pick_monster(pool, 100, 0.2, FixedRandom(0.0)) == (2, 90, True)
+    assert pick_monster(pool, 100, 0.2, FixedRandom(0.3)) == (3, 100, True)
+    # The zero-weight monster is never picked, not even at the top of the range
+    assert pick_monster(pool, 100, 0.2, FixedRandom(0.999999)) == (3, 100, True)
+
+
+def test_pick_monster_with_an_all_zero_band_picks_uniformly_inside_it():
+    pool = _pool((10, 1, 1.0), (100, 2, 0.0), (105, 3, 0.0), (300, 4, 1.0))
+    picks = {pick_monster(pool, 100, 0.1, random.Random(seed))[0] for seed in range(20)}
+    assert picks == {2, 3}
+
+
+def test_pick_monster_falls_back_to_the_closest_power():
+    pool = _pool((10, 1, 1.0), (40, 2, 1.0), (100, 3, 1.0))
+    rng = random.Random(0)
+    assert pick_monster(pool, 5, 0.1, rng) == (1, 10, False)       # below every monster
+    assert pick_monster(pool, 1000, 0.1, rng) == (3, 100, False)   # above every monster
+    assert pick_monster(pool, 65, 0.1, rng) == (2, 40, False)      # closer to the lower neighbour
+    assert pick_monster(pool, 75, 0.1, rng) == (3, 100, False)
+    assert pick_monster(pool, 70, 0.1, rng) == (2, 40, False)      # ties go down
+    assert pick_monster(_pool(), 10, 0.1, rng) is None
+
+
+def test_select_encounter_matches_the_team_power(db, user_data_id):
+    team_power = db.get(UserData, user_data_id).team_power
+    db.add_all([Monster(id=1, name="weak", hp=1, mp=1, atk=1, spd=1, def_=1),
+                Monster(id=2, name="even", hp=team_power - 4, mp=1, atk=1, spd=1, def_=1),
+                Monster(id=3, name="strong", hp=team_power * 5, mp=1, atk=1, spd=1, def_=1),
+                MonsterPool(id=1, name="p1"), MonsterPool(id=2, name="p2")])
+    db.flush()
+    db.add_all([MonsterPoolEntry(pool_id=1, monster_id=monster_id, probability=1.0) for monster_id in (1, 2, 3)]
+               + [MonsterPoolEntry(pool_id=2, monster_id=3, probability=1.0)])
+    db.commit()
+
+    encounter = encounter_service.select_encounter(db, user_data_id, 1, rng=random.Random(0))
+    assert (encounter.monster_id, encounter.monster_power, encounter.team_power, encounter.in_band) == \
+        (2, team_power, team_power, True)
+    encounter = encounter_service.select_encounter(db, user_data_id, 2)
+    assert (encounter.monster_id, encounter.in_band) == (3, False)
+
+    with pytest.raises(ValueError):
+        encounter_service.select_encounter(db, user_data_id, 99)
+    with pytest.raises(ValueError):
+        encounter_service.select_encounter(db, user_data_id + 1, 1)
+    with pytest.raises(ValueError):
+        encounter_service.select_encounter(db, user_data_id, 1, band=-0.1)
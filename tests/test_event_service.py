@@ -0,0 +1,32 @@
+from core_system.models.event import Event, EventResult, GeneralEventLogic
+from core_system.services import event_service
+from core_system.utils.profiling import capture_queries
+
+
+def test_event_detail_loads_story_text_without_n_plus_one(db):
+    db.add(Event(id=1, name="e1", type="normal", description="desc"))
+    db.add(GeneralEventLogic(id=1, event_id=1, story_text='[{"name": null, "text": "intro"}]'))
+    db.add_all([EventResult(id=i, name=f"r{i}", general_event_logic_id=1,
+                            story_text=f'[{{"name": null, "text": "r{i}"}}]')
+                for i in (1, 2, 3)])
+    db.commit()
+    db.expunge_all()
+
+    with capture_queries("event_detail") as profile:
+        event = event_service.get_event_by_event_id(db, 1)
+        texts = [event.description, event.general_logic.story_text]
+        texts += [result.story_text for result in event.general_logic.event_results]
+    assert len(profile.captured) == 3
+    assert texts[0] == "desc"
+    assert len(texts) == 5
+
+
+def test_summary_listing_selects_only_list_columns(db):
+    db.add_all([Event(id=i, name=f"e{i}", type="normal", description="long " * 100) for i in (1, 2, 3)])
+    db.commit()
+
+    with capture_queries("fetch_events") as profile:
+        events = event_service.fetch_events(db, None, 2, summary=True)
+    assert [(e.id, e.name, e.type) for e in events] == [(1, "e1", "normal"), (2, "e2", "normal")]
+    assert len(profile.captured) == 1
+    assert "description" not in profile.captured[0][0]
@@ -0,0 +1,80 @@
+from types import SimpleNamespace
+
+from core_system.models.invalidation import ContentInvalidation
+from core_system.services import invalidation_bus
+from core_system.services.invalidation_bus import InvalidationSubscriber, publish_invalidation
+
+
+def _record(monkeypatch, entity="test_entity"):
+    calls = []
+    monkeypatch.setitem(invalidation_bus._handlers, entity, [calls.append])
+    return calls
+
+
+def _insert(db, *messages, source="other-worker"):
+    """(id, entity_id) messages about test_entity, committed by another process."""
+    db.add_all([ContentInvalidation(id=message_id, entity="test_entity", entity_id=entity_id, source=source)
+                for message_id, entity_id in messages])
+    db.commit()
+
+
+def test_poll_evicts_what_other_processes_published(db, monkeypatch):
+    calls = _record(monkeypatch)
+    subscriber = InvalidationSubscriber()
+    _insert(db, (1, 7))
+    assert subscriber.poll() == 0  # only records the position
+    assert calls == []
+
+    _insert(db, (2, 1), (3, 2))
+    publish_invalidation(db, "test_entity", 3)  # this process: handled by its own on_commit hooks
+    db.commit()
+    assert subscriber.poll() == 2
+    assert calls == [{1, 2}]
+
+    _insert(db, (5, 4), (6, None))
+    assert subscriber.poll() == 2
+    assert calls[-1] is invalidation_bus.ALL
+    assert subscriber.poll() == 0
+    assert len(calls) == 2
+
+
+def test_ids_committed_out_of_order_are_picked_up_later(db, monkeypatch):
+    calls = _record(monkeypatch)
+    subscriber = InvalidationSubscriber()
+    subscriber.poll()
+
+    # 1 and 2 are still uncommitted when 3 becomes visible
+    _insert(db, (3, 30))
+    assert subscriber.poll() == 1
+    assert sorted(subscriber._gaps) == [1, 2]
+
+    _insert(db, (2, 20))
+    assert subscriber.poll() == 1
+    assert calls == [{30}, {20}]
+    assert sorted(subscriber._gaps) == [1]
+    assert subscriber.last_id == 3
+
+
+def test_gaps_expire_after_the_timeout(db, monkeypatch):
+    calls = _record(monkeypatch)
+    clock = SimpleNamespace(now=100.0)
+    monkeypatch.setattr(invalidation_bus, "time", SimpleNamespace(monotonic=lambda: clock.now))
+    subscriber = InvalidationSubscriber(gap_timeout=30.0)
+    subscriber.poll()
+
+    _insert(db, (4, 40))
+    subscriber.poll()
+    assert sorted(subscriber._gaps) == [1, 2, 3]
+
+    clock.now += 10
+    _insert(db, (1, 10))
+    assert subscriber.poll() == 1
+    assert sorted(subscriber._gaps) == [2, 3]
+
+    # Rolled back, never committed: given up on after gap_timeout
+    clock.now += 25
+    subscriber.poll()
+    assert subscriber._gaps == {}
+    _insert(db, (2, 20))
+    assert subscriber.poll() == 0
+    assert calls == [{40}, {10}]
@@ -0,0 +1,39 @@
+import pytest
+
+from core_system.models.items import Item
+from core_system.services import inventory_service
+from core_system.utils.profiling import capture_queries
+from core_system.utils.sql_utils import MAX_BIND_PARAMS
+from core_system.utils.session_hooks import on_commit
+
+
+def test_failed_consume_keeps_callers_hooks_and_writes(db, user_data_id):
+    db.add_all([Item(id=i, name=f"i{i}", item_type="material", price=1, rarity=1) for i in (1, 2)])
+    db.commit()
+
+    calls = []
+    inventory_service.grant_items(db, user_data_id, [(1, 2)])
+    on_commit(db, "test", lambda: calls.append("committed"))
+    with pytest.raises(inventory_service.InsufficientItemsError):
+        inventory_service.consume_items(db, user_data_id, [(1, 1), (2, 1)])
+    # Neither the savepoint release nor its rollback touched the queued hook
+    assert calls == []
+
+    db.commit()
+    assert calls == ["committed"]
+    assert inventory_service.get_inventory(db, user_data_id) == {1: 2}
+
+
+def test_consume_guard_counts_every_bound_parameter(db, user_data_id):
+    most = (MAX_BIND_PARAMS - 3) // 5
+    db.add_all([Item(id=i, name=f"i{i}", item_type="material", price=1, rarity=1) for i in range(1, most + 2)])
+    db.commit()
+    inventory_service.grant_items(db, user_data_id, [(i, 1) for i in range(1, most + 2)])
+
+    with capture_queries("consume") as profile:
+        inventory_service.consume_items(db, user_data_id, [(i, 1) for i in range(1, most + 1)])
+    (_, parameters), = [entry for entry in profile.captured if entry[0].lstrip().upper().startswith("UPDATE")]
+    assert len(parameters) == most * 5 + 3 <= MAX_BIND_PARAMS
+
+    with pytest.raises(ValueError):
+        inventory_service.consume_items(db, user_data_id, [(i, 1) for i in range(1, most + 2)])
@@ -0,0 +1,24 @@
+from core_system.models.items import Item
+from core_system.models.maps import Map
+from core_system.services import content_catalog, item_index_service
+
+
+def test_index_only_resyncs_when_items_change(db, monkeypatch):
+    db.add_all([Item(id=i, name=f"i{i}", item_type="material", price=10 * i, rarity=1) for i in (1, 2, 3)])
+    db.commit()
+    monkeypatch.setattr(item_index_service, "_item_index", None)
+    first = content_catalog.load_content_catalog(db)
+    index = item_index_service.get_item_index()
+
+    # A non-item content change rebuilds the catalog but shares its items
+    db.add(Map(id=1, name="map1"))
+    db.commit()
+    second = content_catalog.load_content_catalog(db)
+    assert second.items is first.items
+    assert index.sync(second.items, catalog_version=second.version) == 0
+    assert item_index_service.get_item_index().catalog_version == second.version
+
+    db.get(Item, 2).price = 5
+    db.commit()
+    content_catalog.load_content_catalog(db)
+    assert [record.id for record in item_index_service.search_items(price=(1, 9))] == [2]
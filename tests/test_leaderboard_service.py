@@ -0,0 +1,98 @@
+import random
+
+import pytest
+
+from core_system.models.user import UserData
+from core_system.services import leaderboard_service
+from core_system.services.leaderboard_service import Leaderboard
+from core_system.utils.skiplist import IndexableSkipList
+
+
+@pytest.mark.parametrize("bulk", [False, True])
+def test_skiplist_matches_a_sorted_list(bulk):
+    rng = random.Random(1)
+    keys = sorted(rng.sample(range(10_000), 300))
+    if bulk:
+        skiplist = IndexableSkipList.from_sorted(keys, seed=2)
+    else:
+        skiplist = IndexableSkipList(rng.sample(keys, 300), seed=2)
+    expected = list(keys)
+
+    for _ in range(600):
+        key = rng.randrange(10_000)
+        if key in expected:
+            assert skiplist.remove(key) == expected.index(key)
+            expected.remove(key)
+            with pytest.raises(KeyError):
+                skiplist.remove(key)
+        else:
+            expected.append(key)
+            expected.sort()
+            assert skiplist.insert(key) == expected.index(key)
+            with pytest.raises(KeyError):
+                skiplist.insert(key)
+
+    assert len(skiplist) == len(expected)
+    assert list(skiplist) == expected
+    for position in (0, 1, len(expected) // 2, len(expected) - 1):
+        assert skiplist.index(expected[position]) == position
+        assert skiplist[position] == expected[position]
+        assert list(skiplist.iter_from(position)) == expected[position:]
+    assert skiplist[-1] == expected[-1]
+    assert list(skiplist.iter_from(len(expected))) == []
+    assert -1 not in skiplist
+    with pytest.raises(KeyError):
+        skiplist.index(-1)
+    with pytest.raises(IndexError):
+        skiplist[len(expected)]
+
+
+def test_skiplist_empty():
+    for skiplist in (IndexableSkipList(), IndexableSkipList.from_sorted([])):
+        assert len(skiplist) == 0
+        assert list(skiplist.iter_from(0)) == []
+        assert skiplist.insert(5) == 0
+        assert skiplist.remove(5) == 0
+        assert list(skiplist) == []
+
+
+def test_page_and_around():
+    board = Leaderboard("test")
+    # Ties rank the smaller user_data_id first
+    board.load([(1, 10), (2, 50), (3, 30), (4, 30), (5, 20), (6, 40)])
+    board.update(1, 60)
+    board.remove(6)
+
+    def ranked(entries):
+        return [(entry.rank, entry.user_data_id, entry.score) for entry in entries]
+
+    assert ranked(board.page()) == [(1, 1, 60), (2, 2, 50), (3, 3, 30), (4, 4, 30), (5, 5, 20)]
+    assert ranked(board.page(2, 2)) == [(3, 3, 30), (4, 4, 30)]
+    assert board.page(5) == []
+    assert ranked(board.around(3, radius=1)) == [(2, 2, 50), (3, 3, 30), (4, 4, 30)]
+    assert ranked(board.around(1, radius=2)) == [(1, 1, 60), (2, 2, 50), (3, 3, 30)]
+    assert ranked(board.around(5, radius=2)) == [(3, 3, 30), (4, 4, 30), (5, 5, 20)]
+    assert board.around(6) == []
+    assert board.rank(4) == 4 and board.rank(6) is None
+
+
+def test_scores_are_refreshed_after_commit_only(db, user_data_id):
+    leaderboard_service.rebuild_leaderboards(db)
+    board = leaderboard_service.get_leaderboard("money")
+    before = board.score(user_data_id)
+
+    db.get(UserData, user_data_id).money = before + 500
+    db.flush()
+    assert board.score(user_data_id) == before
+    db.rollback()
+    assert board.score(user_data_id) == before
+
+    # A rolled-back savepoint keeps the outer transaction's pending refresh
+    db.get(UserData, user_data_id).money = before + 100
+    with db.begin_nested() as savepoint:
+        db.get(UserData, user_data_id).money = before + 200
+        savepoint.rollback()
+    assert board.score(user_data_id) == before
+    db.commit()
+    assert board.score(user_data_id) == before + 100
+    assert leaderboard_service.get_user_rank("money", user_data_id).rank == 1
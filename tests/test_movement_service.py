@@ -0,0 +1,60 @@
+import pytest
+from sqlalchemy import update
+
+from core_system.models.association_tables import MapConnection
+from core_system.models.inventory import UserInventoryItem
+from core_system.models.items import Item
+from core_system.models.maps import Map, MapArea
+from core_system.models.user import UserData
+from core_system.services import movement_service
+from core_system.utils.profiling import capture_queries
+
+
+@pytest.fixture
+def world(db, user_data_id):
+    # 1 -- 2 open, 2 -- 3 needs item 1, 1 -- 3 locked, 4 unconnected
+    db.add(Item(id=1, name="key", item_type="quest", price=1, rarity=1))
+    db.add_all([Map(id=i, name=f"map{i}") for i in (2, 3, 4)])
+    db.flush()
+    db.add_all([MapArea(id=i, map_id=i, name=f"area{i}") for i in (2, 3, 4)])
+    db.add_all([MapConnection(map_a_id=1, map_b_id=2),
+                MapConnection(map_a_id=2, map_b_id=3, required_item="1"),
+                MapConnection(map_a_id=1, map_b_id=3, is_locked=True)])
+    db.commit()
+    movement_service.invalidate_movement_graph()
+    return user_data_id
+
+
+def _reason(db, user_data_id, target):
+    with pytest.raises(movement_service.MovementError) as error:
+        movement_service.move_to_map(db, user_data_id, target)
+    return error.value.reason
+
+
+def test_moves_follow_open_edges_and_gates(db, world):
+    movement_service.get_movement_graph(db)
+    with capture_queries("move") as profile:
+        assert movement_service.move_to_map(db, world, 2) == (2, 2)
+    assert len(profile.captured) == 2
+
+    assert _reason(db, world, 3) == "item"
+    db.add(UserInventoryItem(user_data_id=world, item_id=1, quantity=1))
+    db.flush()
+    assert movement_service.move_to_map(db, world, 3) == (3, 3)
+    assert _reason(db, world, 1) == "locked"
+    assert _reason(db, world, 4) == "not_adjacent"
+    assert _reason(db, world, 99) == "unknown_map"
+
+
+def test_move_is_guarded_on_the_current_map(db, world, monkeypatch):
+    graph = movement_service.get_movement_graph(db)
+    real_is_open = graph.is_open
+
+    def is_open_then_moved(src, dst):
+        # Another request moves the player between the read and the UPDATE
+        db.execute(update(UserData).where(UserData.id == world).values(current_map_id=4))
+        return real_is_open(src, dst)
+
+    monkeypatch.setattr(graph, "is_open", is_open_then_moved)
+    assert _reason(db, world, 2) == "conflict"
+    assert db.get(UserData, world).current_map_id == 4
@@ -0,0 +1,17 @@
+from core_system.models.maps import MapArea
+from core_system.services import npc_service
+from core_system.services.content_catalog import schedule_content_catalog_rebuild
+
+
+def test_content_edit_refreshes_defaults_in_the_editing_worker(db, user_data_id):
+    # No catalog loaded: the defaults are read from map_areas and cached
+    npc_service.invalidate_npc_defaults()
+    area = db.get(MapArea, 1)
+    area.init_npc = [{"npc_id": 1, "npc_name": "guard"}]
+    db.commit()
+    assert npc_service.get_npc_defaults(db).npc_ids_in(1) == [1]
+
+    area.init_npc = [{"npc_id": 2, "npc_name": "merchant"}]
+    schedule_content_catalog_rebuild(db)
+    db.commit()
+    assert npc_service.get_npc_defaults(db).npc_ids_in(1) == [2]
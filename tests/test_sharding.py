@@ -0,0 +1,101 @@
+import pytest
+from sqlalchemy import select
+
+from core_system.models.char_temp import CharTemp
+from core_system.models.database import Base, engine
+from core_system.models.maps import Map, MapArea, UserMapProgress
+from core_system.models.npc import UserNPCState
+from core_system.models.sharding import (SHARD_ID_RANGE_TABLES, build_sharded_sessionmaker,
+                                         create_player_shard_engines, create_sharded_schema,
+                                         local_sqlite_shard_urls, reserve_shard_id_range, shard_id_range)
+from core_system.models.user import UserChar, UserData
+from core_system.services import map_service, user_service
+
+SHARD_COUNT = 2
+
+
+@pytest.fixture
+def shards(db, tmp_path):
+    """Player engines for two SQLite shards next to the (fresh) main test database."""
+    player_engines = create_player_shard_engines(local_sqlite_shard_urls(str(tmp_path), SHARD_COUNT))
+    create_sharded_schema(Base.metadata, engine, player_engines)
+    yield player_engines
+    for player_engine in player_engines.values():
+        player_engine.dispose()
+
+
+@pytest.fixture
+def sharded_db(shards):
+    session = build_sharded_sessionmaker(engine, shards)()
+    session.add_all([CharTemp(id=i, name=f"c{i}", rarity=1, base_hp=10 * i, base_mp=5, base_atk=3,
+                              base_spd=2, base_def=1) for i in (1, 2, 3)])
+    session.add_all([Map(id=1, name="map1"), Map(id=2, name="map2")])
+    session.flush()
+    session.add_all([MapArea(id=1, map_id=1, name="area1"), MapArea(id=2, map_id=2, name="area2")])
+    session.commit()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def _create_players(db, *usernames):
+    ids = [user_service.create_user_with_defaults(db, username, "password").user_data.id for username in usernames]
+    db.commit()
+    return ids
+
+
+def test_player_row_ids_are_unique_across_shards(sharded_db, shards):
+    alice, bob = _create_players(sharded_db, "alice", "bob")
+    assert {alice % SHARD_COUNT, bob % SHARD_COUNT} == {0, 1}
+
+    chars = {}
+    for user_data_id in (alice, bob):
+        owned = sharded_db.scalars(select(UserChar).where(UserChar.user_data_id == user_data_id)).all()
+        first, last = shard_id_range(user_data_id % SHARD_COUNT, SHARD_COUNT)
+        assert len(owned) == 2 and all(first <= char.id <= last for char in owned)
+        chars.update((char.id, user_data_id) for char in owned)
+        assert all(first <= member.id <= last for member in sharded_db.get(UserData, user_data_id).team_members)
+    assert len(chars) == 4
+
+    sharded_db.expunge_all()
+    for char_id, user_data_id in chars.items():
+        assert sharded_db.get(UserChar, char_id).user_data_id == user_data_id
+
+    # Reserving again leaves the sequences where they are
+    for shard_id, player_engine in shards.items():
+        with player_engine.begin() as connection:
+            assert reserve_shard_id_range(connection, int(shard_id[-1]), SHARD_COUNT) == []
+
+
+def test_bulk_delete_maps_clears_player_rows_on_every_shard(sharded_db):
+    players = _create_players(sharded_db, "alice", "bob")
+    for user_data_id in players:
+        user_data = sharded_db.get(UserData, user_data_id)
+        user_data.current_map_id, user_data.current_area_id = 1, 1
+        sharded_db.add_all([UserMapProgress(user_data_id=user_data_id, map_id=1, progress=3),
+                            UserMapProgress(user_data_id=user_data_id, map_id=2, progress=4),
+                            UserNPCState(user_id=user_data.user_id, npc_id=1, map_area_id=1),
+                            UserNPCState(user_id=user_data.user_id, npc_id=2, map_area_id=2)])
+    sharded_db.commit()
+
+    assert map_service.bulk_delete_maps(sharded_db, [1]) == 1
+    sharded_db.commit()
+    sharded_db.expire_all()
+
+    rows = sharded_db.execute(select(UserMapProgress.user_data_id, UserMapProgress.map_id)).all()
+    assert sorted(rows) == [(user_data_id, 2) for user_data_id in sorted(players)]
+    for user_data_id in players:
+        user_data = sharded_db.get(UserData, user_data_id)
+        assert (user_data.current_map_id, user_data.current_area_id) == (None, None)
+    states = sharded_db.execute(select(UserNPCState.npc_id, UserNPCState.map_area_id)).all()
+    assert sorted(states) == [(1, None), (1, None), (2, 2), (2, 2)]
+
+
+def test_every_shard_id_range_table_reserves_its_range(shards):
+    for shard_id, player_engine in shards.items():
+        first, _ = shard_id_range(int(shard_id[-1]), SHARD_COUNT)
+        with player_engine.connect() as connection:
+            sequences = dict(connection.exec_driver_sql("SELECT name, seq FROM sqlite_sequence").all())
+        for table in SHARD_ID_RANGE_TABLES:
+            assert sequences.get(table, 0) >= first - 1
@@ -0,0 +1,52 @@
+from core_system.models.event import StatusEffectData
+from core_system.models.user import UserChar, UserTeamMember
+from core_system.services import status_effect_service as effects
+
+POISON = {"value": "3", "applied_at": 1000, "duration": 60, "tick_interval": 10}
+
+
+def test_expiry_is_derived_from_applied_at():
+    assert not effects.is_expired(POISON, 1059)
+    assert effects.is_expired(POISON, 1060)
+    assert not effects.is_expired({"applied_at": 0, "duration": None}, 10 ** 9)
+
+
+def test_tick_math_clamps_to_the_duration():
+    state = effects.evaluate_status_effect("poison", POISON, now=1025)
+    assert (state.remaining_seconds, state.elapsed_ticks, state.remaining_ticks) == (35, 2, 4)
+    state = effects.evaluate_status_effect("poison", POISON, now=5000)
+    assert (state.remaining_seconds, state.elapsed_ticks, state.remaining_ticks) == (0, 6, 0)
+    state = effects.evaluate_status_effect("poison", POISON, now=900)
+    assert (state.remaining_seconds, state.elapsed_ticks) == (60, 0)
+    # Legacy plain values are permanent, without ticks
+    legacy = effects.evaluate_status_effect("blessed", 1, now=5000)
+    assert (legacy.value, legacy.remaining_seconds, legacy.remaining_ticks) == ("1", None, None)
+
+
+def test_merge_refreshes_reapplied_keys_and_drops_expired_ones():
+    stored = {"poison": POISON, "burn": {"value": "1", "applied_at": 1000, "duration": 5, "tick_interval": None},
+              "blessed": 1}
+    merged = effects.merge_status_effects(
+        stored, [StatusEffectData(status_effect_key="poison", status_effect_value="5", duration=30),
+                 StatusEffectData(status_effect_key=None)], now=1010)
+    assert merged == {
+        "poison": {"value": "5", "applied_at": 1010, "duration": 30, "tick_interval": None},
+        "blessed": {"value": "1", "applied_at": 0, "duration": None, "tick_interval": None},
+    }
+
+
+def test_team_update_expires_loaded_chars(db, user_data_id):
+    char_ids = [row.user_char_id for row in db.query(UserTeamMember).filter_by(user_data_id=user_data_id)]
+    loaded = db.get(UserChar, char_ids[0])
+    assert loaded.status_effects in ({}, None)
+
+    effects.apply_status_effects_to_team(
+        db, user_data_id, [StatusEffectData(status_effect_key="poison", status_effect_value="3", duration=60)],
+        now=1000)
+    assert loaded.status_effects["poison"]["applied_at"] == 1000
+
+    # A later flush of the loaded char must not write the old effects back
+    loaded.level += 1
+    db.commit()
+    db.expire_all()
+    assert "poison" in db.get(UserChar, char_ids[0]).status_effects
@@ -0,0 +1,47 @@
+from sqlalchemy import update
+
+from core_system.models.user import UserChar, UserData, UserTeamMember
+from core_system.services import leaderboard_service, team_power_service, user_service
+
+
+def _stat_sum(db, user_data_id):
+    chars = (db.query(UserChar).join(UserTeamMember, UserTeamMember.user_char_id == UserChar.id)
+             .filter(UserTeamMember.user_data_id == user_data_id).all())
+    return sum(char.hp + char.mp + char.atk + char.spd + char.def_ for char in chars)
+
+
+def test_create_team_sets_team_power(db, user_data_id):
+    user_data = db.get(UserData, user_data_id)
+    assert user_data.team_power == _stat_sum(db, user_data_id) > 0
+
+    kept = user_data.team_members[0].user_char
+    user_service.create_team(db, user_data, [kept.id])
+    assert user_data.team_power == kept.hp + kept.mp + kept.atk + kept.spd + kept.def_
+    db.commit()
+    assert leaderboard_service.get_leaderboard("team_power").score(user_data_id) == user_data.team_power
+
+
+def test_stat_edits_refresh_team_power_and_the_board_on_commit(db, user_data_id):
+    leaderboard_service.rebuild_leaderboards(db)
+    before = db.get(UserData, user_data_id).team_power
+    char = db.get(UserData, user_data_id).team_members[0].user_char
+    char.atk += 7
+    db.commit()
+
+    assert db.get(UserData, user_data_id).team_power == before + 7
+    assert leaderboard_service.get_leaderboard("team_power").score(user_data_id) == before + 7
+
+
+def test_refresh_all_team_power_rebuilds_the_board_after_commit(db, user_data_id):
+    leaderboard_service.rebuild_leaderboards(db)
+    before = db.get(UserData, user_data_id).team_power
+    # A bulk stat change the listeners never see
+    db.execute(update(UserChar).where(UserChar.user_data_id == user_data_id).values(hp=UserChar.hp + 1))
+    team_power_service.refresh_all_team_power(db)
+    board = leaderboard_service.get_leaderboard("team_power")
+    assert board.score(user_data_id) == before
+
+    db.commit()
+    team_power = db.get(UserData, user_data_id).team_power
+    assert team_power == _stat_sum(db, user_data_id) > before
+    assert board.score(user_data_id) == team_power
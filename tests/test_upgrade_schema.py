@@ -0,0 +1,204 @@
+import pytest
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.schema import CreateTable
+
+from core_system.models.database import Base, SessionLocal
+from core_system.models.user import UserData
+from core_system.tools import upgrade_schema
+
+# user_npc_states as created before map_area_id became nullable and
+# (user_id, npc_id) unique
+_LEGACY_USER_NPC_STATES = """
+CREATE TABLE user_npc_states (
+    id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    npc_id INTEGER NOT NULL,
+    map_area_id INTEGER NOT NULL,
+    has_talked BOOLEAN NOT NULL,
+    is_visible BOOLEAN NOT NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY(user_id) REFERENCES users (id),
+    FOREIGN KEY(npc_id) REFERENCES npcs (id),
+    FOREIGN KEY(map_area_id) REFERENCES map_areas (id)
+)
+"""
+
+
+@pytest.fixture
+def legacy_url(db, tmp_path):
+    """A database on the current schema except for the legacy tables the test swaps in."""
+    url = f"sqlite:///{tmp_path / 'legacy.db'}"
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    yield url, engine
+    engine.dispose()
+
+
+def _drop_on_delete_actions(conn, table_name):
+    # The table as created before its foreign keys declared ON DELETE actions
+    table = Base.metadata.tables[table_name]
+    ddl = str(CreateTable(table).compile(dialect=conn.dialect))
+    conn.exec_driver_sql(f"DROP TABLE {table_name}")
+    conn.exec_driver_sql(ddl.replace(" ON DELETE CASCADE", "").replace(" ON DELETE SET NULL", ""))
+
+
+def _upgrade(url):
+    upgrade_schema.upgrade_database(url, Base.metadata.sorted_tables)
+
+
+def test_user_npc_states_upgrade_dedupes_before_adding_the_unique_key(legacy_url, capsys):
+    url, engine = legacy_url
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP TABLE user_npc_states")
+        conn.exec_driver_sql(_LEGACY_USER_NPC_STATES)
+        conn.execute(text("INSERT INTO users (id, username, hashed_password) VALUES (1, 'alice', '!')"))
+        conn.execute(text("INSERT INTO npcs (id, name, description) VALUES (1, 'n1', ''), (2, 'n2', '')"))
+        conn.execute(text("INSERT INTO maps (id, name) VALUES (1, 'm1')"))
+        conn.execute(text("INSERT INTO map_areas (id, map_id, name) VALUES (1, 1, 'a1'), (2, 1, 'a2')"))
+        conn.execute(text("INSERT INTO user_npc_states (id, user_id, npc_id, map_area_id, has_talked, is_visible) "
+                          "VALUES (1, 1, 1, 1, 0, 1), (2, 1, 1, 2, 1, 1), (3, 1, 2, 1, 0, 0)"))
+
+    _upgrade(url)
+    with engine.begin() as conn:
+        rows = conn.execute(text("SELECT id, npc_id, map_area_id FROM user_npc_states ORDER BY id")).all()
+        assert rows == [(2, 1, 2), (3, 2, 1)]
+        conn.execute(text("INSERT INTO user_npc_states (user_id, npc_id, map_area_id, has_talked, is_visible) "
+                          "VALUES (1, 3, NULL, 0, 1)"))
+    with pytest.raises(IntegrityError):
+        with engine.begin() as conn:
+            conn.execute(text("INSERT INTO user_npc_states (user_id, npc_id, has_talked, is_visible) "
+                              "VALUES (1, 1, 0, 1)"))
+    indexes = {index["name"] for index in inspect(engine).get_indexes("user_npc_states")}
+    assert "ix_user_npc_states_user_area" in indexes
+
+    capsys.readouterr()
+    _upgrade(url)
+    assert capsys.readouterr().out == ""
+
+
+def test_upgrade_creates_missing_tables(legacy_url):
+    url, engine = legacy_url
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP TABLE content_invalidations")
+    _upgrade(url)
+    assert "content_invalidations" in inspect(engine).get_table_names()
+
+
+def test_on_delete_actions_are_added_to_existing_foreign_keys(legacy_url):
+    url, engine = legacy_url
+    with engine.begin() as conn:
+        for table_name in ("map_areas", "map_connections"):
+            _drop_on_delete_actions(conn, table_name)
+        conn.execute(text("INSERT INTO maps (id, name) VALUES (1, 'm1'), (2, 'm2')"))
+        conn.execute(text("INSERT INTO map_areas (id, map_id, name) VALUES (1, 1, 'a1'), (2, 2, 'a2')"))
+        conn.execute(text("INSERT INTO map_connections (map_a_id, map_b_id, is_locked, required_level) "
+                          "VALUES (1, 2, 0, 0)"))
+
+    _upgrade(url)
+    actions = {fk["referred_table"]: fk["options"].get("ondelete")
+               for fk in inspect(engine).get_foreign_keys("map_areas")}
+    assert actions["maps"] == "CASCADE"
+
+    engine.dispose()
+    event.listen(engine, "connect",
+                 lambda dbapi_connection, record: dbapi_connection.execute("PRAGMA foreign_keys = ON"))
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM maps WHERE id = 1"))
+        assert conn.execute(text("SELECT id FROM map_areas")).scalars().all() == [2]
+        assert conn.execute(text("SELECT COUNT(*) FROM map_connections")).scalar_one() == 0
+
+
+def test_duplicate_reward_pool_items_are_merged_before_the_unique_key(legacy_url):
+    url, engine = legacy_url
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP INDEX IF EXISTS ix_reward_pool_items_item_id")
+        conn.exec_driver_sql("DROP TABLE reward_pool_items")
+        conn.exec_driver_sql("CREATE TABLE reward_pool_items (id INTEGER NOT NULL PRIMARY KEY, "
+                             "pool_id INTEGER NOT NULL REFERENCES reward_pools (id), "
+                             "item_id INTEGER NOT NULL REFERENCES items (id), probability FLOAT NOT NULL)")
+        conn.execute(text("INSERT INTO reward_pools (id, name) VALUES (1, 'p1')"))
+        conn.execute(text("INSERT INTO items (id, name, item_type, price, rarity) "
+                          "VALUES (1, 'i1', 'material', 1, 1), (2, 'i2', 'material', 1, 1)"))
+        conn.execute(text("INSERT INTO reward_pool_items (id, pool_id, item_id, probability) "
+                          "VALUES (1, 1, 1, 0.25), (2, 1, 2, 0.5), (3, 1, 1, 0.25)"))
+
+    _upgrade(url)
+    with engine.begin() as conn:
+        rows = conn.execute(text("SELECT id, item_id, probability FROM reward_pool_items ORDER BY id")).all()
+        assert rows == [(2, 2, 0.5), (3, 1, 0.5)]
+        # The batch editors' upsert needs the (pool_id, item_id) key as its conflict target
+        conn.execute(text("INSERT INTO reward_pool_items (pool_id, item_id, probability) VALUES (1, 1, 0.75) "
+                          "ON CONFLICT (pool_id, item_id) DO UPDATE SET probability = excluded.probability"))
+        assert conn.execute(text("SELECT probability FROM reward_pool_items WHERE id = 3")).scalar_one() == 0.75
+
+
+def test_duplicate_map_progress_is_summed_before_the_unique_key(legacy_url):
+    url, engine = legacy_url
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP TABLE user_map_progress")
+        conn.exec_driver_sql("CREATE TABLE user_map_progress (id INTEGER NOT NULL PRIMARY KEY, "
+                             "user_data_id INTEGER NOT NULL REFERENCES user_data (id), "
+                             "map_id INTEGER NOT NULL REFERENCES maps (id), "
+                             "progress INTEGER NOT NULL, is_completed BOOLEAN NOT NULL)")
+        conn.execute(text("INSERT INTO users (id, username, hashed_password) VALUES (1, 'alice', '!')"))
+        conn.execute(text("INSERT INTO user_data (id, user_id, money) VALUES (1, 1, 0)"))
+        conn.execute(text("INSERT INTO maps (id, name) VALUES (1, 'm1'), (2, 'm2')"))
+        conn.execute(text("INSERT INTO user_map_progress (id, user_data_id, map_id, progress, is_completed) "
+                          "VALUES (1, 1, 1, 30, 1), (2, 1, 2, 5, 0), (3, 1, 1, 12, 0), (4, 1, 1, 8, 0)"))
+
+    _upgrade(url)
+    with engine.begin() as conn:
+        rows = conn.execute(text("SELECT id, map_id, progress, is_completed FROM user_map_progress ORDER BY id")).all()
+        assert rows == [(2, 2, 5, 0), (4, 1, 50, 1)]
+        conn.execute(text("INSERT INTO user_map_progress (user_data_id, map_id, progress, is_completed) "
+                          "VALUES (1, 1, 2, 0) ON CONFLICT (user_data_id, map_id) "
+                          "DO UPDATE SET progress = progress + excluded.progress"))
+        assert conn.execute(text("SELECT progress FROM user_map_progress WHERE id = 4")).scalar_one() == 52
+
+
+def test_team_power_column_is_added_and_backfilled(db, user_data_id):
+    # The test database itself, with user_data rolled back to before team_power
+    from core_system.models.database import DATABASE_URL, engine
+
+    team_power = db.get(UserData, user_data_id).team_power
+    assert team_power > 0
+    db.close()
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ALTER TABLE user_data DROP COLUMN team_power")
+    _upgrade(DATABASE_URL)
+
+    with SessionLocal() as session:
+        assert session.get(UserData, user_data_id).team_power == team_power
+
+
+def test_player_shards_get_their_id_range(tmp_path, capsys):
+    from core_system.models.sharding import PLAYER_SHARD_KEYS, shard_id_range
+
+    insert_char = text("INSERT INTO user_chars (char_temp_id, level, exp, hp, mp, atk, spd, def_, "
+                       "status_effects, is_locked, user_data_id) VALUES (1, 1, 0, 1, 1, 1, 1, 1, '{}', 0, 1)")
+    insert_ledger = text("INSERT INTO currency_ledger (user_data_id, delta, balance_after, reason) "
+                         "VALUES (1, 1, 1, 'test')")
+    url = f"sqlite:///{tmp_path / 'players_1.db'}"
+    engine = create_engine(url)
+    player_tables = [table for table in Base.metadata.sorted_tables if table.name in PLAYER_SHARD_KEYS]
+    with engine.begin() as conn:
+        Base.metadata.create_all(conn, tables=player_tables)
+        # user_chars as created before AUTOINCREMENT, with a row from before the ranges
+        ddl = str(CreateTable(Base.metadata.tables["user_chars"]).compile(dialect=conn.dialect))
+        conn.exec_driver_sql("DROP TABLE user_chars")
+        conn.exec_driver_sql(ddl.replace(" AUTOINCREMENT", ""))
+        conn.execute(insert_char)
+
+    upgrade_schema.upgrade_database(url, player_tables, "player_1", check_foreign_keys=False, player_shard=(1, 2))
+    first, _ = shard_id_range(1, 2)
+    with engine.begin() as conn:
+        conn.execute(insert_char)
+        conn.execute(insert_ledger)
+        assert conn.execute(text("SELECT id FROM user_chars ORDER BY id")).scalars().all() == [1, first]
+        assert conn.execute(text("SELECT id FROM currency_ledger")).scalars().all() == [first]
+
+    capsys.readouterr()
+    upgrade_schema.upgrade_database(url, player_tables, "player_1", check_foreign_keys=False, player_shard=(1, 2))
+    assert capsys.readouterr().out == ""
+    engine.dispose()
@@ -0,0 +1,67 @@
+import threading
+
+from core_system.models.user import User
+from core_system.services import write_behind
+
+
+def _failing_session():
+    raise RuntimeError("database unavailable")
+
+
+def test_first_write_starts_the_flusher_and_exit_flush_is_registered(db, user_data_id, monkeypatch):
+    registered = []
+    monkeypatch.setattr(write_behind.atexit, "register", registered.append)
+    buffer = write_behind.WriteBehindBuffer(flush_interval=60)
+    assert registered == [buffer._stop_at_exit]
+
+    user_id = db.query(User.id).scalar()
+    buffer.touch_last_login(user_id)
+    assert buffer._thread.is_alive()
+
+    buffer._stop_at_exit()
+    db.expire_all()
+    assert db.get(User, user_id).last_login is not None
+
+
+def test_failed_flush_does_not_fail_the_write(monkeypatch):
+    monkeypatch.setattr(write_behind.atexit, "register", lambda callback: None)
+    buffer = write_behind.WriteBehindBuffer(session_factory=_failing_session, max_pending=1)
+    # Flusher not running: a full buffer is flushed inline by the writer
+    monkeypatch.setattr(buffer, "start", lambda: None)
+
+    buffer.touch_last_login(1)
+    buffer.add_map_progress(1, 1)
+    assert buffer.pending_count == 2
+
+
+def test_progress_reads_do_not_wait_for_a_flush_in_progress(db, user_data_id, monkeypatch):
+    monkeypatch.setattr(write_behind.atexit, "register", lambda callback: None)
+    buffer = write_behind.WriteBehindBuffer(flush_interval=60)
+    monkeypatch.setattr(buffer, "start", lambda: None)
+    buffer.add_map_progress(user_data_id, 1, 3)
+
+    writing, release = threading.Event(), threading.Event()
+    real_write = buffer._write
+
+    def slow_write(session, progress, last_login):
+        writing.set()
+        release.wait(5)
+        real_write(session, progress, last_login)
+
+    monkeypatch.setattr(buffer, "_write", slow_write)
+    flusher = threading.Thread(target=buffer.flush)
+    flusher.start()
+    assert writing.wait(5)
+
+    # The increments are in flight: not stored yet, still visible to readers
+    reads = []
+    reader = threading.Thread(target=lambda: reads.append(buffer.get_map_progress(db, user_data_id, 1)))
+    reader.start()
+    reader.join(2)
+    assert reads == [3]
+
+    release.set()
+    flusher.join(5)
+    db.rollback()
+    assert buffer.get_map_progress(db, user_data_id, 1) == 3
+    assert buffer.pending_count == 0
@@ -0,0 +1,32 @@
+from core_system.models.association_tables import MapEventAssociation
+from core_system.models.event import Event
+from core_system.models.maps import Map
+from core_system.services import map_service
+from core_system.services.content_catalog import get_content_catalog, load_content_catalog
+from core_system.services.write_queue import WriteQueue
+
+
+def _fail(session):
+    raise RuntimeError("job failed")
+
+
+def test_hooks_run_after_batch_commit_despite_failing_job(db):
+    db.add(Map(id=1, name="map1"))
+    db.add_all([Event(id=i, name=f"e{i}", type="normal", description="") for i in (1, 2)])
+    db.flush()
+    db.add_all([MapEventAssociation(map_id=1, event_id=1, probability=1.0),
+                MapEventAssociation(map_id=1, event_id=2, probability=3.0)])
+    db.commit()
+    load_content_catalog(db)
+    assert get_content_catalog().get_map_event_pool(1) == ((1, 1.0), (2, 3.0))
+
+    # A long max_wait keeps both jobs in one batch
+    queue = WriteQueue(max_wait=0.5)
+    edit = queue.submit(map_service.update_map_event_associations, 1, remove=[2])
+    failing = queue.submit(_fail)
+    queue.stop()
+
+    assert [dto.event_id for dto in edit.result()] == [1]
+    assert isinstance(failing.exception(), RuntimeError)
+    # The catalog was rebuilt after the batch committed, not when the job's savepoint was released
+    assert get_content_catalog().get_map_event_pool(1) == ((1, 1.0),)
@@ -0,0 +1,266 @@
+"""
+Synthetic world and player-base generator for scale testing.
+
+Streams deterministic rows (fixed --seed) for the whole models/ schema into
+an empty database through driver-level executemany batches:
+
+    python -m core_system.tools.generate_world --database-url sqlite:///world.db \\
+        --maps 2000 --events 20000 --items 50000 --users 1000000 --chars-per-user 10
+
+Static content: maps with areas and a connected MapConnection graph, events
+with general logic, results and map/area associations, reward and monster
+pools, items, monsters and CharTemp templates.
+Players: users, user_data, user_chars, team members and map progress.
+"""
+import argparse
+import itertools
+import os
+import random
+import sys
+import time
+from typing import Iterable, Iterator, List, Optional, Sequence
+
+
+def _parse_args(argv: Optional[List[str]]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL", "sqlite:///generated_world.db"))
+    parser.add_argument("--seed", type=int, default=20240101)
+    parser.add_argument("--batch-size", type=int, default=20_000)
+    parser.add_argument("--drop", action="store_true", help="drop and recreate every table first")
+    # static content
+    parser.add_argument("--maps", type=int, default=500)
+    parser.add_argument("--areas-per-map", type=int, default=4)
+    parser.add_argument("--extra-edges-per-map", type=float, default=1.5,
+                        help="connections added on top of the spanning tree, per map")
+    parser.add_argument("--events", type=int, default=5_000)
+    parser.add_argument("--events-per-map", type=int, default=30)
+    parser.add_argument("--events-per-area", type=int, default=5)
+    parser.add_argument("--results-per-event", type=int, default=3)
+    parser.add_argument("--items", type=int, default=20_000)
+    parser.add_argument("--reward-pools", type=int, default=2_000)
+    parser.add_argument("--items-per-pool", type=int, default=8)
+    parser.add_argument("--monsters", type=int, default=5_000)
+    parser.add_argument("--monster-pools", type=int, default=500)
+    parser.add_argument("--monsters-per-pool", type=int, default=10)
+    parser.add_argument("--char-temps", type=int, default=200)
+    # players
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--chars-per-user", type=int, default=10)
+    parser.add_argument("--progress-per-user", type=int, default=3)
+    parser.add_argument("--password-hash", default="!",
+                        help="stored hashed_password for every generated user ('!' never verifies)")
+    return parser.parse_args(argv)
+
+
+def _batched(rows: Iterable[tuple], size: int) -> Iterator[List[tuple]]:
+    iterator = iter(rows)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class _Loader:
+    """Inserts tuples in table column order with raw executemany per batch."""
+
+    def __init__(self, connection, batch_size: int):
+        self.connection = connection
+        self.batch_size = batch_size
+
+    def load(self, table, columns: Sequence[str], rows: Iterable[tuple]) -> int:
+        stmt = table.insert().compile(dialect=self.connection.dialect,
+                                      column_keys=list(columns))
+        sql = str(stmt)
+        positional = stmt.positional
+        total = 0
+        started = time.perf_counter()
+        for batch in _batched(rows, self.batch_size):
+            params = batch if positional else [dict(zip(columns, row)) for row in batch]
+            self.connection.exec_driver_sql(sql, params)
+            total += len(batch)
+        self.connection.commit()
+        elapsed = time.perf_counter() - started
+        print(f"  {table.name:<28} {total:>12,} rows  {elapsed:7.1f}s  "
+              f"({total / elapsed if elapsed else 0:,.0f} rows/s)")
+        return total
+
+
+def generate(args: argparse.Namespace) -> None:
+    # models/database.py reads DATABASE_URL when first imported
+    os.environ["DATABASE_URL"] = args.database_url
+    from sqlalchemy import text
+
+    from core_system import models  # noqa: F401  (registers every mapped table)
+    from core_system.models import audit, inventory, npc, bo_admin  # noqa: F401
+    from core_system.models.association_tables import (MapAreaEventAssociation, MapConnection,
+                                                       MapEventAssociation)
+    from core_system.models.char_temp import CharTemp
+    from core_system.models.database import Base, engine
+    from core_system.models.event import EventResult, GeneralEventLogic, RewardPool, Event
+    from core_system.models.items import Item, RewardPoolItem
+    from core_system.models.maps import Map, MapArea, UserMapProgress
+    from core_system.models.monsters import Monster, MonsterPool, MonsterPoolEntry
+    from core_system.models.user import User, UserChar, UserData, UserTeamMember
+    from core_system.services.team_power_service import team_power_update
+
+    if args.drop:
+        Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+
+    rng = random.Random(args.seed)
+    started = time.perf_counter()
+
+    with engine.connect() as conn:
+        if engine.dialect.name == "sqlite":
+            # Bulk load settings; rows are generated consistent so FK checks are skipped
+            conn.exec_driver_sql("PRAGMA foreign_keys = OFF")
+            conn.exec_driver_sql("PRAGMA journal_mode = WAL")
+            conn.exec_driver_sql("PRAGMA synchronous = OFF")
+            conn.exec_driver_sql("PRAGMA cache_size = -262144")
+            conn.exec_driver_sql("PRAGMA temp_store = MEMORY")
+        if conn.execute(text("SELECT 1 FROM users LIMIT 1")).first() is not None:
+            raise SystemExit("Target database already has users; use --drop to regenerate.")
+        loader = _Loader(conn, args.batch_size)
+        print("Static content")
+
+        loader.load(CharTemp.__table__,
+                    ("id", "name", "rarity", "description", "base_hp", "base_mp", "base_atk", "base_spd", "base_def"),
+                    ((i, f"char_{i}", rng.randint(1, 6), f"Template {i}", rng.randint(80, 600),
+                      rng.randint(20, 300), rng.randint(10, 120), rng.randint(5, 60), rng.randint(10, 120))
+                     for i in range(1, args.char_temps + 1)))
+        char_stats = {}
+
+        item_types = ("equipment", "consumable", "quest", "material")
+        slots = ("weapon", "armor", "helmet", "ring", "boots")
+
+        def items():
+            for i in range(1, args.items + 1):
+                item_type = rng.choice(item_types)
+                equip = item_type == "equipment"
+                consumable = item_type == "consumable"
+                yield (i, f"item_{i}", None, item_type, rng.randint(1, 50_000), rng.randint(1, 6),
+                       rng.choice(slots) if equip else None,
+                       rng.randint(1, 200) if equip else None, rng.randint(1, 200) if equip else None,
+                       rng.randint(10, 500) if consumable else None, rng.randint(5, 200) if consumable else None)
+        loader.load(Item.__table__, ("id", "name", "description", "item_type", "price", "rarity", "slot",
+                                     "atk_bonus", "def_bonus", "hp_restore", "mp_restore"), items())
+
+        loader.load(RewardPool.__table__, ("id", "name"),
+                    ((i, f"reward_pool_{i}") for i in range(1, args.reward_pools + 1)))
+        loader.load(RewardPoolItem.__table__, ("pool_id", "item_id", "probability"),
+                    ((pool_id, item_id, round(rng.uniform(0.01, 0.5), 4))
+                     for pool_id in range(1, args.reward_pools + 1)
+                     for item_id in rng.sample(range(1, args.items + 1), min(args.items_per_pool, args.items))))
+
+        loader.load(Monster.__table__, ("id", "name", "hp", "mp", "atk", "spd", "def_", "drop_pool_id"),
+                    ((i, f"monster_{i}", rng.randint(20, 5_000), rng.randint(0, 500), rng.randint(5, 400),
+                      rng.randint(1, 150), rng.randint(5, 400), rng.randint(1, args.reward_pools))
+                     for i in range(1, args.monsters + 1)))
+        loader.load(MonsterPool.__table__, ("id", "name"),
+                    ((i, f"monster_pool_{i}") for i in range(1, args.monster_pools + 1)))
+        loader.load(MonsterPoolEntry.__table__, ("pool_id", "monster_id", "probability"),
+                    ((pool_id, monster_id, round(rng.uniform(0.05, 1.0), 4))
+                     for pool_id in range(1, args.monster_pools + 1)
+                     for monster_id in rng.sample(range(1, args.monsters + 1),
+                                                  min(args.monsters_per_pool, args.monsters))))
+
+        loader.load(Event.__table__, ("id", "name", "type", "description"),
+                    ((i, f"event_{i}", rng.choice(("normal", "battle", "special")), f"Story of event {i}.")
+                     for i in range(1, args.events + 1)))
+        # One general logic per event, sharing the event id
+        loader.load(GeneralEventLogic.__table__, ("id", "event_id", "story_text"),
+                    ((i, i, '[{"name": null, "text": "..."}]') for i in range(1, args.events + 1)))
+        loader.load(EventResult.__table__,
+                    ("name", "condition_json", "prior", "status_effects_json", "story_text",
+                     "reward_pool_id", "general_event_logic_id"),
+                    ((f"result_{logic_id}_{n}", "[]", n, "[]", "[]",
+                      rng.randint(1, args.reward_pools) if rng.random() < 0.7 else None, logic_id)
+                     for logic_id in range(1, args.events + 1)
+                     for n in range(rng.randint(1, args.results_per_event))))
+
+        loader.load(Map.__table__, ("id", "name", "description"),
+                    ((i, f"map_{i}", f"Map {i}") for i in range(1, args.maps + 1)))
+        area_count = args.maps * args.areas_per_map
+        loader.load(MapArea.__table__, ("id", "map_id", "name", "init_npc"),
+                    ((area_id, (area_id - 1) // args.areas_per_map + 1, f"area_{area_id}", "[]")
+                     for area_id in range(1, area_count + 1)))
+
+        # Connected graph: random spanning tree plus extra random edges, stored as (a < b)
+        edges = set()
+        for map_id in range(2, args.maps + 1):
+            edges.add((rng.randint(1, map_id - 1), map_id))
+        for _ in range(int(args.maps * args.extra_edges_per_map)):
+            a, b = rng.randint(1, args.maps), rng.randint(1, args.maps)
+            if a != b:
+                edges.add((min(a, b), max(a, b)))
+        loader.load(MapConnection.__table__, ("map_a_id", "map_b_id", "is_locked", "required_level"),
+                    ((a, b, rng.random() < 0.05, rng.choice((0, 0, 0, 5, 10, 20))) for a, b in sorted(edges)))
+
+        loader.load(MapEventAssociation.__table__, ("map_id", "event_id", "probability"),
+                    ((map_id, event_id, round(rng.uniform(0.1, 5.0), 3))
+                     for map_id in range(1, args.maps + 1)
+                     for event_id in rng.sample(range(1, args.events + 1), min(args.events_per_map, args.events))))
+        loader.load(MapAreaEventAssociation.__table__, ("map_area_id", "event_id", "probability"),
+                    ((area_id, event_id, round(rng.uniform(0.1, 5.0), 3))
+                     for area_id in range(1, area_count + 1)
+                     for event_id in rng.sample(range(1, args.events + 1), min(args.events_per_area, args.events))))
+
+        print("Players")
+        templates = conn.execute(text(
+            "SELECT id, base_hp, base_mp, base_atk, base_spd, base_def FROM char_temp")).all()
+        char_stats.update({row[0]: row[1:] for row in templates})
+        template_ids = list(char_stats)
+
+        loader.load(User.__table__, ("id", "username", "hashed_password"),
+                    ((i, f"player{i:08d}", args.password_hash) for i in range(1, args.users + 1)))
+        # user_data.id == users.id keeps the shard key stable for player tables
+        loader.load(UserData.__table__, ("id", "user_id", "money", "current_map_id", "current_area_id"),
+                    ((i, i, rng.randint(0, 1_000_000), map_id, (map_id - 1) * args.areas_per_map + 1)
+                     for i in range(1, args.users + 1)
+                     for map_id in (rng.randint(1, args.maps),)))
+
+        def user_chars():
+            char_id = 0
+            for user_data_id in range(1, args.users + 1):
+                for _ in range(args.chars_per_user):
+                    char_id += 1
+                    temp_id = rng.choice(template_ids)
+                    hp, mp, atk, spd, def_ = char_stats[temp_id]
+                    level = rng.randint(1, 80)
+                    growth = 1 + level / 40
+                    yield (char_id, temp_id, level, rng.randint(0, 10_000), int(hp * growth), int(mp * growth),
+                           int(atk * growth), int(spd * growth), int(def_ * growth), "{}", False, user_data_id)
+        loader.load(UserChar.__table__, ("id", "char_temp_id", "level", "exp", "hp", "mp", "atk", "spd", "def_",
+                                         "status_effects", "is_locked", "user_data_id"), user_chars())
+
+        team_size = min(6, args.chars_per_user)
+        loader.load(UserTeamMember.__table__, ("user_data_id", "user_char_id", "position"),
+                    ((user_data_id, (user_data_id - 1) * args.chars_per_user + position + 1, position)
+                     for user_data_id in range(1, args.users + 1)
+                     for position in range(team_size)))
+        started_power = time.perf_counter()
+        conn.execute(team_power_update())
+        conn.commit()
+        print(f"  {'user_data.team_power':<28} {args.users:>12,} rows  {time.perf_counter() - started_power:7.1f}s")
+        loader.load(UserMapProgress.__table__, ("user_data_id", "map_id", "progress", "is_completed"),
+                    ((user_data_id, map_id, progress, progress >= 100)
+                     for user_data_id in range(1, args.users + 1)
+                     for map_id in rng.sample(range(1, args.maps + 1), min(args.progress_per_user, args.maps))
+                     for progress in (rng.randint(0, 100),)))
+
+        if engine.dialect.name == "sqlite":
+            conn.exec_driver_sql("PRAGMA foreign_keys = ON")
+            conn.exec_driver_sql("ANALYZE")
+            conn.commit()
+
+    print(f"Done in {time.perf_counter() - started:.1f}s -> {args.database_url}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    generate(_parse_args(argv))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
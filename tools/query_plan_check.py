@@ -0,0 +1,269 @@
+"""
+Query-plan regression check for the service layer.
+
+Generates a small world with generate_world into a temporary SQLite database,
+runs a fixed set of service scenarios under capture_queries(), and runs
+EXPLAIN QUERY PLAN on every captured statement:
+
+    python -m core_system.tools.query_plan_check
+    python -m core_system.tools.query_plan_check --min-rows 500 --verbose
+
+Exits with status 1 when a statement does a full scan (a plain `SCAN <table>`
+without an index) of a table holding at least --min-rows rows, or when a
+foreign key column is not the leading column of any index. The second check
+is static (from the models' metadata), so it also covers foreign keys that no
+scenario exercises; an unindexed one turns every ON DELETE CASCADE / SET NULL
+on the parent into a scan of the child table.
+"""
+import argparse
+import os
+import re
+import shutil
+import sys
+import tempfile
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# SQLite plan details: "SCAN user_chars", "SCAN TABLE user_chars" (before 3.36),
+# "SCAN user_chars USING INDEX ix_...", "SEARCH user_chars USING INDEX ..."
+_SCAN = re.compile(r"^SCAN (?:TABLE )?(?P<table>\w+)(?: AS \w+)?(?P<rest>.*)$")
+_ALIAS_SUFFIX = re.compile(r"_\d+$")
+_EXPLAINABLE = ("SELECT", "UPDATE", "DELETE", "WITH", "INSERT INTO")
+
+
+@dataclass
+class Scenario:
+    name: str
+    run: Callable[["object"], None]  # receives the Session
+    # tables this scenario is expected to read in full (e.g. catalog loads)
+    allow_scans: Tuple[str, ...] = ()
+
+
+@dataclass
+class PlanFinding:
+    scenario: str
+    table: str
+    rows: int
+    detail: str
+    statement: str
+
+
+@dataclass
+class CheckResult:
+    statements: int = 0
+    findings: List[PlanFinding] = field(default_factory=list)
+    unindexed_foreign_keys: List[str] = field(default_factory=list)
+    errors: List[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not (self.findings or self.unindexed_foreign_keys or self.errors)
+
+
+def _parse_args(argv: Optional[List[str]]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--min-rows", type=int, default=1_000,
+                        help="tables with at least this many rows count as large")
+    parser.add_argument("--filter", help="only run scenarios whose name contains this text")
+    parser.add_argument("--verbose", action="store_true", help="print the plan of every statement")
+    parser.add_argument("--keep-db", action="store_true", help="keep the generated database")
+    return parser.parse_args(argv)
+
+
+def _generate(database_url: str) -> None:
+    from core_system.tools.generate_world import _parse_args as world_args, generate
+    generate(world_args([
+        "--database-url", database_url, "--maps", "200", "--events", "2000", "--events-per-map", "20",
+        "--items", "5000", "--reward-pools", "300", "--monsters", "2000", "--monster-pools", "100",
+        "--char-temps", "50", "--users", "2000", "--chars-per-user", "5",
+    ]))
+
+
+# ---------------------- Scenarios ----------------------
+
+
+def build_scenarios() -> List[Scenario]:
+    from core_system.models.event import StatusEffectData
+    from core_system.services import (encounter_service, event_service, inventory_service, item_service,
+                                      leaderboard_service, map_service, monster_service, movement_service,
+                                      npc_service, reward_pool_service, status_effect_service, user_service)
+    from core_system.services.content_catalog import build_content_catalog
+
+    def move(db):
+        graph = movement_service.get_movement_graph(db)
+        target = next(dst for dst in range(1, 201) if graph.is_open(1, dst))
+        try:
+            movement_service.move_to_map(db, 1, target)
+        except movement_service.MovementError:
+            pass
+
+    def grant_and_consume(db):
+        inventory_service.grant_items(db, 1, [(1, 3), (2, 1)])
+        inventory_service.get_inventory(db, 1)
+        inventory_service.consume_items(db, 1, [(1, 1)])
+
+    def create_player(db):
+        user = user_service.create_user_with_defaults(db, "query_plan_check", "password")
+        db.flush()
+        chars = [user_service.create_user_char(db, c, user.user_data.id) for c in (1, 2, 3)]
+        db.flush()
+        user_service.create_team(db, user.user_data, [c.id for c in chars])
+        db.flush()
+
+    poison = [StatusEffectData(status_effect_key="poison", status_effect_value="3", duration=60)]
+    catalog_tables = ("items", "monsters", "char_temp", "events", "general_event_logic", "event_results",
+                      "maps", "map_areas", "map_connections", "map_event_association",
+                      "map_area_event_association", "reward_pools", "reward_pool_items",
+                      "monster_pools", "monster_pool_entries")
+    return [
+        Scenario("fetch_events", lambda db: event_service.fetch_events(db, 1_000, 50)),
+        Scenario("fetch_items", lambda db: item_service.fetch_items(db, "material", 1_000, 50)),
+        Scenario("fetch_maps", lambda db: map_service.fetch_maps(db, 100, 50)),
+        Scenario("fetch_monsters", lambda db: monster_service.fetch_monsters(db, 1_000, 50)),
+        Scenario("fetch_events_summary", lambda db: event_service.fetch_events(db, 1_000, 50, summary=True)),
+        Scenario("fetch_maps_summary", lambda db: map_service.fetch_maps(db, 100, 50, summary=True)),
+        Scenario("fetch_monsters_summary", lambda db: monster_service.fetch_monsters(db, 1_000, 50, summary=True)),
+        Scenario("get_map_detail", lambda db: map_service.get_map_detail(db, 7)),
+        Scenario("area_event_pool", lambda db: event_service.get_event_associations_for_area(db, 9)),
+        Scenario("draw_current_map_event", lambda db: event_service.draw_current_map_event(db, 7, user_data_id=1)),
+        Scenario("map_event_associations", lambda db: map_service.update_map_event_associations(
+            db, 3, upsert=[{"event_id": e, "probability": 1.0} for e in range(1, 30)], normalize=True)),
+        Scenario("patch_reward_pool_items", lambda db: reward_pool_service.patch_reward_pool_items(
+            db, 5, upsert=[{"item_id": 11, "probability": 0.2}], remove=[12], normalize=True)),
+        Scenario("move_to_map", move),
+        # Loads the content catalog on first use
+        Scenario("select_encounter", lambda db: encounter_service.select_encounter(db, 1, 3),
+                 allow_scans=catalog_tables),
+        Scenario("inventory", grant_and_consume),
+        Scenario("visible_npcs", lambda db: npc_service.get_visible_npcs(db, 1, 1)),
+        Scenario("status_effects", lambda db: status_effect_service.apply_status_effects_to_team(db, 1, poison)),
+        Scenario("create_player", create_player),
+        Scenario("refresh_user_scores", lambda db: leaderboard_service.refresh_user_scores(db, range(1, 200))),
+        Scenario("iter_usernames", lambda db: list(user_service.iter_usernames(db, prefix="player0000", chunk_size=50))),
+        Scenario("bulk_delete_maps", lambda db: map_service.bulk_delete_maps(db, [199, 200])),
+        Scenario("bulk_delete_events", lambda db: event_service.bulk_delete_events(db, [1_999, 2_000])),
+        # Deliberate full reads
+        Scenario("build_content_catalog", build_content_catalog, allow_scans=catalog_tables),
+        Scenario("rebuild_leaderboards", leaderboard_service.rebuild_leaderboards),
+    ]
+
+
+# ---------------------- Plan analysis ----------------------
+
+
+def table_row_counts(connection, tables: Iterable[str]) -> Dict[str, int]:
+    return {name: connection.exec_driver_sql(f'SELECT COUNT(*) FROM "{name}"').scalar() for name in tables}
+
+
+def _first_parameters(parameters):
+    # executemany captures a list of parameter sets; one is enough for the plan
+    if isinstance(parameters, list):
+        return parameters[0] if parameters else ()
+    return parameters
+
+
+def explain(connection, statement: str, parameters) -> List[str]:
+    rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", _first_parameters(parameters)).all()
+    return [row[-1] for row in rows]
+
+
+def full_scans(plan: Sequence[str], row_counts: Dict[str, int]) -> List[Tuple[str, str]]:
+    """(table, detail) for every plain SCAN in the plan; aliases like user_chars_1 map to their table."""
+    scans = []
+    for detail in plan:
+        match = _SCAN.match(detail.strip())
+        if match is None or "USING" in match.group("rest"):
+            continue
+        table = match.group("table")
+        if table not in row_counts:
+            table = _ALIAS_SUFFIX.sub("", table)
+        if table in row_counts:
+            scans.append((table, detail))
+    return scans
+
+
+def unindexed_foreign_keys(metadata) -> List[str]:
+    """`table.column` for every foreign key not covered by an index, primary key or unique constraint prefix."""
+    from sqlalchemy import UniqueConstraint
+
+    missing = []
+    for table in metadata.sorted_tables:
+        leading = set()
+        if len(table.primary_key.columns):
+            leading.add(list(table.primary_key.columns)[0].name)
+        for index in table.indexes:
+            leading.add(index.expressions[0].name)
+        for constraint in table.constraints:
+            if isinstance(constraint, UniqueConstraint) and len(constraint.columns):
+                leading.add(list(constraint.columns)[0].name)
+        for fk in table.foreign_keys:
+            if fk.parent.name not in leading:
+                missing.append(f"{table.name}.{fk.parent.name}")
+    return sorted(set(missing))
+
+
+def check(scenarios: Sequence[Scenario], min_rows: int, verbose: bool = False) -> CheckResult:
+    from core_system.models.database import Base, SessionLocal, engine
+    from core_system.utils.profiling import capture_queries
+
+    result = CheckResult(unindexed_foreign_keys=unindexed_foreign_keys(Base.metadata))
+    with engine.connect() as connection:
+        row_counts = table_row_counts(connection, Base.metadata.tables)
+    large = {name for name, count in row_counts.items() if count >= min_rows}
+
+    for scenario in scenarios:
+        with SessionLocal() as db:
+            with capture_queries(scenario.name) as profile:
+                try:
+                    scenario.run(db)
+                except Exception as exc:
+                    result.errors.append(f"{scenario.name}: {type(exc).__name__}: {exc}")
+            db.rollback()
+
+        with engine.connect() as connection:
+            for statement, parameters in profile.captured:
+                if not statement.lstrip().upper().startswith(_EXPLAINABLE):
+                    continue
+                result.statements += 1
+                plan = explain(connection, statement, parameters)
+                if verbose:
+                    print(f"[{scenario.name}] {' '.join(statement.split())[:160]}")
+                    for detail in plan:
+                        print(f"    {detail}")
+                for table, detail in full_scans(plan, row_counts):
+                    if table in large and table not in scenario.allow_scans:
+                        result.findings.append(PlanFinding(scenario.name, table, row_counts[table], detail,
+                                                           " ".join(statement.split())))
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = _parse_args(argv)
+    tmp_dir = tempfile.mkdtemp(prefix="query_plan_check_")
+    try:
+        # models/database.py binds its engine from DATABASE_URL on first import
+        _generate(f"sqlite:///{os.path.join(tmp_dir, 'world.db')}")
+        scenarios = [s for s in build_scenarios() if not args.filter or args.filter in s.name]
+        result = check(scenarios, args.min_rows, args.verbose)
+    finally:
+        if args.keep_db:
+            print(f"Database kept in {tmp_dir}")
+        else:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    print(f"Explained {result.statements} statements from {len(scenarios)} scenarios.")
+    for error in result.errors:
+        print(f"ERROR     {error}")
+    for column in result.unindexed_foreign_keys:
+        print(f"NO INDEX  {column}")
+    for finding in result.findings:
+        print(f"FULL SCAN [{finding.scenario}] {finding.table} ({finding.rows:,} rows): {finding.detail}\n"
+              f"          {finding.statement[:200]}")
+    if result.ok:
+        print("No full scans of large tables and every foreign key is indexed.")
+        return 0
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,394 @@
+"""
+In-place schema upgrade for databases created from older models.
+
+Base.metadata.create_all() only creates missing tables; it never changes a
+table that already exists. This tool brings an existing database up to the
+current models:
+
+    python -m core_system.tools.upgrade_schema
+    python -m core_system.tools.upgrade_schema --database-url sqlite:///game_data.db
+
+Every step compares the live schema with the models and only touches what
+differs, so the tool is idempotent and safe to rerun. With player sharding
+enabled (PLAYER_SHARD_URLS / PLAYER_SHARD_COUNT) each player shard is
+upgraded as well, for the player tables it holds.
+
+Steps, in order:
+  missing tables      created from the models, with their indexes
+                      (content_invalidations)
+  missing columns     added with their server default, then backfilled
+                      where a default is not the real value
+                      (user_data.team_power is recomputed from the teams)
+  nullable columns    NOT NULL dropped where the model allows NULL
+                      (user_npc_states.map_area_id)
+  unique keys         duplicate keys collapsed to the newest row, then the
+                      unique index created (uq_user_npc_state); duplicate
+                      reward pool entries are merged instead, summing their
+                      draw weights (uq_reward_pool_item), and duplicate map
+                      progress rows sum their progress (uq_user_map_progress)
+  on delete actions   foreign keys recreated with the model's ON DELETE
+                      CASCADE / SET NULL, which the bulk deletes rely on
+  missing indexes     indexes declared on the models
+  shard id ranges     player shards only: the id sequences of the player
+                      tables start at the shard's id range, so ids do not
+                      collide across shards (SQLite tables are rebuilt
+                      with AUTOINCREMENT first). Rows that already collide
+                      keep their ids.
+
+SQLite cannot alter a column or a foreign key in place, so there the table
+is rebuilt from the model instead: create, copy, drop, rename. Each step runs in its own
+transaction. Back up the database before running the tool.
+"""
+import argparse
+import os
+import sys
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import (ForeignKeyConstraint, Table, UniqueConstraint, bindparam, create_engine, delete, event, func,
+                        inspect, select, update)
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.schema import AddConstraint, CreateColumn, CreateTable
+
+
+class SchemaUpgradeError(RuntimeError):
+    pass
+
+
+@dataclass
+class UpgradeContext:
+    connection: Connection
+    # model tables that belong on this database
+    tables: Dict[str, Table]
+    label: str
+    # shard databases hold foreign keys into the main database that cannot be checked
+    check_foreign_keys: bool = True
+    # (shard index, shard count) on a player shard, None on the main database
+    player_shard: Optional[Tuple[int, int]] = None
+
+    @property
+    def is_sqlite(self) -> bool:
+        return self.connection.dialect.name == "sqlite"
+
+    def inspector(self):
+        # Not cached: the steps change the schema they inspect
+        return inspect(self.connection)
+
+    def live_tables(self) -> List[Table]:
+        live = set(self.inspector().get_table_names())
+        return [table for name, table in self.tables.items() if name in live]
+
+    def log(self, message: str) -> None:
+        print(f"  [{self.label}] {message}")
+
+
+@dataclass
+class UpgradeStep:
+    name: str
+    run: Callable[[UpgradeContext], None]
+
+
+def _live_column_names(ctx: UpgradeContext, table: Table) -> Set[str]:
+    return {column["name"] for column in ctx.inspector().get_columns(table.name)}
+
+
+def _unique_constraints(table: Table) -> List[UniqueConstraint]:
+    return sorted((constraint for constraint in table.constraints if isinstance(constraint, UniqueConstraint)),
+                  key=lambda constraint: constraint.name or "")
+
+
+def _has_unique_key(ctx: UpgradeContext, table: Table, columns: Sequence[str]) -> bool:
+    inspector = ctx.inspector()
+    wanted = list(columns)
+    keys = [constraint["column_names"] for constraint in inspector.get_unique_constraints(table.name)]
+    keys += [index["column_names"] for index in inspector.get_indexes(table.name) if index["unique"]]
+    return any(sorted(key) == sorted(wanted) for key in keys)
+
+
+def _keep_newest_duplicate(ctx: UpgradeContext, table: Table, columns: Sequence[str]) -> int:
+    """Deletes every row of a duplicated key except the newest one (highest id)."""
+    newest = select(func.max(table.c.id)).group_by(*(table.c[name] for name in columns))
+    return ctx.connection.execute(delete(table).where(table.c.id.not_in(newest))).rowcount
+
+
+def _merge_duplicates(ctx: UpgradeContext, table: Table, columns: Sequence[str], **aggregates) -> int:
+    """
+    Stores `aggregates` (column name -> aggregate function, e.g. func.sum)
+    over each duplicated key in its newest row, then deletes the others.
+    """
+    names = sorted(aggregates)
+    merged = ctx.connection.execute(
+        select(func.max(table.c.id), *(aggregates[name](table.c[name]) for name in names))
+        .group_by(*(table.c[name] for name in columns))
+        .having(func.count() > 1)
+    ).all()
+    if merged:
+        ctx.connection.execute(
+            update(table).where(table.c.id == bindparam("b_keep_id"))
+            .values({name: bindparam(f"b_{name}") for name in names}),
+            [{"b_keep_id": row[0], **{f"b_{name}": value for name, value in zip(names, row[1:])}}
+             for row in merged],
+        )
+    return _keep_newest_duplicate(ctx, table, columns)
+
+
+def _merge_duplicate_reward_pool_items(ctx: UpgradeContext, table: Table, columns: Sequence[str]) -> int:
+    """
+    Pool draws are weighted, so an item listed twice was drawn with the sum of
+    its probabilities; the newest row keeps that sum and the others are deleted.
+    """
+    return _merge_duplicates(ctx, table, columns, probability=func.sum)
+
+
+def _merge_duplicate_map_progress(ctx: UpgradeContext, table: Table, columns: Sequence[str]) -> int:
+    """
+    progress is an accumulator (write-behind flushes add to it), so duplicate
+    rows are summed; the map stays completed if any row completed it.
+    """
+    return _merge_duplicates(ctx, table, columns, progress=func.sum, is_completed=func.max)
+
+
+# table name -> how duplicate keys are collapsed before a unique key is added
+_DUPLICATE_RESOLVERS: Dict[str, Callable[[UpgradeContext, Table, Sequence[str]], int]] = {
+    "reward_pool_items": _merge_duplicate_reward_pool_items,
+    "user_map_progress": _merge_duplicate_map_progress,
+}
+
+
+def _dedupe(ctx: UpgradeContext, table: Table, columns: Sequence[str]) -> None:
+    resolver = _DUPLICATE_RESOLVERS.get(table.name, _keep_newest_duplicate)
+    removed = resolver(ctx, table, columns)
+    if removed:
+        ctx.log(f"{table.name}: removed {removed} duplicate ({', '.join(columns)}) rows")
+
+
+def _rebuild_sqlite_table(ctx: UpgradeContext, table: Table) -> None:
+    """
+    Recreates `table` from the model and copies the rows over (SQLite's
+    procedure for changes ALTER TABLE cannot make). Rows are deduplicated on
+    the model's unique keys first, since the new table enforces them.
+    """
+    for constraint in _unique_constraints(table):
+        _dedupe(ctx, table, [column.name for column in constraint.columns])
+    live_columns = _live_column_names(ctx, table)
+    columns = ", ".join(column.name for column in table.columns if column.name in live_columns)
+    new_name = f"_upgrade_{table.name}"
+    create_sql = str(CreateTable(table).compile(dialect=ctx.connection.dialect)).strip()
+    create_sql = create_sql.replace(f"CREATE TABLE {table.name} ", f"CREATE TABLE {new_name} ", 1)
+
+    # Runs with foreign keys off (see _upgrade_engine), so dropping the old
+    # table neither cascades nor breaks the references to it
+    ctx.connection.exec_driver_sql(create_sql)
+    ctx.connection.exec_driver_sql(f"INSERT INTO {new_name} ({columns}) SELECT {columns} FROM {table.name}")
+    ctx.connection.exec_driver_sql(f"DROP TABLE {table.name}")
+    ctx.connection.exec_driver_sql(f"ALTER TABLE {new_name} RENAME TO {table.name}")
+    for index in sorted(table.indexes, key=lambda index: index.name):
+        index.create(ctx.connection)
+    if ctx.check_foreign_keys:
+        violations = ctx.connection.exec_driver_sql(f"PRAGMA foreign_key_check({table.name})").fetchall()
+        if violations:
+            raise SchemaUpgradeError(f"{table.name}: {len(violations)} rows violate a foreign key after the rebuild")
+    ctx.log(f"{table.name}: rebuilt from the model")
+
+
+def _create_missing_tables(ctx: UpgradeContext) -> None:
+    live = {table.name for table in ctx.live_tables()}
+    for table in ctx.tables.values():
+        if table.name not in live:
+            table.create(ctx.connection)
+            ctx.log(f"{table.name}: created")
+
+
+def _backfill_team_power(ctx: UpgradeContext) -> None:
+    from core_system.services.team_power_service import team_power_update
+
+    ctx.connection.execute(team_power_update())
+
+
+# (table, column) -> fills a column just added to existing rows
+_COLUMN_BACKFILLS: Dict[tuple, Callable[[UpgradeContext], None]] = {
+    ("user_data", "team_power"): _backfill_team_power,
+}
+
+
+def _add_missing_columns(ctx: UpgradeContext) -> None:
+    for table in ctx.live_tables():
+        live_columns = _live_column_names(ctx, table)
+        for column in table.columns:
+            if column.name in live_columns:
+                continue
+            if not column.nullable and column.server_default is None:
+                raise SchemaUpgradeError(f"{table.name}.{column.name}: NOT NULL without a server default "
+                                         f"cannot be added to existing rows")
+            column_sql = CreateColumn(column).compile(dialect=ctx.connection.dialect)
+            ctx.connection.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {column_sql}")
+            backfill = _COLUMN_BACKFILLS.get((table.name, column.name))
+            if backfill is not None:
+                backfill(ctx)
+            ctx.log(f"{table.name}.{column.name}: added{' and backfilled' if backfill else ''}")
+
+
+def _relax_not_null_columns(ctx: UpgradeContext) -> None:
+    for table in ctx.live_tables():
+        live_nullable = {column["name"]: column["nullable"] for column in ctx.inspector().get_columns(table.name)}
+        relaxed = [column.name for column in table.columns
+                   if column.nullable and live_nullable.get(column.name) is False]
+        if not relaxed:
+            continue
+        if ctx.is_sqlite:
+            _rebuild_sqlite_table(ctx, table)
+        else:
+            for name in relaxed:
+                ctx.connection.exec_driver_sql(f"ALTER TABLE {table.name} ALTER COLUMN {name} DROP NOT NULL")
+                ctx.log(f"{table.name}.{name}: NOT NULL dropped")
+
+
+def _create_missing_unique_keys(ctx: UpgradeContext) -> None:
+    for table in ctx.live_tables():
+        for constraint in _unique_constraints(table):
+            columns = [column.name for column in constraint.columns]
+            if _has_unique_key(ctx, table, columns):
+                continue
+            _dedupe(ctx, table, columns)
+            name = constraint.name or f"uq_{table.name}_{'_'.join(columns)}"
+            # A unique index is what ON CONFLICT needs and, unlike a
+            # constraint, can be added to an existing SQLite table
+            ctx.connection.exec_driver_sql(
+                f"CREATE UNIQUE INDEX {name} ON {table.name} ({', '.join(columns)})")
+            ctx.log(f"{table.name}: unique index {name} created")
+
+
+def _on_delete(value: Optional[str]) -> Optional[str]:
+    value = (value or "").upper()
+    return None if value in ("", "NO ACTION") else value
+
+
+def _upgrade_on_delete_actions(ctx: UpgradeContext) -> None:
+    for table in ctx.live_tables():
+        live_actions = {
+            (tuple(fk["constrained_columns"]), fk["referred_table"]): (fk["name"], _on_delete(fk["options"].get("ondelete")))
+            for fk in ctx.inspector().get_foreign_keys(table.name)
+        }
+        changed = []
+        for constraint in table.constraints:
+            if not isinstance(constraint, ForeignKeyConstraint):
+                continue
+            key = (tuple(constraint.column_keys), constraint.referred_table.name)
+            if key in live_actions and live_actions[key][1] != _on_delete(constraint.ondelete):
+                changed.append((constraint, live_actions[key][0]))
+        if not changed:
+            continue
+        if ctx.is_sqlite:
+            _rebuild_sqlite_table(ctx, table)
+            continue
+        for constraint, live_name in changed:
+            ctx.connection.exec_driver_sql(f"ALTER TABLE {table.name} DROP CONSTRAINT {live_name}")
+            ctx.connection.execute(AddConstraint(constraint))
+            ctx.log(f"{table.name}: foreign key ({', '.join(constraint.column_keys)}) "
+                    f"ON DELETE {constraint.ondelete or 'NO ACTION'}")
+
+
+def _create_missing_indexes(ctx: UpgradeContext) -> None:
+    for table in ctx.live_tables():
+        existing = {index["name"] for index in ctx.inspector().get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            if index.name not in existing:
+                index.create(ctx.connection)
+                ctx.log(f"{table.name}: index {index.name} created")
+
+
+def _reserve_shard_id_ranges(ctx: UpgradeContext) -> None:
+    if ctx.player_shard is None:
+        return
+    from core_system.models.sharding import SHARD_ID_RANGE_TABLES, reserve_shard_id_range, shard_id_range
+
+    tables = [table for table in ctx.live_tables() if table.name in SHARD_ID_RANGE_TABLES]
+    if ctx.is_sqlite:
+        for table in tables:
+            # sqlite_sequence only applies to AUTOINCREMENT tables
+            create_sql = ctx.connection.exec_driver_sql(
+                "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table.name,)).scalar_one()
+            if "AUTOINCREMENT" not in create_sql.upper():
+                _rebuild_sqlite_table(ctx, table)
+    first, _ = shard_id_range(*ctx.player_shard)
+    for name in reserve_shard_id_range(ctx.connection, *ctx.player_shard, [table.name for table in tables]):
+        ctx.log(f"{name}: new ids start at {first}")
+
+
+UPGRADE_STEPS: List[UpgradeStep] = [
+    UpgradeStep("missing tables", _create_missing_tables),
+    UpgradeStep("missing columns", _add_missing_columns),
+    UpgradeStep("nullable columns", _relax_not_null_columns),
+    UpgradeStep("unique keys", _create_missing_unique_keys),
+    UpgradeStep("on delete actions", _upgrade_on_delete_actions),
+    UpgradeStep("missing indexes", _create_missing_indexes),
+    UpgradeStep("shard id ranges", _reserve_shard_id_ranges),
+]
+
+
+def _upgrade_engine(url: str) -> Engine:
+    engine = create_engine(url)
+    if engine.dialect.name == "sqlite":
+        @event.listens_for(engine, "connect")
+        def _on_connect(dbapi_connection, connection_record):
+            # Let SQLAlchemy emit BEGIN itself so DDL is transactional too, and
+            # keep foreign keys off while tables are rebuilt (the pragma is a
+            # no-op inside a transaction, so it is set per connection)
+            dbapi_connection.isolation_level = None
+            dbapi_connection.execute("PRAGMA foreign_keys = OFF")
+
+        @event.listens_for(engine, "begin")
+        def _on_begin(conn):
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+    return engine
+
+
+def upgrade_database(url: str, tables: Sequence[Table], label: str = "main", check_foreign_keys: bool = True,
+                     player_shard: Optional[Tuple[int, int]] = None) -> None:
+    """Runs every upgrade step against one database, one transaction per step."""
+    engine = _upgrade_engine(url)
+    try:
+        for step in UPGRADE_STEPS:
+            with engine.begin() as connection:
+                step.run(UpgradeContext(connection, {table.name: table for table in tables}, label,
+                                        check_foreign_keys, player_shard))
+    finally:
+        engine.dispose()
+
+
+def upgrade(database_url: str, player_shard_urls: Sequence[str] = ()) -> None:
+    """Upgrades the main database and then the player tables on every shard."""
+    from core_system import models  # noqa: F401  (registers every mapped table)
+    from core_system.models import audit, bo_admin, inventory, npc  # noqa: F401
+    from core_system.models.database import Base
+    from core_system.models.sharding import MAIN_SHARD, PLAYER_SHARD_KEYS, player_shard_id
+
+    tables = list(Base.metadata.sorted_tables)
+    print(f"Upgrading {MAIN_SHARD}")
+    upgrade_database(database_url, tables, MAIN_SHARD)
+    player_tables = [table for table in tables if table.name in PLAYER_SHARD_KEYS]
+    for index, url in enumerate(player_shard_urls):
+        shard_id = player_shard_id(index, len(player_shard_urls))
+        print(f"Upgrading {shard_id}")
+        upgrade_database(url, player_tables, shard_id, check_foreign_keys=False,
+                         player_shard=(index, len(player_shard_urls)))
+
+
+def _parse_args(argv: Optional[List[str]]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL", "sqlite:///../game_data.db"))
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = _parse_args(argv)
+    # models/database.py reads DATABASE_URL when first imported
+    os.environ["DATABASE_URL"] = args.database_url
+    from core_system.models.sharding import player_shard_urls_from_env
+
+    upgrade(args.database_url, player_shard_urls_from_env())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
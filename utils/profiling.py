@@ -0,0 +1,208 @@
+import functools
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Mapper
+
+# Per-call SQL instrumentation for the service layer.
+#
+#   @profile_service                      record wall time / statements / rows per call
+#   @profile_service(query_budget=5)      additionally enforce a statement budget
+#
+# Profiling is off unless SERVICE_PROFILING=1 or enable_profiling() is called;
+# when off the decorator is a single flag check. Strict mode
+# (SERVICE_PROFILING_STRICT=1 or set_strict_mode(True)) raises
+# QueryBudgetExceeded when a call issues more statements than its budget.
+#
+# "rows" counts DML rowcounts plus ORM instances loaded; the DBAPI does not
+# report how many rows a SELECT returned without consuming the cursor.
+
+_enabled = os.getenv("SERVICE_PROFILING", "0") == "1"
+_strict = os.getenv("SERVICE_PROFILING_STRICT", "0") == "1"
+# Fingerprints repeated at least this many times in one call are reported as N+1 suspects
+REPEATED_STATEMENT_THRESHOLD = int(os.getenv("SERVICE_PROFILING_REPEAT_THRESHOLD", "3"))
+
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_VALUES_LIST = re.compile(r"(\(\?\))(?:\s*,\s*\(\?\))+")
+_NUMBER = re.compile(r"\b\d+\b")
+_WHITESPACE = re.compile(r"\s+")
+
+
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+
+def fingerprint(statement: str) -> str:
+    """Normalizes a statement so calls that differ only in parameters compare equal."""
+    statement = _WHITESPACE.sub(" ", statement).strip()
+    statement = _NUMBER.sub("?", statement)
+    statement = _IN_LIST.sub("(?)", statement)
+    return _VALUES_LIST.sub(r"\1", statement)
+
+
+@dataclass
+class QueryProfile:
+    name: str
+    capture: bool = False
+    wall_time: float = 0.0
+    statements: int = 0
+    rows: int = 0
+    fingerprints: Counter = field(default_factory=Counter)
+    # (statement, parameters) when capture=True
+    captured: List[Tuple[str, object]] = field(default_factory=list)
+
+    @property
+    def repeated(self) -> Dict[str, int]:
+        return {fp: n for fp, n in self.fingerprints.items() if n >= REPEATED_STATEMENT_THRESHOLD}
+
+
+@dataclass
+class ServiceStats:
+    calls: int = 0
+    total_time: float = 0.0
+    total_statements: int = 0
+    max_statements: int = 0
+    total_rows: int = 0
+    n_plus_one_calls: int = 0
+
+
+_active: ContextVar[Tuple[QueryProfile, ...]] = ContextVar("active_query_profiles", default=())
+_stats: Dict[str, ServiceStats] = {}
+_stats_lock = threading.Lock()
+
+
+def enable_profiling(enabled: bool = True) -> None:
+    global _enabled
+    _enabled = enabled
+
+
+def set_strict_mode(strict: bool = True) -> None:
+    global _strict
+    _strict = strict
+
+
+def is_profiling_enabled() -> bool:
+    return _enabled
+
+
+# ---------------------- SQLAlchemy listeners ----------------------
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profiles = _active.get()
+    if not profiles:
+        return
+    fp = fingerprint(statement)
+    for profile in profiles:
+        profile.statements += 1
+        profile.fingerprints[fp] += 1
+        if profile.capture:
+            profile.captured.append((statement, parameters))
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profiles = _active.get()
+    if not profiles:
+        return
+    rowcount = cursor.rowcount
+    if rowcount and rowcount > 0:
+        for profile in profiles:
+            profile.rows += rowcount
+
+
+@event.listens_for(Mapper, "load")
+def _on_instance_load(target, context):
+    for profile in _active.get():
+        profile.rows += 1
+
+
+# ---------------------- Profiling API ----------------------
+
+
+@contextmanager
+def profile_block(name: str, capture: bool = False):
+    """
+    Profiles every statement issued inside the block, regardless of whether
+    profiling is globally enabled. Nested blocks all see the inner statements.
+    """
+    profile = QueryProfile(name=name, capture=capture)
+    token = _active.set(_active.get() + (profile,))
+    start = time.perf_counter()
+    try:
+        yield profile
+    finally:
+        profile.wall_time = time.perf_counter() - start
+        _active.reset(token)
+
+
+def capture_queries(name: str = "capture"):
+    """profile_block that also keeps each (statement, parameters) pair."""
+    return profile_block(name, capture=True)
+
+
+def _record(profile: QueryProfile) -> None:
+    with _stats_lock:
+        stats = _stats.setdefault(profile.name, ServiceStats())
+        stats.calls += 1
+        stats.total_time += profile.wall_time
+        stats.total_statements += profile.statements
+        stats.max_statements = max(stats.max_statements, profile.statements)
+        stats.total_rows += profile.rows
+        if profile.repeated:
+            stats.n_plus_one_calls += 1
+
+
+def profile_service(func: Optional[Callable] = None, *, query_budget: Optional[int] = None):
+    """
+    Decorator for service functions. Usable bare (@profile_service) or with a
+    statement budget (@profile_service(query_budget=3)).
+    """
+    def decorator(fn: Callable) -> Callable:
+        name = f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with profile_block(name) as profile:
+                result = fn(*args, **kwargs)
+            _record(profile)
+            if profile.repeated:
+                logging.warning(f"[profiling] {name} repeated statements (possible N+1): {profile.repeated}")
+            logging.debug(f"[profiling] {name}: {profile.wall_time * 1000:.2f}ms, "
+                          f"{profile.statements} statements, {profile.rows} rows")
+            if _strict and query_budget is not None and profile.statements > query_budget:
+                raise QueryBudgetExceeded(
+                    f"{name} issued {profile.statements} statements (budget {query_budget}); "
+                    f"fingerprints: {dict(profile.fingerprints)}")
+            return result
+
+        wrapper.query_budget = query_budget
+        return wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+def get_profile_report() -> Dict[str, ServiceStats]:
+    """Aggregated per-service stats since the last reset."""
+    with _stats_lock:
+        return {name: ServiceStats(**vars(stats)) for name, stats in _stats.items()}
+
+
+def reset_profile_stats() -> None:
+    with _stats_lock:
+        _stats.clear()
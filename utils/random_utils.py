@@ -1,5 +1,6 @@
+import itertools
 import random
-from typing import List, Tuple, TypeVar, Optional
+from typing import Generic, Iterable, List, Tuple, TypeVar, Optional
 
 T = TypeVar('T')
 
@@ -33,3 +34,38 @@ def weighted_choice(choices: List[Tuple[T, float]]) -> Optional[T]:
     # 理論上不應該執行到這裡，但作為保險，回傳最後一個有效項目
     return valid_choices[-1][0]
 
+
+
+class WeightedPool(Generic[T]):
+    """
+    預先編譯的 (物件, 權重) 池：累積權重只在建立時計算一次，之後每次抽選都是
+    random.choices(cum_weights=...) 的 bisect，大量抽選則一次以 k=n 完成。
+
+    Args:
+        choices: (物件, 權重) 列表，權重不為正的選項會被忽略。
+        capacity: 若指定且大於權重總和，差額代表「沒抽中」，抽到時回傳 None
+            （例如機率總和未滿 1.0 的掉落池）。
+    """
+    __slots__ = ("items", "cum_weights", "total")
+
+    def __init__(self, choices: Iterable[Tuple[T, float]], capacity: Optional[float] = None):
+        valid = [(item, float(weight)) for item, weight in choices if weight and weight > 0]
+        self.items: List[Optional[T]] = [item for item, _ in valid]
+        self.cum_weights: List[float] = list(itertools.accumulate(weight for _, weight in valid))
+        self.total = self.cum_weights[-1] if valid else 0.0
+        if valid and capacity is not None and capacity > self.total:
+            self.items.append(None)
+            self.cum_weights.append(float(capacity))
+
+    def __bool__(self) -> bool:
+        return self.total > 0
+
+    def draw(self, rng: random.Random = random) -> Optional[T]:
+        if not self:
+            return None
+        return rng.choices(self.items, cum_weights=self.cum_weights)[0]
+
+    def draw_many(self, k: int, rng: random.Random = random) -> List[Optional[T]]:
+        if not self or k <= 0:
+            return [None] * max(k, 0)
+        return rng.choices(self.items, cum_weights=self.cum_weights, k=k)
@@ -0,0 +1,54 @@
+import logging
+from typing import Callable, Hashable
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+_PENDING_KEY = "on_commit_callbacks"
+
+
+def on_commit(db: Session, key: Hashable, callback: Callable[[], None]) -> None:
+    """
+    Registers `callback` to run once after `db` commits successfully.
+    Callbacks registered under the same key are de-duplicated (last wins),
+    and all pending callbacks are dropped if the transaction rolls back.
+    Only the outermost transaction counts: releasing or rolling back a
+    SAVEPOINT (begin_nested) neither runs nor drops them, since nothing is
+    committed yet and the outer transaction may still commit the rest.
+
+    Services use this for side effects that must only happen for committed
+    data (cache invalidation, catalog rebuilds) since they never commit themselves.
+    """
+    db.info.setdefault(_PENDING_KEY, {})[key] = callback
+
+
+def in_savepoint(session: Session) -> bool:
+    """
+    True inside commit / rollback events fired for a SAVEPOINT. SQLAlchemy
+    fires before_commit / after_commit / after_rollback for nested
+    transactions too; session-level hooks must ignore those.
+    """
+    return session.in_nested_transaction()
+
+
+@event.listens_for(Session, "after_commit")
+def _run_on_commit_callbacks(session: Session):
+    if in_savepoint(session):
+        return
+    callbacks = session.info.pop(_PENDING_KEY, None)
+    if not callbacks:
+        return
+    for key, callback in callbacks.items():
+        try:
+            callback()
+        except Exception:
+            # The data is already committed; a failing side effect must not
+            # surface as a failed commit to the caller.
+            logging.error(f"on_commit callback {key!r} failed.", exc_info=True)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_on_commit_callbacks(session: Session):
+    if in_savepoint(session):
+        return
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,167 @@
+import random
+from typing import Any, Generic, Iterator, List, Optional, TypeVar
+
+K = TypeVar('K')
+
+# 可索引的 skip list：每條 link 記錄跨過的節點數（width），
+# 因此 insert / remove / rank / 取第 i 個元素都是期望 O(log n)。
+# Keys must be unique and totally ordered; leaderboards use (-score, user_data_id).
+
+
+class _Node:
+    __slots__ = ("key", "next", "width")
+
+    def __init__(self, key, levels: int):
+        self.key = key
+        self.next: List[Optional["_Node"]] = [None] * levels
+        self.width: List[int] = [1] * levels
+
+
+class IndexableSkipList(Generic[K]):
+    MAX_LEVELS = 32
+
+    def __init__(self, keys=(), seed: Optional[int] = None):
+        self._random = random.Random(seed)
+        self._head = _Node(None, self.MAX_LEVELS)
+        self._levels = 1
+        self._size = 0
+        for key in keys:
+            self.insert(key)
+
+    @classmethod
+    def from_sorted(cls, keys, seed: Optional[int] = None) -> "IndexableSkipList[K]":
+        """Builds a skip list in O(n) from keys already in ascending order without duplicates."""
+        skiplist = cls(seed=seed)
+        head = skiplist._head
+        last: List[_Node] = [head] * cls.MAX_LEVELS
+        last_position = [-1] * cls.MAX_LEVELS
+        index = -1
+        for index, key in enumerate(keys):
+            levels = skiplist._random_level()
+            node = _Node(key, levels)
+            for level in range(levels):
+                last[level].next[level] = node
+                last[level].width[level] = index - last_position[level]
+                last[level] = node
+                last_position[level] = index
+            skiplist._levels = max(skiplist._levels, levels)
+        size = index + 1
+        for level in range(cls.MAX_LEVELS):
+            # links to the end span the remaining elements
+            last[level].width[level] = size - last_position[level]
+        skiplist._size = size
+        return skiplist
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _random_level(self) -> int:
+        level = 1
+        while level < self.MAX_LEVELS and self._random.random() < 0.5:
+            level += 1
+        return level
+
+    def _search(self, key: K):
+        """Returns (update nodes, their 0-based positions) for each level, top to bottom."""
+        update: List[_Node] = [self._head] * self.MAX_LEVELS
+        positions = [-1] * self.MAX_LEVELS
+        node, position = self._head, -1
+        for level in range(self._levels - 1, -1, -1):
+            while node.next[level] is not None and node.next[level].key < key:
+                position += node.width[level]
+                node = node.next[level]
+            update[level] = node
+            positions[level] = position
+        return update, positions
+
+    def insert(self, key: K) -> int:
+        """Inserts `key` and returns its 0-based index. Raises KeyError if present."""
+        update, positions = self._search(key)
+        candidate = update[0].next[0]
+        if candidate is not None and candidate.key == key:
+            raise KeyError(key)
+
+        levels = self._random_level()
+        if levels > self._levels:
+            for level in range(self._levels, levels):
+                update[level] = self._head
+                positions[level] = -1
+                self._head.width[level] = self._size + 1
+            self._levels = levels
+
+        index = positions[0] + 1
+        node = _Node(key, levels)
+        for level in range(levels):
+            prev = update[level]
+            node.next[level] = prev.next[level]
+            prev.next[level] = node
+            # prev -> node spans (index - positions[level]) steps; node takes the rest
+            steps = index - positions[level]
+            node.width[level] = prev.width[level] - steps + 1
+            prev.width[level] = steps
+        for level in range(levels, self._levels):
+            update[level].width[level] += 1
+        self._size += 1
+        return index
+
+    def remove(self, key: K) -> int:
+        """Removes `key` and returns the index it had. Raises KeyError if absent."""
+        update, positions = self._search(key)
+        node = update[0].next[0]
+        if node is None or node.key != key:
+            raise KeyError(key)
+        index = positions[0] + 1
+        for level in range(self._levels):
+            prev = update[level]
+            if prev.next[level] is node:
+                prev.next[level] = node.next[level]
+                prev.width[level] += node.width[level] - 1
+            else:
+                prev.width[level] -= 1
+        while self._levels > 1 and self._head.next[self._levels - 1] is None:
+            self._levels -= 1
+        self._size -= 1
+        return index
+
+    def index(self, key: K) -> int:
+        """0-based position of `key`. Raises KeyError if absent."""
+        update, positions = self._search(key)
+        node = update[0].next[0]
+        if node is None or node.key != key:
+            raise KeyError(key)
+        return positions[0] + 1
+
+    def __contains__(self, key: Any) -> bool:
+        update, _ = self._search(key)
+        node = update[0].next[0]
+        return node is not None and node.key == key
+
+    def _node_at(self, index: int) -> _Node:
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("skip list index out of range")
+        node, position = self._head, -1
+        for level in range(self._levels - 1, -1, -1):
+            while node.next[level] is not None and position + node.width[level] <= index:
+                position += node.width[level]
+                node = node.next[level]
+        return node
+
+    def __getitem__(self, index: int) -> K:
+        return self._node_at(index).key
+
+    def iter_from(self, start: int = 0) -> Iterator[K]:
+        """Iterates keys in order starting at index `start` (O(log n) to find the start)."""
+        if start >= self._size:
+            return
+        node = self._node_at(max(0, start))
+        while node is not None:
+            yield node.key
+            node = node.next[0]
+
+    def __iter__(self) -> Iterator[K]:
+        node = self._head.next[0]
+        while node is not None:
+            yield node.key
+            node = node.next[0]
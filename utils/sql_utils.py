@@ -0,0 +1,31 @@
+from typing import Iterator, List, Sequence, TypeVar
+
+from sqlalchemy import Table
+from sqlalchemy.orm import Session
+
+T = TypeVar('T')
+
+# SQLite 舊版單一語句最多 999 個參數；批次寫入時以此切分
+MAX_BIND_PARAMS = 999
+
+
+def upsert_insert(db: Session, table: Table):
+    """
+    Returns a dialect-specific INSERT construct supporting
+    .on_conflict_do_update() / .on_conflict_do_nothing() for the session's bind.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        raise RuntimeError(f"Upsert is not supported for dialect '{dialect}'")
+    return insert(table)
+
+
+def chunked(rows: Sequence[T], params_per_row: int) -> Iterator[List[T]]:
+    """Splits `rows` so that each chunk stays under MAX_BIND_PARAMS bound parameters."""
+    size = max(1, MAX_BIND_PARAMS // max(1, params_per_row))
+    for start in range(0, len(rows), size):
+        yield list(rows[start:start + size])